@@ -1,10 +1,16 @@
 from fastapi import APIRouter
 
+from . import batch
 from . import datasets
+from . import fields
 from . import platforms
+from . import stats
 from . import tags
 
 api_router = APIRouter()
+api_router.include_router(batch.router, prefix="/batch", tags=["batch"])
 api_router.include_router(datasets.router, prefix="/datasets", tags=["datasets"])
+api_router.include_router(fields.router, prefix="/fields", tags=["fields"])
 api_router.include_router(platforms.router, prefix="/platforms", tags=["platforms"])
+api_router.include_router(stats.router, prefix="/stats", tags=["stats"])
 api_router.include_router(tags.router, prefix="/tags", tags=["tags"])
\ No newline at end of file
@@ -0,0 +1,342 @@
+import asyncio
+
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Mapping, Optional, Tuple, Union
+from urllib.parse import quote, unquote, urlencode
+from aiohttp import ClientSession
+from fastapi import status, APIRouter, Depends, FastAPI, HTTPException, Request
+from fastapi.logger import logger
+from pydantic import BaseModel
+from starlette.routing import Match
+
+from .. import deps
+from . import datasets, graphql, platforms, projection, tags, upstream
+from .mirror import mirror
+from .params import QueryParams, QueryType
+from ...core import codec
+from ...core.cache import cache
+from ...core.config import settings
+from ...schemas import (
+    Datasets, DatasetEnvelope, Platforms, PlatformEnvelope, SubRequest, Tags, TagEnvelope
+)
+
+# A read merged into the batch query: its body and the conversion of its results
+Plan = Tuple[Mapping, Callable[[Mapping], Awaitable[BaseModel]]]
+
+def scope(req: Request, sub: SubRequest) -> Dict[str, Any]:
+    path = unquote(sub.path)
+    if not path.startswith(settings.API_V1_PREFIX):
+        path = settings.API_V1_PREFIX + path
+
+    return {
+        "type": "http",
+        "asgi": { "version": "3.0" },
+        "http_version": "1.1",
+        "method": sub.method.upper(),
+        "scheme": req.url.scheme,
+        "server": req.scope.get("server"),
+        "client": req.scope.get("client"),
+        "root_path": "",
+        "path": path,
+        "raw_path": quote(path).encode(),
+        "query_string": urlencode(sub.query).encode(),
+        "headers": [(b"content-type", b"application/json")],
+    }
+
+
+def route(app: FastAPI, scope: Mapping) -> Tuple[Optional[Callable], Mapping[str, str]]:
+    """
+    Endpoint and path parameters the app would route the request to
+    """
+    for r in app.router.routes:
+        match, child = r.matches(scope)
+        if match == Match.FULL:
+            return getattr(r, "endpoint", None), child.get("path_params", {})
+
+    return None, {}
+
+
+def found(entity: Any) -> Any:
+    if entity is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+
+    return entity
+
+
+def listing(model: Any, fields: Optional[FrozenSet[str]] = None) -> Callable[[Mapping], Awaitable[BaseModel]]:
+    async def convert(data: Mapping) -> BaseModel:
+        return model.from_json(data["data"]["results"], fields)
+
+    return convert
+
+
+# Planners for the reads that can be merged, each returning a plan, the
+# response when it is answered locally, or None to run it on its own
+
+async def dataset_by_id(req: Request, dataset_id: str) -> Union[Plan, BaseModel]:
+    fields = datasets.SELECTION.resolve(projection.parse(req))
+    key = projection.key(dataset_id, fields)
+    entity = await cache.get(key)
+    if entity is not None:
+        return DatasetEnvelope.from_json(entity, fields)
+
+    async def convert(data: Mapping) -> BaseModel:
+        entity = found(data["data"]["dataset"])
+        await cache.set(key, entity, datasets.dependencies(entity))
+        return DatasetEnvelope.from_json(entity, fields)
+
+    return datasets.GET_BY_ID.body(dataset_id, fields), convert
+
+
+async def dataset_list(req: Request) -> Union[Plan, BaseModel, None]:
+    params = QueryParams(req)
+    if params.cursor is not None or params.type == QueryType.NAME:
+        return None
+
+    fields = datasets.SELECTION.resolve(params.fields)
+    results = await mirror.datasets(params)
+    if results is not None:
+        return Datasets.from_json(results, fields)
+
+    body = datasets.OPERATIONS[params.type].body(params)
+    return body, listing(Datasets, fields)
+
+
+async def tag_by_id(req: Request, tag_id: str) -> Union[Plan, BaseModel]:
+    fields = tags.SELECTION.resolve(projection.parse(req))
+    key = projection.key(tag_id, fields)
+    entity = await cache.get(key)
+    if entity is not None:
+        return TagEnvelope.from_json(entity, fields)
+
+    async def convert(data: Mapping) -> BaseModel:
+        entity = found(data["data"]["tag"])
+        await cache.set(key, entity, [tag_id])
+        return TagEnvelope.from_json(entity, fields)
+
+    return tags.GET_BY_ID.body(tag_id, fields), convert
+
+
+async def tag_list(req: Request) -> Union[Plan, BaseModel, None]:
+    params = QueryParams(req)
+    if params.cursor is not None:
+        return None
+
+    fields = tags.SELECTION.resolve(params.fields)
+    results = tags.local(params)
+    if results is None:
+        results = await mirror.tags(params)
+    if results is not None:
+        return Tags.from_json(results, fields)
+    # Served stale-while-revalidate on its own
+    if settings.STALE_ENABLED and tags.first_page(params):
+        return None
+
+    body = tags.OPERATIONS[params.type].body(params)
+    return body, listing(Tags, fields)
+
+
+async def datasets_by_tag(req: Request, tag_id: str) -> Union[Plan, BaseModel, None]:
+    params = QueryParams(req)
+    if params.cursor is not None:
+        return None
+
+    fields = datasets.SELECTION.resolve(params.fields)
+    results = await mirror.datasets_by_tag(tag_id, params)
+    if results is not None:
+        return Datasets.from_json(results, fields)
+
+    body = tags.DATASETS_BY_TAG.body(tag_id, params)
+    return body, listing(Datasets, fields)
+
+
+async def platform_by_id(req: Request, platform_id: str) -> Union[Plan, BaseModel]:
+    entity = await cache.get(platform_id)
+    if entity is not None:
+        return PlatformEnvelope.from_json(entity)
+
+    async def convert(data: Mapping) -> BaseModel:
+        entity = found(data["data"]["dataPlatform"])
+        await cache.set(platform_id, entity, [platform_id])
+        return PlatformEnvelope.from_json(entity)
+
+    return platforms.GET_BY_ID.body(platform_id), convert
+
+
+async def platform_list(req: Request) -> Union[Plan, BaseModel, None]:
+    params = QueryParams(req)
+    modules = platforms.local(params)
+    if modules is None:
+        modules = await mirror.platforms(params)
+    if modules is not None:
+        return Platforms.from_json(modules)
+    # Served stale-while-revalidate on its own
+    if settings.STALE_ENABLED:
+        return None
+
+    async def convert(data: Mapping) -> BaseModel:
+        return Platforms.from_json(data["data"]["results"]["modules"])
+
+    return platforms.GET_ALL.body(params), convert
+
+
+async def datasets_by_platform(req: Request, platform_id: str) -> Union[Plan, BaseModel, None]:
+    params = QueryParams(req)
+    if params.cursor is not None:
+        return None
+
+    fields = datasets.SELECTION.resolve(params.fields)
+    body = platforms.DATASETS_BY_PLATFORM.body(platform_id, params)
+    return body, listing(Datasets, fields)
+
+
+PLANNERS = {
+    datasets.by_id:                 dataset_by_id,
+    datasets.by_query:              dataset_list,
+    tags.by_id:                     tag_by_id,
+    tags.by_query:                  tag_list,
+    tags.datasets_by_tag:           datasets_by_tag,
+    platforms.by_id:                platform_by_id,
+    platforms.by_query:             platform_list,
+    platforms.datasets_by_platform: datasets_by_platform,
+}
+
+def output(model: BaseModel) -> Mapping[str, Any]:
+    return { "status": status.HTTP_200_OK, "body": model.dict(exclude_unset=True) }
+
+
+async def dispatch(app: FastAPI, scope: Mapping, sub: SubRequest) -> Mapping[str, Any]:
+    """
+    Run a sub-request through the app as it would be run on its own
+    """
+    body = codec.dumps(sub.body) if sub.body is not None else b""
+    code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    chunks: List[bytes] = []
+    done = asyncio.Event()
+    received = False
+
+    async def receive() -> Mapping:
+        nonlocal received
+        if not received:
+            received = True
+            return { "type": "http.request", "body": body, "more_body": False }
+        await done.wait()
+        return { "type": "http.disconnect" }
+
+    async def send(message: Mapping) -> None:
+        nonlocal code
+        if message["type"] == "http.response.start":
+            code = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                done.set()
+
+    try:
+        await app(dict(scope), receive, send)
+    finally:
+        done.set()
+
+    content = b"".join(chunks)
+    try:
+        decoded = codec.loads(content) if content else None
+    except ValueError:
+        decoded = content.decode(errors="replace")
+
+    return { "status": code, "body": decoded }
+
+
+async def run_merged(session: ClientSession, plans: List[Plan]) -> List[Mapping[str, Any]]:
+    """
+    Run the planned reads as one aliased query
+    """
+    try:
+        data = await upstream.query(session, graphql.merge([body for body, _ in plans]))
+    except HTTPException as e:
+        return [{ "status": e.status_code, "body": { "detail": e.detail } } for _ in plans]
+
+    outputs = []
+    for (_, convert), results in zip(plans, graphql.split(data, len(plans))):
+        # Missing, or null because of an error rather than not found
+        failed = not results["data"] or (
+            results["errors"] and None in results["data"].values()
+        )
+        if failed:
+            outputs.append({
+                "status": status.HTTP_502_BAD_GATEWAY,
+                "body": { "detail": [e.get("message") for e in results["errors"]] }
+            })
+            continue
+
+        # A read that cannot be converted fails on its own, not the batch
+        try:
+            outputs.append(output(await convert(results)))
+        except HTTPException as e:
+            outputs.append({ "status": e.status_code, "body": { "detail": e.detail } })
+        except Exception as e:
+            logger.warning(f"Failed to convert a merged read: {e!r}")
+            outputs.append({
+                "status": status.HTTP_502_BAD_GATEWAY,
+                "body": { "detail": "unexpected upstream response" }
+            })
+
+    return outputs
+
+router = APIRouter()
+
+@router.post("")
+async def batch(
+    subs: List[SubRequest],
+    req: Request,
+    session: ClientSession = Depends(deps.get_session),
+) -> Any:
+    """
+    Run many requests in one, reads that can be merged as one upstream
+    query and the rest concurrently, returning a status and body for each
+    in order
+    """
+    if len(subs) > settings.BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            detail=f"at most {settings.BATCH_MAX_REQUESTS} requests per batch"
+        )
+
+    outputs: List[Optional[Mapping[str, Any]]] = [None] * len(subs)
+    plans: List[Plan] = []
+    merged: List[int] = []
+    work = []
+    for i, sub in enumerate(subs):
+        sub_scope = scope(req, sub)
+        endpoint, path_params = route(req.app, sub_scope)
+        if endpoint is batch:
+            outputs[i] = {
+                "status": status.HTTP_400_BAD_REQUEST, "body": { "detail": "nested batch" }
+            }
+            continue
+
+        planner = PLANNERS.get(endpoint) if sub_scope["method"] == "GET" else None
+        planned = None
+        if planner is not None:
+            try:
+                planned = await planner(Request(sub_scope), **path_params)
+            except HTTPException as e:
+                planned = e
+        if isinstance(planned, HTTPException):
+            outputs[i] = { "status": planned.status_code, "body": { "detail": planned.detail } }
+        elif isinstance(planned, BaseModel):
+            outputs[i] = output(planned)
+        elif planned is not None:
+            plans.append(planned)
+            merged.append(i)
+        else:
+            work.append((i, dispatch(req.app, sub_scope, sub)))
+
+    results = await asyncio.gather(
+        run_merged(session, plans) if plans else asyncio.sleep(0, []),
+        *[w for _, w in work]
+    )
+    for i, result in zip(merged, results[0]):
+        outputs[i] = result
+    for (i, _), result in zip(work, results[1:]):
+        outputs[i] = result
+
+    return outputs
@@ -0,0 +1,208 @@
+import asyncio
+import codecs
+import csv
+import json
+
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, List, Mapping, Tuple, Type
+from aiohttp import ClientConnectionError
+from fastapi import status, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+
+from . import stream
+from ...core.config import settings
+
+Item = Tuple[int, Any]
+
+class BulkResponse(StreamingResponse):
+    """
+    NDJSON response streamed while the upload is still being read. The
+    request body is left to the handler rather than watched for a
+    disconnect, which a failed send reports instead.
+    """
+    media_type = stream.MEDIA_TYPE
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
+
+async def text(req: Request) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    async for chunk in req.stream():
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+async def lines(req: Request) -> AsyncIterator[str]:
+    """
+    Lines of the upload with their line endings, as they arrive
+    """
+    buffer = ""
+    async for chunk in text(req):
+        buffer += chunk
+        *complete, buffer = buffer.split("\n")
+        for line in complete:
+            yield line + "\n"
+    if buffer:
+        yield buffer
+
+
+async def rows(req: Request) -> AsyncIterator[Mapping[str, str]]:
+    """
+    Rows of a CSV upload keyed by its header. One reader parses every
+    record, which is only handed a record once no quoted field is left
+    open, so quoted fields may hold newlines.
+    """
+    records: Deque[str] = deque()
+    reader = csv.reader(iter(records.popleft, None))
+    header = None
+    record = ""
+    async for line in lines(req):
+        record += line
+        if record.count('"') % 2:
+            continue
+        records.append(record)
+        record = ""
+        try:
+            row = next(reader)
+        except csv.Error as e:
+            raise ValueError(f"invalid CSV: {e}")
+        if not row:
+            continue
+        if header is None:
+            header = row
+        else:
+            yield dict(zip(header, row))
+
+    if record:
+        raise ValueError("unterminated quoted field")
+
+
+async def array(req: Request) -> AsyncIterator[Any]:
+    """
+    Elements of a JSON array, decoded as they arrive
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    async for chunk in text(req):
+        buffer += chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                value, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Incomplete element, wait for more
+                break
+            yield value
+        buffer = buffer[pos:]
+
+    raise ValueError("unterminated JSON array")
+
+
+def records(req: Request) -> Tuple[AsyncIterator[Any], Callable[[Any], Any]]:
+    """
+    Items of a JSON array, NDJSON or CSV upload by content type, and the
+    function decoding each, which raises ValueError for a malformed item
+    """
+    kind = req.headers.get("content-type", "").split(";")[0].strip()
+    if kind == "text/csv":
+        return rows(req), identity
+    if kind in (stream.MEDIA_TYPE, "application/jsonl"):
+        return (line async for line in lines(req) if line.strip()), json.loads
+
+    return array(req), identity
+
+
+def identity(value: Any) -> Any:
+    return value
+
+
+def error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(l) for l in err['loc'])}: {err['msg']}" for err in e.errors()
+    )
+
+
+async def attempt(work: Awaitable[Tuple[int, Any]]) -> Tuple[int, Any]:
+    """
+    Status and result of an upstream write, with failures as their status
+    """
+    try:
+        return await work
+    except HTTPException as e:
+        return e.status_code, e.detail
+    except asyncio.TimeoutError:
+        return status.HTTP_504_GATEWAY_TIMEOUT, "upstream timed out"
+    except ClientConnectionError as e:
+        return status.HTTP_502_BAD_GATEWAY, str(e)
+
+
+def outcomes(chunk: List[Mapping]) -> bytes:
+    return b"".join(stream.line(o) for o in chunk)
+
+
+async def run(
+    req: Request,
+    model: Type[BaseModel],
+    apply: Callable[[List[Item]], Awaitable[List[Mapping]]]
+) -> AsyncIterator[bytes]:
+    """
+    Apply an upload in chunks of BULK_CHUNK_SIZE valid items, numbered
+    from 0 in upload order, with at most BULK_CONCURRENCY chunks in
+    flight. One NDJSON outcome per item is yielded as chunks finish; a
+    malformed or invalid item gets its own and the upload carries on.
+    """
+    pending = set()
+    chunk: List[Item] = []
+    item = 0
+    items, decode = records(req)
+    try:
+        try:
+            async for value in items:
+                try:
+                    chunk.append((item, model.parse_obj(decode(value))))
+                except ValidationError as e:
+                    yield stream.line({
+                        "item": item, "status": status.HTTP_422_UNPROCESSABLE_ENTITY, "error": error(e)
+                    })
+                except ValueError as e:
+                    yield stream.line({
+                        "item": item, "status": status.HTTP_400_BAD_REQUEST, "error": str(e)
+                    })
+                item += 1
+                if len(chunk) >= settings.BULK_CHUNK_SIZE:
+                    pending.add(asyncio.ensure_future(apply(chunk)))
+                    chunk = []
+                    if len(pending) >= settings.BULK_CONCURRENCY:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    else:
+                        done = { task for task in pending if task.done() }
+                        pending -= done
+                    for task in done:
+                        yield outcomes(task.result())
+        except ValueError as e:
+            yield stream.line({ "item": item, "status": status.HTTP_400_BAD_REQUEST, "error": str(e) })
+
+        if chunk:
+            pending.add(asyncio.ensure_future(apply(chunk)))
+        for task in asyncio.as_completed(pending):
+            yield outcomes(await task)
+        pending = set()
+    finally:
+        # Client went away: stop the chunks still in flight
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,43 @@
+import base64
+import json
+
+from typing import Mapping, Optional, Tuple
+from fastapi import status, HTTPException
+
+from ...schemas.paging import Paging
+
+def encode(scroll_id: str, offset: int) -> str:
+    """
+    Opaque cursor for the page following offset
+    """
+    data = json.dumps({ "s": scroll_id, "o": offset }, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode(cursor: str) -> Tuple[Optional[str], int]:
+    """
+    Scroll id and offset for a cursor, an empty cursor starts a new scroll
+    """
+    if not cursor:
+        return None, 0
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded))
+        scroll_id, offset = str(data["s"]), int(data["o"])
+    except (ValueError, TypeError, KeyError):
+        offset = -1
+    if offset < 0:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="invalid cursor")
+
+    return scroll_id, offset
+
+
+def paging(start: int, results: Mapping) -> Paging:
+    """
+    Paging for a scroll page read from offset start
+    """
+    scroll_id = results.get("nextScrollId")
+    count = results["count"]
+    next = encode(scroll_id, start + count) if scroll_id and count else None
+    return Paging.from_json(results, offset=start, next=next)
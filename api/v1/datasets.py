@@ -1,65 +1,115 @@
 import aiohttp
+import asyncio
 
-from typing import Any, List
+from functools import partial
+from typing import Any, AsyncIterator, Dict, FrozenSet, List, Mapping, Optional, Tuple
 from aiohttp import ClientSession
 from fastapi import (
     status, APIRouter, Depends, HTTPException, Request, Response
 )
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 
 from .. import deps
-from . import graphql
+from . import bulk, cursor, fanout, graphql, prefetch, projection, stream, upstream
+from .mirror import mirror
+from .responses import respond
 from .params import QueryType, QueryParams
+from ...core import client, codec
+from ...core.cache import cache
+from ...core.coalesce import Superseded, TagWrites
 from ...core.config import settings
-from ...schemas import AddTag, Datasets, DatasetEnvelope
+from ...core.loader import BatchLoader
+from ...core.stale import stale
+from ...core.typeahead import PrefixCache
+from ...schemas import AddTag, Datasets, DatasetEnvelope, Facets, Fields, LookupDatasets, TagAssignment
 
-QUERY_VALUES: str = """
-    urn
-    __typename
-    ... on Dataset {
+PLATFORM: str = """
+    platform {
         name
-        platform {
-            name
-            properties {
-                type
-                name: displayName
-            }
-        }
         properties {
-            name
-            origin
+            type
+            name: displayName
         }
-        schema: schemaMetadata {
-            fields {
-                type
-                path: fieldPath
-                native: nativeDataType
-            }
+    }
+"""
+
+PROPERTIES: str = """
+    properties {
+        name
+        origin
+    }
+"""
+
+SCHEMA: str = """
+    schema: schemaMetadata {
+        fields {
+            type
+            path: fieldPath
+            native: nativeDataType
         }
-        subTypes {
-            names: typeNames
+    }
+"""
+
+FIELD_PATHS: str = """
+    schema: schemaMetadata {
+        fields {
+            path: fieldPath
         }
+    }
+"""
+
+TAGS: str = """
+    tags {
         tags {
-            tags {
-                tag {
-                    urn
-                    __typename
-                    properties {
-                        name
-                        description
-                    }
+            tag {
+                urn
+                __typename
+                properties {
+                    name
+                    description
                 }
             }
         }
     }
 """
 
+SELECTION = projection.Selection(
+    "Dataset",
+    {
+        "id":           "",
+        "path":         "name",
+        "type":         "subTypes { names: typeNames }",
+        "name":         PROPERTIES,
+        "origin":       PROPERTIES,
+        "platform":     PLATFORM,
+        "platformType": PLATFORM,
+        "platformName": PLATFORM,
+        "tags":         TAGS,
+        "fields":       SCHEMA,
+        "fieldCount":   FIELD_PATHS,
+    },
+    default=[
+        "id", "path", "type", "name", "origin",
+        "platform", "platformType", "platformName", "tags", "fieldCount"
+    ],
+    aliases={ "schema": "fields" }
+)
+
+SCHEMA_ONLY = frozenset(["id", "fields"])
+
 ADD_TAG      = graphql.AddTagFactory()
 REMOVE_TAG   = graphql.RemoveTagFactory()
-GET_ALL      = graphql.GetAllFactory("DATASET", QUERY_VALUES)
-GET_BY_ID    = graphql.GetOneFactory("dataset", QUERY_VALUES)
-GET_BY_NAME  = graphql.NameFactory("DATASET", QUERY_VALUES)
-GET_BY_TAGS  = graphql.TagsFactory("DATASET", QUERY_VALUES)
-GET_BY_QUERY = graphql.QueryFactory("DATASET", QUERY_VALUES)
+BATCH_ADD_TAGS    = graphql.BatchAddTagsFactory()
+BATCH_REMOVE_TAGS = graphql.BatchRemoveTagsFactory()
+GET_ALL      = graphql.GetAllFactory("DATASET", SELECTION)
+GET_BY_ID    = graphql.GetOneFactory("dataset", SELECTION)
+GET_BY_IDS   = graphql.GetManyFactory("dataset", SELECTION)
+GET_BY_NAME  = graphql.NameFactory("DATASET", SELECTION)
+GET_BY_TAGS  = graphql.TagsFactory("DATASET", SELECTION)
+GET_BY_QUERY = graphql.QueryFactory("DATASET", SELECTION)
+EXPORT       = graphql.ScrollFactory("DATASET", SELECTION)
+FACETS       = graphql.FacetsFactory("DATASET", settings.FACETS)
 
 OPERATIONS = {
     QueryType.ALL:   GET_ALL,
@@ -68,9 +118,225 @@ OPERATIONS = {
     QueryType.QUERY: GET_BY_QUERY
 }
 
+async def load_many(fields: Optional[FrozenSet[str]], ids: List[str]) -> List[Any]:
+    body = GET_BY_IDS.body(ids, fields)
+    data = await upstream.query(client.get_session(), body, upstream.LOOKUP)
+    return GET_BY_IDS.results(data, ids)
+
+LOADERS: Dict[Optional[FrozenSet[str]], BatchLoader] = {}
+
+def loader(fields: Optional[FrozenSet[str]]) -> BatchLoader:
+    """
+    Batch loader for lookups by id with the given fields
+    """
+    loader = LOADERS.get(fields)
+    if loader is None:
+        loader = LOADERS[fields] = BatchLoader(
+            partial(load_many, fields),
+            settings.BATCH_MAX_SIZE,
+            settings.BATCH_WINDOW
+        )
+
+    return loader
+
+LOADER = loader(None)
+
+def names(entity: Mapping) -> List[Optional[str]]:
+    props = entity.get("properties")
+    return [entity.get("name"), props.get("name") if props else None]
+
+# Recent name autocomplete results, reused for longer prefixes
+PREFIXES = PrefixCache(names, settings.TYPEAHEAD_TTL, settings.TYPEAHEAD_MAX_ENTRIES)
+
+async def typeahead(session: ClientSession, params: QueryParams) -> Mapping:
+    """
+    Autocomplete results for a name prefix, from the prefix cache when
+    a cached result covers it
+    """
+    entities = PREFIXES.get(params.fields, params.query, params.limit)
+    if entities is None:
+        data = await upstream.query(session, GET_BY_NAME.body(params))
+        entities = data["data"]["results"]["entities"]
+        PREFIXES.put(params.fields, params.query, params.limit, entities)
+
+    return { "__typename": "AutoCompleteResults", "entities": entities }
+
+async def facets(session: ClientSession, query: Optional[str]) -> Any:
+    body = FACETS.body(query)
+    if not settings.STALE_ENABLED:
+        return await upstream.query(session, body)
+
+    return await stale.get(
+        "facets",
+        codec.encode_body(body),
+        lambda: upstream.query(client.get_session(), body)
+    )
+
+async def mutate(session: ClientSession, body: Mapping) -> Tuple[int, Any]:
+    """
+    Status and decoded result, or text on failure, of a mutation
+    """
+    code, text = await upstream.mutate(session, settings.DATAHUB_GRAPHQL, body)
+    if code == status.HTTP_200_OK:
+        return code, codec.loads(text)
+
+    return code, text
+
+
+async def applied(urns: List[str], tag: str, add: bool, code: int, result: Any) -> None:
+    await cache.invalidate(*urns)
+    if code == status.HTTP_200_OK and result.get("data") and result["data"]["success"]:
+        await mirror.tag_datasets(urns, tag, add=add)
+
+
+async def write_tags(tag: str, add: bool, urns: List[str]) -> Tuple[int, Any]:
+    factory = BATCH_ADD_TAGS if add else BATCH_REMOVE_TAGS
+    code, result = await mutate(client.get_session(), factory.body([tag], urns))
+    await applied(urns, tag, add, code, result)
+    return code, result
+
+# Tag mutations coalesced into batch mutations when COALESCE_ENABLED
+TAG_WRITES = TagWrites(write_tags, settings.COALESCE_MAX_SIZE, settings.COALESCE_WINDOW)
+
+def superseded(add: bool) -> str:
+    return f"not applied, superseded by a later {'remove' if add else 'add'} of the tag"
+
+
+async def tag_write(session: ClientSession, dataset_id: str, tag: str, add: bool) -> Response:
+    if settings.COALESCE_ENABLED:
+        try:
+            code, result = await TAG_WRITES.submit(dataset_id, tag, add)
+        except Superseded:
+            raise HTTPException(status.HTTP_409_CONFLICT, detail=superseded(add))
+    else:
+        factory = ADD_TAG if add else REMOVE_TAG
+        code, result = await mutate(session, factory.body(tag, dataset_id))
+        await applied([dataset_id], tag, add, code, result)
+
+    if code != status.HTTP_200_OK:
+        raise HTTPException(status_code=code, detail=result)
+    if result.get("data") and result["data"]["success"]:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    return Response(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+async def tag_chunk(items: List[bulk.Item]) -> List[Mapping]:
+    """
+    Apply a chunk of tag assignments with one batch mutation per tag
+    and action. As when coalescing, an assignment followed by an opposite
+    one of the same tag and dataset is superseded and not sent.
+    """
+    last = { (a.dataset, a.tag): a.action for _, a in items }
+    groups: Dict[Tuple[str, bool], List[bulk.Item]] = {}
+    outcomes = []
+    for i, a in items:
+        if a.action != last[(a.dataset, a.tag)]:
+            outcomes.append({
+                "item": i, "id": a.dataset, "tag": a.tag,
+                "status": status.HTTP_409_CONFLICT, "error": superseded(a.action == "add")
+            })
+        else:
+            groups.setdefault((a.tag, a.action == "add"), []).append((i, a))
+
+    results = await asyncio.gather(*[
+        bulk.attempt(write_tags(tag, add, [a.dataset for _, a in group]))
+        for (tag, add), group in groups.items()
+    ])
+
+    for group, (code, result) in zip(groups.values(), results):
+        for i, a in group:
+            outcome = { "item": i, "id": a.dataset, "tag": a.tag, "status": code }
+            if code != status.HTTP_200_OK:
+                outcome["error"] = result
+            elif result.get("data") and result["data"]["success"]:
+                outcome["status"] = status.HTTP_204_NO_CONTENT
+            else:
+                outcome["status"] = status.HTTP_422_UNPROCESSABLE_ENTITY
+            outcomes.append(outcome)
+
+    return outcomes
+
 router = APIRouter()
 
-@router.get("", response_model=Datasets)
+def dependencies(entity) -> List[str]:
+    """
+    Urns whose mutation invalidates a cached dataset entity
+    """
+    urns = [entity["urn"]]
+    if entity.get("tags"):
+        urns.extend(t["tag"]["urn"] for t in entity["tags"]["tags"])
+
+    return urns
+
+
+def lookup_record(urn: str, entity: Any, error: Optional[str] = None) -> Mapping:
+    dataset = DatasetEnvelope.from_json(entity).dataset if entity else None
+    record = { "id": urn, "dataset": dataset }
+    if error is not None:
+        record["error"] = error
+
+    return jsonable_encoder(record, exclude_unset=True)
+
+
+async def lookup_chunk(
+    session: ClientSession,
+    urns: List[str],
+    limit: asyncio.Semaphore
+) -> List[Mapping]:
+    async with limit:
+        try:
+            data = await upstream.query(session, GET_BY_IDS.body(urns), upstream.BULK)
+        except HTTPException as e:
+            return [lookup_record(urn, None, str(e.detail)) for urn in urns]
+
+    records = []
+    for urn, entity in zip(urns, GET_BY_IDS.results(data, urns)):
+        if entity is not None:
+            await cache.set(urn, entity, dependencies(entity))
+        records.append(lookup_record(urn, entity))
+
+    return records
+
+
+async def lookup_stream(session: ClientSession, urns: List[str]) -> AsyncIterator[bytes]:
+    pending = []
+    for urn in dict.fromkeys(urns):
+        entity = await cache.get(urn)
+        if entity is None:
+            pending.append(urn)
+        else:
+            yield stream.line(lookup_record(urn, entity))
+
+    size = settings.LOOKUP_CHUNK_SIZE
+    limit = asyncio.Semaphore(settings.LOOKUP_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(lookup_chunk(session, pending[i:i + size], limit))
+        for i in range(0, len(pending), size)
+    ]
+    try:
+        for chunk in asyncio.as_completed(tasks):
+            for record in await chunk:
+                yield stream.line(record)
+    finally:
+        # Client went away or finished: stop any chunks still queued
+        for task in tasks:
+            task.cancel()
+
+
+async def preload(session: ClientSession, urns: List[str]) -> int:
+    """
+    Cache the given datasets for lookups by id, returning how many were found
+    """
+    size = settings.LOOKUP_CHUNK_SIZE
+    limit = asyncio.Semaphore(settings.LOOKUP_CONCURRENCY)
+    chunks = await asyncio.gather(*[
+        lookup_chunk(session, urns[i:i + size], limit)
+        for i in range(0, len(urns), size)
+    ])
+    return sum(1 for chunk in chunks for record in chunk if record["dataset"] is not None)
+
+
+@router.get("", response_model=Datasets, response_model_exclude_unset=True)
 async def by_query(
     req: Request,
     session: ClientSession = Depends(deps.get_session),
@@ -79,83 +345,151 @@ async def by_query(
     Retrieve datasets by query parameter
     """
     params = QueryParams(req)
-    body = OPERATIONS[params.type].body(params)
-    resp = await session.post(settings.DATAHUB_GRAPHQL, json=body)
-    if resp.status < 200 or resp.status > 299:
-        text = await resp.text()
-        raise HTTPException(status=resp.status, detail=text)
+    fields = SELECTION.resolve(params.fields)
+    results = await mirror.datasets(params)
+    if results is not None:
+        return respond(Datasets.from_json(results, fields))
 
-    data = await resp.json()
-    return Datasets.from_json(data["data"]["results"])
+    if params.type == QueryType.NAME and settings.TYPEAHEAD_ENABLED:
+        return respond(Datasets.from_json(await typeahead(session, params), fields))
+
+    operation = OPERATIONS[params.type]
+    scroll = params.cursor is not None and params.type != QueryType.NAME
+    if scroll or params.type == QueryType.NAME:
+        body = operation.scroll(params) if scroll else operation.body(params)
+        data = await upstream.query(session, body)
+        results = data["data"]["results"]
+    else:
+        results = await prefetch.search(
+            params, operation.body, lambda p: fanout.search(session, p, operation.body)
+        )
+
+    page = Datasets.from_json(results, fields)
+    if scroll:
+        page.paging = cursor.paging(params.start, results)
+
+    return respond(page)
 
 
-@router.get("/{dataset_id}", response_model=DatasetEnvelope)
+@router.get("/export")
+async def export(
+    req: Request,
+    session: ClientSession = Depends(deps.get_session),
+) -> Any:
+    """
+    Retrieve every dataset, streamed as NDJSON
+    """
+    fields = SELECTION.resolve(projection.parse(req))
+    count = settings.EXPORT_PAGE_SIZE
+    return StreamingResponse(
+        stream.scroll(
+            session,
+            lambda scroll_id: EXPORT.body(scroll_id, count, shape=fields),
+            lambda e: DatasetEnvelope.from_json(e, fields)
+        ),
+        media_type=stream.MEDIA_TYPE
+    )
+
+
+@router.get("/facets", response_model=Facets)
+async def facet_counts(
+    req: Request,
+    session: ClientSession = Depends(deps.get_session),
+) -> Any:
+    """
+    Retrieve dataset counts per tag, platform, origin and subtype,
+    optionally for the datasets matching query
+    """
+    data = await facets(session, req.query_params.get("query"))
+    return respond(Facets.from_json(data["data"]["results"]))
+
+
+@router.post("/tags:bulk")
+async def tag_datasets(req: Request) -> Any:
+    """
+    Add or remove tags on datasets from a JSON array, NDJSON or CSV
+    upload, streaming one NDJSON outcome per assignment as chunks finish
+    """
+    return bulk.BulkResponse(bulk.run(req, TagAssignment, tag_chunk))
+
+
+@router.post(":lookup")
+async def lookup(
+    payload: LookupDatasets,
+    session: ClientSession = Depends(deps.get_session),
+) -> Any:
+    """
+    Retrieve many datasets by id, streamed as NDJSON in completion order
+    """
+    return StreamingResponse(
+        lookup_stream(session, payload.urns),
+        media_type=stream.MEDIA_TYPE
+    )
+
+
+@router.get("/{dataset_id}", response_model=DatasetEnvelope, response_model_exclude_unset=True)
 async def by_id(
     dataset_id: str,
+    req: Request,
     session: ClientSession = Depends(deps.get_session),
 ) -> Any:
     """
     Retrieve a dataset by id
     """
-    body = GET_BY_ID.body(dataset_id)
-    resp = await session.post(settings.DATAHUB_GRAPHQL, json=body)
-    if resp.status < 200 or resp.status > 299:
-        text = await resp.text()
-        raise HTTPException(status=resp.status, detail=text)
+    fields = SELECTION.resolve(projection.parse(req))
+    key = projection.key(dataset_id, fields)
+    entity = await cache.get(key)
+    if entity is None:
+        entity = await loader(fields).load(dataset_id)
+        if entity is not None:
+            await cache.set(key, entity, dependencies(entity))
+
+    return respond(DatasetEnvelope.from_json(entity, fields))
+
+
+@router.get("/{dataset_id}/fields", response_model=Fields)
+async def fields_by_id(
+    dataset_id: str,
+    req: Request,
+    session: ClientSession = Depends(deps.get_session),
+) -> Any:
+    """
+    Retrieve a page of the dataset's schema fields, optionally only
+    those whose path starts with match
+    """
+    params = QueryParams(req)
+    fields = SCHEMA_ONLY
+    key = projection.key(dataset_id, fields)
+    entity = await cache.get(key)
+    if entity is None:
+        entity = await loader(fields).load(dataset_id)
+        if entity is None:
+            raise HTTPException(status.HTTP_404_NOT_FOUND)
+        await cache.set(key, entity, [dataset_id])
 
-    data = await resp.json()
-    return DatasetEnvelope.from_json(data["data"]["dataset"])
+    match = req.query_params.get("match")
+    return respond(Fields.from_json(entity, params.start, params.limit, match))
 
 
 @router.post("/{dataset_id}/tags")
 async def add_tag(
     dataset_id: str,
     payload: AddTag,
-    response: Response,
     session: ClientSession = Depends(deps.get_session),
 ) -> Any:
     """
     Add a tag to a dataset
     """
-    body = ADD_TAG.body(payload.tag, dataset_id)
-    resp = await session.post(settings.DATAHUB_GRAPHQL, json=body)
-    if resp.status == status.HTTP_200_OK:
-        result = await resp.json()
-        if "data" in result:
-            if result["data"]["success"]:
-                response.status = status.HTTP_204_NO_CONTENT
-            else:
-                response.status = status.HTTP_422_UNPROCESSABLE_ENTITY
-        else:
-            response.status = status.HTTP_422_UNPROCESSABLE_ENTITY
-    else:
-        text = await resp.text()
-        response.status = resp.status
-        raise HTTPException(status=resp.status, detail=text)
+    return await tag_write(session, dataset_id, payload.tag, add=True)
 
 
 @router.delete("/{dataset_id}/tags/{tag_id}")
 async def remove_tag(
     dataset_id: str,
     tag_id: str,
-    response: Response,
     session: ClientSession = Depends(deps.get_session),
 ) -> Any:
     """
     Remove a tag from a dataset
     """
-    body = REMOVE_TAG.body(tag_id, dataset_id)
-    resp = await session.post(settings.DATAHUB_GRAPHQL, json=body)
-    if resp.status == status.HTTP_200_OK:
-        result = await resp.json()
-        if "data" in result:
-            if result["data"]["success"]:
-                response.status = status.HTTP_204_NO_CONTENT
-            else:
-                response.status = status.HTTP_422_UNPROCESSABLE_ENTITY
-        else:
-            response.status = status.HTTP_422_UNPROCESSABLE_ENTITY
-    else:
-        text = await resp.text()
-        response.status = resp.status
-        raise HTTPException(status=resp.status, detail=text)
+    return await tag_write(session, dataset_id, tag_id, add=False)
@@ -0,0 +1,71 @@
+import asyncio
+import copy
+
+from typing import Any, Callable, List, Mapping
+from aiohttp import ClientSession
+
+from . import upstream
+from .params import QueryParams
+from ...core.config import settings
+
+def slices(params: QueryParams, size: int) -> List[QueryParams]:
+    """
+    Consecutive pages of at most size covering the requested page
+    """
+    end = params.start + params.limit
+    pages = []
+    for start in range(params.start, end, size):
+        page = copy.copy(params)
+        page.start = start
+        page.limit = min(size, end - start)
+        pages.append(page)
+
+    return pages
+
+
+async def search(
+    session: ClientSession,
+    params: QueryParams,
+    body: Callable[[QueryParams], Mapping]
+) -> Mapping[str, Any]:
+    """
+    Search results for a page. Pages larger than FANOUT_PAGE_SIZE are
+    fetched as concurrent searches of that size and merged in order,
+    dropping entities an earlier slice already returned.
+    """
+    size = settings.FANOUT_PAGE_SIZE
+    if not settings.FANOUT_ENABLED or params.limit <= size:
+        data = await upstream.query(session, body(params))
+        return data["data"]["results"]
+
+    limit = asyncio.Semaphore(settings.FANOUT_CONCURRENCY)
+
+    async def fetch(page: QueryParams) -> Mapping[str, Any]:
+        async with limit:
+            data = await upstream.query(session, body(page))
+            return data["data"]["results"]
+
+    tasks = [asyncio.ensure_future(fetch(page)) for page in slices(params, size)]
+    try:
+        results = await asyncio.gather(*tasks)
+    finally:
+        # One slice failed: stop the rest
+        for task in tasks:
+            task.cancel()
+
+    seen = set()
+    entities = []
+    for page in results:
+        for e in page["entities"]:
+            urn = e["entity"]["urn"]
+            if urn not in seen:
+                seen.add(urn)
+                entities.append(e)
+
+    return {
+        **results[0],
+        "start": params.start,
+        "count": len(entities),
+        "total": max(page["total"] for page in results),
+        "entities": entities,
+    }
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+from typing import Any, Mapping
+from aiohttp import ClientSession
+from fastapi import status, APIRouter, HTTPException, Request
+from fastapi.logger import logger
+
+from . import datasets, stream
+from .params import QueryParams
+from .responses import respond
+from ...core import client
+from ...core.config import settings
+from ...core.fields import FieldIndex
+from ...schemas import DatasetFields
+
+# Only what the index holds
+SHAPE = frozenset(["id", "platform", "fields"])
+
+# Replaced whole by each build
+INDEX = FieldIndex()
+
+async def build(session: ClientSession) -> Mapping[str, Any]:
+    """
+    Index the schema fields of every dataset and swap the index in
+    """
+    global INDEX
+    index = FieldIndex()
+    count = settings.EXPORT_PAGE_SIZE
+    async for page in stream.pages(
+        session, lambda scroll_id: datasets.EXPORT.body(scroll_id, count, shape=SHAPE)
+    ):
+        for e in page:
+            platform = e.get("platform") or {}
+            schema = e.get("schema") or {}
+            index.add(e["urn"], platform.get("name"), schema.get("fields") or [])
+
+    index.built = time.time()
+    index.lookups = INDEX.lookups
+    INDEX = index
+    return index.stats()
+
+
+async def run() -> None:
+    """
+    Rebuild the index every FIELDS_REFRESH seconds
+    """
+    while True:
+        try:
+            await build(client.get_session())
+        except Exception as e:
+            logger.warning(f"Field index build failed: {e!r}")
+
+        await asyncio.sleep(settings.FIELDS_REFRESH)
+
+router = APIRouter()
+
+@router.get("", response_model=DatasetFields)
+async def search(req: Request) -> Any:
+    """
+    Retrieve schema fields across all datasets by path, type and platform
+    """
+    if INDEX.built is None:
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, detail="field index is loading")
+
+    params = QueryParams(req)
+    query = req.query_params
+    total, entries = INDEX.search(
+        query.get("name"), query.get("type"), query.get("platform"),
+        params.start, params.limit
+    )
+    return respond(DatasetFields.from_json(total, entries, params.start, params.limit))
@@ -1,7 +1,47 @@
-from typing import Mapping
+import re
+
+from functools import partial
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Union
 
 from . import queries
 from .params import QueryParams
+from .projection import Selection
+from ...core.config import settings
+
+Values = Union[str, Selection]
+
+OPERATION = re.compile(
+    r"\s*query\s+\w+\s*(?:\((?P<defs>[^)]*)\))?\s*\{(?P<selection>.*)\}\s*$", re.S
+)
+VARIABLE = re.compile(r"\$(\w+)")
+NAME = re.compile(r"[_A-Za-z]\w*")
+
+def selected(values: Values, shape: Optional[FrozenSet[str]]) -> str:
+    """
+    Values text for a projection shape, plain text is never projected
+    """
+    if isinstance(values, Selection):
+        return values.values(values.resolve(shape))
+
+    return values
+
+
+class Compiled:
+    """
+    Query text compiled once per projection shape of the values
+    """
+    def __init__(self, compile: Callable[[str], str], values: Values):
+        self.compile = compile
+        self.values = values
+        self.queries: Dict[Optional[FrozenSet[str]], str] = {}
+
+    def __call__(self, shape: Optional[FrozenSet[str]] = None) -> str:
+        query = self.queries.get(shape)
+        if query is None:
+            query = self.queries[shape] = self.compile(selected(self.values, shape))
+
+        return query
+
 
 class AddTagFactory:
     def __init__(self):
@@ -15,6 +55,9 @@ class AddTagFactory:
             }
         }
 
+    def compile(self) -> List[str]:
+        return [self.query]
+
 
 class RemoveTagFactory:
     def __init__(self):
@@ -28,115 +71,287 @@ class RemoveTagFactory:
             }
         }
 
+    def compile(self) -> List[str]:
+        return [self.query]
 
-class GetOneFactory:
-    def __init__(self, type: str, values: str):
-        self.query = queries.by_id(type, values)
 
-    def body(self, id: str) -> Mapping:
+class BatchAddTagsFactory:
+    def __init__(self):
+        self.query = queries.batch_add_tags()
+
+    def body(self, tags: List[str], rsrcs: List[str]) -> Mapping:
         return {
             "operation": self.query,
+            "variables": {
+                "input": {
+                    "tagUrns": tags,
+                    "resources": [{ "resourceUrn": rsrc } for rsrc in rsrcs]
+                }
+            }
+        }
+
+    def compile(self) -> List[str]:
+        return [self.query]
+
+
+class BatchRemoveTagsFactory:
+    def __init__(self):
+        self.query = queries.batch_remove_tags()
+
+    def body(self, tags: List[str], rsrcs: List[str]) -> Mapping:
+        return {
+            "operation": self.query,
+            "variables": {
+                "input": {
+                    "tagUrns": tags,
+                    "resources": [{ "resourceUrn": rsrc } for rsrc in rsrcs]
+                }
+            }
+        }
+
+    def compile(self) -> List[str]:
+        return [self.query]
+
+
+class GetOneFactory:
+    def __init__(self, type: str, values: Values):
+        self.query = Compiled(partial(queries.by_id, type), values)
+
+    def body(self, id: str, shape: Optional[FrozenSet[str]] = None) -> Mapping:
+        return {
+            "operation": self.query(shape),
             "variables": { "urn": id }
         }
 
+    def compile(self) -> List[str]:
+        return [self.query()]
+
+
+class GetManyFactory:
+    def __init__(self, type: str, values: Values):
+        self.type = type
+        self.values = values
+        self.queries = {}
+
+    def query(self, count: int, shape: Optional[FrozenSet[str]] = None) -> str:
+        query = self.queries.get((count, shape))
+        if query is None:
+            values = selected(self.values, shape)
+            query = self.queries[(count, shape)] = queries.by_ids(self.type, values, count)
+
+        return query
+
+    def body(self, ids: List[str], shape: Optional[FrozenSet[str]] = None) -> Mapping:
+        return {
+            "operation": self.query(len(ids), shape),
+            "variables": { f"u{i}": id for i, id in enumerate(ids) }
+        }
+
+    def results(self, data: Mapping, ids: List[str]) -> List[Any]:
+        return [data["data"].get(f"e{i}") for i in range(len(ids))]
+
+    def compile(self) -> List[str]:
+        """
+        Queries for single lookups, full batches and lookup chunks
+        """
+        counts = { 1, settings.BATCH_MAX_SIZE, settings.LOOKUP_CHUNK_SIZE }
+        return [self.query(count) for count in sorted(counts)]
+
+
+class ScrollFactory:
+    def __init__(self, type: str, values: Values):
+        self.type = type
+        self.query = Compiled(queries.scroll, values)
+
+    def body(
+        self,
+        scroll_id: Optional[str],
+        count: int,
+        query: str = "*",
+        filters: Optional[List[Mapping]] = None,
+        shape: Optional[FrozenSet[str]] = None
+    ) -> Mapping:
+        input = {
+            "types": [self.type],
+            "query": query,
+            "count": count,
+            "scrollId": scroll_id
+        }
+        if filters:
+            input["filters"] = filters
+
+        return {
+            "operation": self.query(shape),
+            "variables": { "input": input }
+        }
+
+    def compile(self) -> List[str]:
+        return [self.query()]
+
 
 class GetAllFactory:
-    def __init__(self, type: str, values: str):
+    def __init__(self, type: str, values: Values):
         self.type = type
-        self.query = queries.by_query(values)
+        self.query = Compiled(queries.by_query, values)
+        self.scroller = ScrollFactory(type, values)
 
     def body(self, params: QueryParams) -> Mapping:
         return {
-            "operation": self.query,
+            "operation": self.query(params.fields),
             "variables": {
                 "input": {
-                    "type": type,
+                    "type": self.type,
                     "query": "*",
-                    "start": params.offset,
+                    "start": params.start,
                     "count": params.limit
                 }
             } 
         }
 
+    def scroll(self, params: QueryParams) -> Mapping:
+        return self.scroller.body(
+            params.scroll_id, params.limit, shape=params.fields
+        )
+
+    def compile(self) -> List[str]:
+        return [self.query()] + self.scroller.compile()
+
 
 class NameFactory:
-    def __init__(self, type: str, values: str):
+    def __init__(self, type: str, values: Values):
         self.type = type
-        self.query = queries.by_name(values)
+        self.query = Compiled(queries.by_name, values)
 
     def body(self, params: QueryParams) -> Mapping:
         return {
-            "operation": self.query,
+            "operation": self.query(params.fields),
             "variables": {
                 "input": {
-                    "type": type,
-                    "query": self.query,
+                    "type": self.type,
+                    "query": params.query,
                     "limit": params.limit
                 }
             } 
         }
 
+    def compile(self) -> List[str]:
+        return [self.query()]
+
 
 class TagsFactory:
-    def __init__(self, type: str, values: str):
+    def __init__(self, type: str, values: Values):
         self.type = type
-        self.query = queries.by_query(values)
+        self.query = Compiled(queries.by_query, values)
+        self.scroller = ScrollFactory(type, values)
 
     def body(self, params: QueryParams) -> Mapping:
         return {
-            "operation": self.query,
+            "operation": self.query(params.fields),
             "variables": {
                 "input": {
-                    "type": type,
-                    "query": f"tags:{self.query}",
+                    "type": self.type,
+                    "query": f"tags:{params.query}",
                     "start": params.start,
                     "count": params.limit
                 }
             } 
         }
 
+    def scroll(self, params: QueryParams) -> Mapping:
+        return self.scroller.body(
+            params.scroll_id, params.limit, f"tags:{params.query}",
+            shape=params.fields
+        )
+
+    def compile(self) -> List[str]:
+        return [self.query()] + self.scroller.compile()
+
 
 class QueryFactory:
-    def __init__(self, type: str, values: str):
+    def __init__(self, type: str, values: Values):
         self.type = type
-        self.query = queries.by_query(values)
+        self.query = Compiled(queries.by_query, values)
+        self.scroller = ScrollFactory(type, values)
 
     def body(self, params: QueryParams) -> Mapping:
         return {
-            "operation": self.query,
+            "operation": self.query(params.fields),
             "variables": {
                 "input": {
-                    "type": type,
-                    "query": f"*{self.query}*",
+                    "type": self.type,
+                    "query": f"*{params.query}*",
                     "start": params.start,
                     "count": params.limit
                 }
             } 
         }
 
+    def scroll(self, params: QueryParams) -> Mapping:
+        return self.scroller.body(
+            params.scroll_id, params.limit, f"*{params.query}*",
+            shape=params.fields
+        )
+
+    def compile(self) -> List[str]:
+        return [self.query()] + self.scroller.compile()
+
 
 class FilterFactory:
-    def __init__(self, field: str, type: str, values: str):
-        self.field = filter
-        self.query = queries.by_query(values)
+    def __init__(self, field: str, type: str, values: Values):
+        self.field = field
+        self.type = type
+        self.query = Compiled(queries.by_query, values)
+        self.scroller = ScrollFactory(type, values)
 
     def body(self, value: str, params: QueryParams) -> Mapping:
         return {
-            "operation": self.query,
+            "operation": self.query(params.fields),
             "variables": {
                 "input": {
-                    "type": type,
+                    "type": self.type,
                     "query": "*",
                     "start": params.start,
                     "count": params.limit,
-                    "filters": {
+                    "filters": [{
                         "field": self.field,
                         "value": value
-                    }
+                    }]
                 }
             } 
         }
 
+    def scroll(self, value: str, params: QueryParams) -> Mapping:
+        return self.scroller.body(
+            params.scroll_id, params.limit, "*",
+            [{ "field": self.field, "value": value }],
+            params.fields
+        )
+
+    def compile(self) -> List[str]:
+        return [self.query()] + self.scroller.compile()
+
+
+class FacetsFactory:
+    def __init__(self, type: str, facets: List[str]):
+        self.type = type
+        self.facets = facets
+        self.query = queries.facets()
+
+    def body(self, query: Optional[str]) -> Mapping:
+        return {
+            "operation": self.query,
+            "variables": {
+                "input": {
+                    "types": [self.type],
+                    "query": f"*{query}*" if query else "*",
+                    "facets": self.facets
+                }
+            }
+        }
+
+    def compile(self) -> List[str]:
+        return [self.query]
+
 
 class PlatformsFactory:
     def __init__(self, values: str):
@@ -155,3 +370,81 @@ class PlatformsFactory:
                 }
             }
         }
+
+    def compile(self) -> List[str]:
+        return [self.query]
+
+
+def aliased(selection: str, prefix: str) -> str:
+    """
+    Selection with every top-level field aliased under prefix
+    """
+    out = []
+    depth = 0
+    i = 0
+    after_alias = False
+    while i < len(selection):
+        c = selection[i]
+        if depth == 0 and (c.isalpha() or c == "_"):
+            name = NAME.match(selection, i).group()
+            i += len(name)
+            if after_alias:
+                out.append(name)
+                after_alias = False
+            elif selection[i:].lstrip().startswith(":"):
+                out.append(prefix + name)
+                after_alias = True
+            else:
+                out.append(f"{prefix}{name}: {name}")
+            continue
+
+        if c in "{(":
+            depth += 1
+        elif c in "})":
+            depth -= 1
+        out.append(c)
+        i += 1
+
+    return "".join(out)
+
+
+def merge(bodies: List[Mapping]) -> Mapping:
+    """
+    One query running the queries of every body, each with its variables
+    and top-level fields prefixed by its position, as in s0_results
+    """
+    defs = []
+    selections = []
+    variables = {}
+    for i, body in enumerate(bodies):
+        prefix = f"s{i}_"
+        match = OPERATION.match(body["operation"])
+        rename = lambda text: VARIABLE.sub(lambda v: f"${prefix}{v.group(1)}", text)
+        if match["defs"]:
+            defs.append(rename(match["defs"]))
+        selections.append(aliased(rename(match["selection"]), prefix))
+        variables.update({ prefix + name: value for name, value in body["variables"].items() })
+
+    params = f"({', '.join(defs)})" if defs else ""
+    return {
+        "operation": f"query batch{params} {{ {' '.join(selections)} }}",
+        "variables": variables
+    }
+
+
+def split(data: Mapping, count: int) -> List[Mapping]:
+    """
+    Results of a merged query in the shape each body's own query returns,
+    with the errors whose path starts at one of its fields
+    """
+    results = [{ "data": {}, "errors": [] } for _ in range(count)]
+    for key, value in (data.get("data") or {}).items():
+        i, _, name = key[1:].partition("_")
+        results[int(i)]["data"][name] = value
+    for error in data.get("errors") or []:
+        path = error.get("path") or [""]
+        i, _, _ = str(path[0])[1:].partition("_")
+        if i.isdigit() and int(i) < count:
+            results[int(i)]["errors"].append(error)
+
+    return results
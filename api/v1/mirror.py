@@ -0,0 +1,145 @@
+import asyncio
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, List, Mapping, Optional
+
+from .params import QueryParams, QueryType
+from ...core.config import settings
+from ...core.mirror import Catalog
+
+def results(start: int, total: int, entities: List[Any]) -> Mapping:
+    """
+    Mirror rows in the shape of DataHub search results
+    """
+    return {
+        "__typename": "SearchResults",
+        "start": start,
+        "count": len(entities),
+        "total": total,
+        "entities": [{ "entity": e } for e in entities]
+    }
+
+
+class Mirror:
+    """
+    Read replica of the catalog kept in SQLite and synced in the
+    background. Reads are served from it while the last sync is within
+    MIRROR_MAX_STALENESS, and accepted tag mutations are written through.
+    Catalog calls run one at a time on a thread of their own, off the
+    event loop.
+    """
+    def __init__(self, catalog: Optional[Catalog]):
+        self.catalog = catalog
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="mirror")
+        self.synced = catalog.meta("synced") if catalog else None
+        self.full = catalog.meta("full") if catalog else None
+        self.modified = catalog.meta("modified") if catalog else None
+        self.syncs = 0
+        self.failures = 0
+
+    async def call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, partial(fn, *args)
+        )
+
+    def fresh(self) -> bool:
+        return (
+            self.synced is not None
+            and time.time() - self.synced <= settings.MIRROR_MAX_STALENESS
+        )
+
+    # Reads, None when the mirror cannot serve the request
+
+    def usable(self, params: QueryParams) -> bool:
+        return self.catalog is not None and params.cursor is None and self.fresh()
+
+    async def datasets(self, params: QueryParams) -> Optional[Mapping]:
+        if not self.usable(params):
+            return None
+
+        if params.type == QueryType.NAME:
+            return {
+                "__typename": "AutoCompleteResults",
+                "entities": await self.call(self.catalog.datasets_by_name, params.query, params.limit)
+            }
+        if params.type == QueryType.QUERY:
+            total, entities = await self.call(
+                self.catalog.search_datasets, params.query, params.start, params.limit
+            )
+        elif params.type == QueryType.TAGS:
+            urns = [f"urn:li:tag:{t.strip()}" for t in params.query.split(",") if t.strip()]
+            total, entities = await self.call(
+                self.catalog.datasets_by_tags, urns, params.start, params.limit
+            )
+        else:
+            total, entities = await self.call(self.catalog.datasets, params.start, params.limit)
+
+        return results(params.start, total, entities)
+
+    async def datasets_by_tag(self, tag: str, params: QueryParams) -> Optional[Mapping]:
+        if not self.usable(params):
+            return None
+
+        total, entities = await self.call(
+            self.catalog.datasets_by_tags, [tag], params.start, params.limit
+        )
+        return results(params.start, total, entities)
+
+    async def tags(self, params: QueryParams) -> Optional[Mapping]:
+        if not self.usable(params):
+            return None
+
+        if params.type == QueryType.NAME:
+            return {
+                "__typename": "AutoCompleteResults",
+                "entities": await self.call(self.catalog.tags_by_name, params.query, params.limit)
+            }
+        if params.type == QueryType.QUERY:
+            total, entities = await self.call(
+                self.catalog.search_tags, params.query, params.start, params.limit
+            )
+        else:
+            total, entities = await self.call(self.catalog.tags, params.start, params.limit)
+
+        return results(params.start, total, entities)
+
+    async def platforms(self, params: QueryParams) -> Optional[List[Mapping]]:
+        if not self.usable(params):
+            return None
+
+        entities = await self.call(self.catalog.platforms)
+        return [{ "id": "Platforms", "content": [{ "entity": e } for e in entities] }]
+
+    # Write-through of mutations accepted by DataHub
+
+    async def tag_datasets(self, datasets: List[str], tag: str, add: bool) -> None:
+        if self.catalog is not None:
+            await self.call(self.catalog.tag_datasets, datasets, tag, add)
+
+    async def put_tags(self, entities: List[Mapping]) -> None:
+        if self.catalog is not None:
+            await self.call(self.catalog.put_tags, entities, time.time())
+
+    async def delete_tag(self, urn: str) -> None:
+        if self.catalog is not None:
+            await self.call(self.catalog.remove_tag, urn)
+
+    def stats(self) -> Mapping[str, Any]:
+        if self.catalog is None:
+            return { "enabled": False }
+
+        return {
+            "enabled": True,
+            "fresh": self.fresh(),
+            "syncs": self.syncs,
+            "failures": self.failures,
+            **self.catalog.counts,
+            "age": round(time.time() - self.synced, 1) if self.synced else None,
+        }
+
+
+mirror = Mirror(
+    Catalog(settings.MIRROR_PATH, settings.MIRROR_MODIFIED_FIELD) if settings.MIRROR_PATH else None
+)
@@ -1,6 +1,8 @@
 from enum import auto, Enum
-from lib2to3.pgen2.token import NAME
-from fastapi import Request
+from typing import Mapping
+from fastapi import status, HTTPException, Request
+
+from . import cursor, projection
 
 class QueryType(Enum):
     ALL = auto()
@@ -8,12 +10,35 @@ class QueryType(Enum):
     TAGS = auto()
     QUERY = auto()
 
+def number(params: Mapping[str, str], name: str, default: int) -> int:
+    """
+    Non-negative integer query parameter, 400 when it is anything else
+    """
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST, detail=f"{name} must be a non-negative integer"
+        )
+
+    return value
+
+
 class QueryParams:
     def __init__(self, req: Request):
-        params = req.query_params()
+        params = req.query_params
 
-        self.limit = params.get("limit", 10)
-        self.start = params.get("offset", 0)
+        self.limit = number(params, "limit", 10)
+        self.start = number(params, "offset", 0)
+        self.cursor = params.get("cursor")
+        self.scroll_id = None
+        self.query = None
+        self.fields = projection.parse(req)
+
+        if self.cursor is not None:
+            self.scroll_id, self.start = cursor.decode(self.cursor)
 
         if "query" in params:
             self.type = QueryType.QUERY
@@ -21,8 +46,15 @@ class QueryParams:
         elif "name" in params:
             self.type = QueryType.NAME
             self.query = params["name"]
-        elif "tags" is not None:
+        elif "tags" in params:
             self.type = QueryType.TAGS
             self.query = params["tags"]
         else:
             self.type = QueryType.ALL
+
+
+def defaults() -> QueryParams:
+    """
+    Parameters of a request without a query string
+    """
+    return QueryParams(Request({ "type": "http", "query_string": b"" }))
@@ -1,14 +1,21 @@
 import aiohttp
 
-from typing import Any, List
+from functools import partial
+from typing import Any, List, Mapping, Optional, Tuple
 from aiohttp import ClientSession
 from fastapi import status, APIRouter, Depends, HTTPException, Request, Response
 
-from .datasets import QUERY_VALUES as DATASET_VALUES
-from .params import QueryParams
-from . import graphql
+from .datasets import SELECTION as DATASET_SELECTION
+from .mirror import mirror
+from .responses import respond
+from .params import defaults, QueryParams, QueryType
+from . import cursor, fanout, graphql, prefetch, upstream
 from .. import deps
+from ...core import client, codec
+from ...core.cache import cache
 from ...core.config import settings
+from ...core.index import TextIndex
+from ...core.stale import stale
 from ...schemas import AddTag, Datasets, Platforms, PlatformEnvelope
 
 QUERY_VALUES: str = """
@@ -24,8 +31,56 @@ QUERY_VALUES: str = """
 """
 
 GET_ALL   = graphql.PlatformsFactory(QUERY_VALUES)
-GET_BY_ID = graphql.GetOneFactory("tag", QUERY_VALUES)
-DATASETS_BY_PLATFORM = graphql.FilterFactory("platorm", "DATASET", DATASET_VALUES)
+GET_BY_ID = graphql.GetOneFactory("dataPlatform", QUERY_VALUES)
+DATASETS_BY_PLATFORM = graphql.FilterFactory("platform", "DATASET", DATASET_SELECTION)
+
+async def listing(session: ClientSession, params: QueryParams) -> Any:
+    body = GET_ALL.body(params)
+    if not settings.STALE_ENABLED:
+        return await upstream.query(session, body)
+
+    return await stale.get(
+        "platforms",
+        codec.encode_body(body),
+        lambda: upstream.query(client.get_session(), body)
+    )
+
+# Local index of every platform answering name and query searches
+INDEX = TextIndex()
+
+def index_entry(entity: Mapping) -> Tuple[str, str, str, Mapping]:
+    props = entity.get("properties") or {}
+    return entity["urn"], entity["name"], props.get("name") or "", entity
+
+
+async def reindex(session: ClientSession) -> Mapping[str, int]:
+    """
+    Bring the index up to date with a full platform listing
+    """
+    params = defaults()
+    params.limit = settings.EXPORT_PAGE_SIZE
+    data = await upstream.query(session, GET_ALL.body(params), upstream.BULK)
+    platforms = [m for m in data["data"]["results"]["modules"] if m["id"] == "Platforms"]
+    entities = [e["entity"] for m in platforms for e in m["content"]]
+    return INDEX.sync(index_entry(e) for e in entities)
+
+
+def local(params: QueryParams) -> Optional[List[Mapping]]:
+    """
+    Listing modules for a name or query search answered from the index,
+    None when the index cannot answer it
+    """
+    if not settings.INDEX_ENABLED or not INDEX.loaded:
+        return None
+
+    if params.type == QueryType.NAME:
+        entities = INDEX.prefix(params.query, params.limit)
+    elif params.type == QueryType.QUERY:
+        _, entities = INDEX.search(params.query, params.start, params.limit)
+    else:
+        return None
+
+    return [{ "id": "Platforms", "content": [{ "entity": e } for e in entities] }]
 
 router = APIRouter()
 
@@ -38,14 +93,14 @@ async def by_query(
     Retrieve all platforms
     """
     params = QueryParams(req)
-    body = GET_ALL.body(params)
-    resp = await session.post(settings.DATAHUB_GRAPHQL, json=body)
-    if resp.status < 200 or resp.status > 299:
-        text = await resp.text()
-        raise HTTPException(status=resp.status, detail=text)
+    modules = local(params)
+    if modules is None:
+        modules = await mirror.platforms(params)
+    if modules is None:
+        data = await listing(session, params)
+        modules = data["data"]["results"]["modules"]
 
-    data = await resp.json()
-    return Platforms.from_json(data["data"]["results"]["modules"])
+    return respond(Platforms.from_json(modules))
 
 
 @router.get("/{platform_id}", response_model=PlatformEnvelope)
@@ -56,17 +111,17 @@ async def by_id(
     """
     Retrieve a platform by id
     """
-    body = GET_BY_ID.body(platform_id)
-    resp = await session.post(settings.DATAHUB_GRAPHQL, json=body)
-    if resp.status < 200 or resp.status > 299:
-        text = await resp.text()
-        raise HTTPException(status=resp.status, detail=text)
+    entity = await cache.get(platform_id)
+    if entity is None:
+        body = GET_BY_ID.body(platform_id)
+        data = await upstream.query(session, body, upstream.LOOKUP)
+        entity = data["data"]["dataPlatform"]
+        await cache.set(platform_id, entity, [platform_id])
 
-    data = await resp.json()
-    return PlatformEnvelope.from_json(data["data"]["dataPlatform"])
+    return respond(PlatformEnvelope.from_json(entity))
 
 
-@router.get("/{platform_id}/datasets", response_model=Datasets)
+@router.get("/{platform_id}/datasets", response_model=Datasets, response_model_exclude_unset=True)
 async def datasets_by_platform(
     platform_id: str,
     req: Request,
@@ -76,11 +131,19 @@ async def datasets_by_platform(
     Retrieve datasets for the platform
     """
     params = QueryParams(req)
-    body = DATASETS_BY_PLATFORM.body(platform_id, params)
-    resp = await session.post(settings.DATAHUB_GRAPHQL, json=body)
-    if resp.status < 200 or resp.status > 299:
-        text = await resp.text()
-        raise HTTPException(status=resp.status, detail=text)
-
-    data = await resp.json()
-    return Datasets.from_json(data["data"]["results"])
+    fields = DATASET_SELECTION.resolve(params.fields)
+    scroll = params.cursor is not None
+    if scroll:
+        data = await upstream.query(session, DATASETS_BY_PLATFORM.scroll(platform_id, params))
+        results = data["data"]["results"]
+    else:
+        body = partial(DATASETS_BY_PLATFORM.body, platform_id)
+        results = await prefetch.search(
+            params, body, lambda p: fanout.search(session, p, body)
+        )
+
+    page = Datasets.from_json(results, fields)
+    if scroll:
+        page.paging = cursor.paging(params.start, results)
+
+    return respond(page)
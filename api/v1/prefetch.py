@@ -0,0 +1,43 @@
+import copy
+
+from typing import Any, Awaitable, Callable, Mapping
+
+from . import upstream
+from .params import QueryParams
+from ...core import codec
+from ...core.config import settings
+from ...core.prefetch import Prefetcher
+
+prefetcher = Prefetcher(
+    settings.PREFETCH_TTL,
+    settings.PREFETCH_MAX_ENTRIES,
+    settings.PREFETCH_CONCURRENCY
+)
+
+async def search(
+    params: QueryParams,
+    body: Callable[[QueryParams], Mapping],
+    fetch: Callable[[QueryParams], Awaitable[Mapping[str, Any]]]
+) -> Mapping[str, Any]:
+    """
+    Search results for a page, taken from its prefetch when there is one.
+    The following page is then fetched ahead while the search lane is
+    idle. Pages are keyed by their encoded search body.
+    """
+    if not settings.PREFETCH_ENABLED:
+        return await fetch(params)
+
+    results = await prefetcher.get(codec.encode_body(body(params)))
+    if results is None:
+        results = await fetch(params)
+
+    following = copy.copy(params)
+    following.start = params.start + params.limit
+    if results["entities"] and following.start < results["total"]:
+        prefetcher.ahead(
+            codec.encode_body(body(following)),
+            lambda: fetch(following),
+            upstream.spare(upstream.SEARCH)
+        )
+
+    return results
@@ -0,0 +1,83 @@
+from typing import FrozenSet, Iterable, Mapping, Optional
+from fastapi import status, HTTPException, Request
+
+DEFAULT = "*"
+
+def parse(req: Request) -> FrozenSet[str]:
+    """
+    Requested shape from the fields and include parameters. Without fields
+    the default projection is assumed and include adds to it.
+    """
+    params = req.query_params
+    fields = params.get("fields")
+    include = params.get("include")
+
+    names = set()
+    for value in (fields or DEFAULT, include or ""):
+        names.update(n.strip() for n in value.split(",") if n.strip())
+
+    return frozenset(names)
+
+
+def key(id: str, fields: Optional[FrozenSet[str]]) -> str:
+    """
+    Cache key for an entity fetched with the given fields
+    """
+    return id if fields is None else f"{id}?{','.join(sorted(fields))}"
+
+
+class Selection:
+    """
+    GraphQL values for an entity, built from a fragment per public field.
+    Fields sharing a fragment select it once.
+    """
+    def __init__(
+        self,
+        typename: str,
+        fragments: Mapping[str, str],
+        default: Iterable[str],
+        aliases: Optional[Mapping[str, str]] = None
+    ):
+        self.typename = typename
+        self.fragments = fragments
+        self.default = frozenset(default)
+        self.aliases = aliases or {}
+
+    def resolve(self, shape: Optional[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+        """
+        Public field names for a requested shape, None for every field
+        """
+        if shape is None:
+            return None
+
+        names = set()
+        for name in shape:
+            if name == DEFAULT:
+                names.update(self.default)
+            else:
+                names.add(self.aliases.get(name, name))
+
+        unknown = names - self.fragments.keys()
+        if unknown:
+            raise HTTPException(
+                status.HTTP_400_BAD_REQUEST,
+                detail=f"unknown fields: {', '.join(sorted(unknown))}"
+            )
+
+        return frozenset(names)
+
+    def values(self, fields: Optional[FrozenSet[str]] = None) -> str:
+        names = self.fragments if fields is None else [
+            n for n in self.fragments if n in fields
+        ]
+        parts = dict.fromkeys(self.fragments[n] for n in names if self.fragments[n])
+        if not parts:
+            return "urn __typename"
+
+        return f"""
+            urn
+            __typename
+            ... on {self.typename} {{
+                {" ".join(parts)}
+            }}
+        """
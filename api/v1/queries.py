@@ -1,5 +1,5 @@
 import json
-from typing import Mapping, Optional
+from typing import List, Mapping, Optional
 
 
 def by_id(type: str, values: str) -> str:
@@ -9,6 +9,17 @@ def by_id(type: str, values: str) -> str:
         }}
     """
 
+def by_ids(type: str, values: str, count: int) -> str:
+    params = ", ".join(f"$u{i}: String!" for i in range(count))
+    fields = "\n".join(
+        f"e{i}: {type}(urn: $u{i}) {{ {values} }}" for i in range(count)
+    )
+    return f"""
+        query by_ids({params}) {{
+            {fields}
+        }}
+    """
+
 def by_name(values: str) -> str:
     return f"""
         query by_name($input: AutoCompleteInput!) {{
@@ -29,6 +40,29 @@ def by_query(values: str) -> str:
         }}
     """
 
+def scroll(values: str) -> str:
+    return f"""
+        query scroll($input: ScrollAcrossEntitiesInput!) {{
+            results: scrollAcrossEntities(input: $input) {{
+                __typename nextScrollId count total
+                entities: searchResults {{ entity {{ {values} }} }}
+            }}
+        }}
+    """
+
+def facets() -> str:
+    return """
+        query facets($input: AggregateAcrossEntitiesInput!) {
+            results: aggregateAcrossEntities(input: $input) {
+                facets {
+                    field
+                    name: displayName
+                    aggregations { value count name: displayName }
+                }
+            }
+        }
+    """
+
 def platforms(values: str) -> str:
     return f"""
         query platforms($input: ListRecommendationsInput!) {{
@@ -55,6 +89,20 @@ def remove_tag() -> str:
         }
     """
 
+def batch_add_tags() -> str:
+    return """
+        mutation batch_add_tags($input: BatchAddTagsInput!) {
+            success: batchAddTags(input: $input)
+        }
+    """
+
+def batch_remove_tags() -> str:
+    return """
+        mutation batch_remove_tags($input: BatchRemoveTagsInput!) {
+            success: batchRemoveTags(input: $input)
+        }
+    """
+
 def create_tag(name: str, description: Optional[str]) -> Mapping[str, str]:
     return {
         "entity": {
@@ -72,6 +120,9 @@ def create_tag(name: str, description: Optional[str]) -> Mapping[str, str]:
         }
     }
 
+def batch(entities: List[Mapping]) -> Mapping[str, List]:
+    return { "entities": [e["entity"] for e in entities] }
+
 def delete_tag(urn: str) -> Mapping[str, str]:
     return {
         "entity": {
@@ -0,0 +1,15 @@
+from typing import Any
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+from ...core import codec
+
+def respond(model: BaseModel) -> Any:
+    """
+    Pre-serialized response on the fast path, skipping the re-validation
+    against the route's response_model
+    """
+    if codec.fast():
+        return ORJSONResponse(model.dict(exclude_unset=True))
+
+    return model
@@ -0,0 +1,37 @@
+from typing import Any
+from fastapi import APIRouter
+
+from . import datasets, fields, platforms, prefetch, tags, upstream
+from .mirror import mirror
+from ...core import client
+from ...core.cache import cache
+from ...core.stale import stale
+
+router = APIRouter()
+
+@router.get("")
+async def stats() -> Any:
+    """
+    Retrieve service counters
+    """
+    return {
+        "cache": await cache.stats(),
+        "stale": stale.stats(),
+        "pool": client.pool_stats(),
+        "flights": upstream.flights.stats(),
+        "limiter": upstream.limiter.stats(),
+        "hedging": upstream.hedger.stats(),
+        "indexes": {
+            "tags": tags.INDEX.stats(),
+            "platforms": platforms.INDEX.stats(),
+            "fields": fields.INDEX.stats(),
+        },
+        "typeahead": datasets.PREFIXES.stats(),
+        "prefetch": prefetch.prefetcher.stats(),
+        "mirror": mirror.stats(),
+        "tag_writes": datasets.TAG_WRITES.stats(),
+        "loaders": {
+            "datasets": datasets.LOADER.stats(),
+            "tags": tags.LOADER.stats(),
+        },
+    }
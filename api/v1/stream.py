@@ -0,0 +1,62 @@
+import asyncio
+
+from typing import Any, AsyncIterator, Callable, List, Mapping, Optional
+from aiohttp import ClientSession
+from pydantic import BaseModel
+
+from . import upstream
+from ...core import codec
+
+MEDIA_TYPE = "application/x-ndjson"
+
+def line(obj: Any) -> bytes:
+    """
+    Encode one NDJSON record
+    """
+    if isinstance(obj, BaseModel):
+        obj = obj.dict(exclude_unset=True)
+
+    return codec.dumps(obj) + b"\n"
+
+
+async def pages(
+    session: ClientSession,
+    body: Callable[[Optional[str]], Mapping]
+) -> AsyncIterator[List[Any]]:
+    """
+    Walk a scroll search, yielding the entities of each page. The next
+    page is requested while the current one is used, and no further page
+    is requested until the current one has been taken.
+    """
+    fetch = asyncio.ensure_future(upstream.query(session, body(None), upstream.BULK))
+    try:
+        while fetch is not None:
+            data = await fetch
+            results = data["data"]["results"]
+            entities = results["entities"]
+            scroll_id = results.get("nextScrollId")
+
+            fetch = None
+            if scroll_id and entities:
+                fetch = asyncio.ensure_future(upstream.query(session, body(scroll_id), upstream.BULK))
+
+            yield [e["entity"] for e in entities]
+    finally:
+        if fetch is not None:
+            fetch.cancel()
+
+
+async def scroll(
+    session: ClientSession,
+    body: Callable[[Optional[str]], Mapping],
+    convert: Callable[[Any], Any]
+) -> AsyncIterator[bytes]:
+    """
+    Walk a scroll search, yielding one NDJSON chunk per page
+    """
+    walk = pages(session, body)
+    try:
+        async for page in walk:
+            yield b"".join(line(convert(e)) for e in page)
+    finally:
+        await walk.aclose()
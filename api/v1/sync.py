@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+from aiohttp import ClientSession
+from fastapi.logger import logger
+
+from . import datasets, graphql, platforms, stream, tags
+from .mirror import mirror
+from .params import defaults
+from ...core import client
+from ...core.config import settings
+
+# Datasets with their modified time, both selected and filtered on to sync by
+DATASETS = graphql.ScrollFactory(
+    "DATASET",
+    f"{datasets.SELECTION.values()} ... on Dataset {{ {settings.MIRROR_MODIFIED_FIELD} }}"
+)
+
+async def run() -> None:
+    """
+    Keep the mirror in sync: datasets modified since the last sync every
+    MIRROR_SYNC seconds, everything every MIRROR_FULL_SYNC seconds
+    """
+    while True:
+        full = mirror.full is None or time.time() - mirror.full >= settings.MIRROR_FULL_SYNC
+        try:
+            await sync(client.get_session(), full)
+        except Exception as e:
+            mirror.failures += 1
+            logger.warning(f"Mirror sync failed: {e!r}")
+
+        await asyncio.sleep(settings.MIRROR_SYNC)
+
+
+async def sync(session: ClientSession, full: bool) -> None:
+    catalog = mirror.catalog
+    started = time.time()
+    filters = None
+    if not full and mirror.modified:
+        filters = [{
+            "field": settings.MIRROR_MODIFIED_FIELD,
+            "value": str(int(mirror.modified)),
+            "condition": "GREATER_THAN"
+        }]
+
+    field = settings.MIRROR_MODIFIED_FIELD
+    count = settings.EXPORT_PAGE_SIZE
+    modified = mirror.modified or 0
+    async for page in stream.pages(
+        session, lambda scroll_id: DATASETS.body(scroll_id, count, filters=filters)
+    ):
+        await mirror.call(catalog.put_datasets, page, started)
+        modified = max([modified] + [e[field] for e in page if e.get(field)])
+
+    # Tags are few and carry no modified time, so they are always synced whole
+    async for page in stream.pages(
+        session, lambda scroll_id: tags.EXPORT.body(scroll_id, count)
+    ):
+        await mirror.call(catalog.put_tags, page, started)
+    await mirror.call(catalog.prune, "tags", started)
+
+    if full:
+        params = defaults()
+        params.limit = settings.EXPORT_PAGE_SIZE
+        data = await platforms.listing(session, params)
+        modules = [m for m in data["data"]["results"]["modules"] if m["id"] == "Platforms"]
+        await mirror.call(
+            catalog.put_platforms, [e["entity"] for m in modules for e in m["content"]], started
+        )
+        await mirror.call(catalog.prune, "platforms", started)
+        await mirror.call(catalog.prune, "datasets", started)
+        await mirror.call(catalog.set_meta, "full", started)
+        mirror.full = started
+
+    await mirror.call(catalog.set_meta, "synced", started)
+    await mirror.call(catalog.set_meta, "modified", modified)
+    mirror.synced = started
+    mirror.modified = modified
+    mirror.syncs += 1
@@ -1,33 +1,49 @@
 import aiohttp
 
-from typing import Any, List
+from functools import partial
+from typing import Any, AsyncIterator, Dict, FrozenSet, List, Mapping, Optional, Tuple
 from aiohttp import ClientSession
 from fastapi import status, APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 
-from .datasets import QUERY_VALUES as DATASET_VALUES
+from .datasets import SELECTION as DATASET_SELECTION
+from .mirror import mirror
+from .responses import respond
 from .params import QueryParams, QueryType
-from . import graphql, queries
+from . import bulk, cursor, fanout, graphql, prefetch, projection, queries, stream, upstream
 from .. import deps
+from ...core import client, codec
+from ...core.cache import cache
 from ...core.config import settings
+from ...core.index import TextIndex
+from ...core.loader import BatchLoader
+from ...core.stale import stale
 from ...schemas import tags, CreateTag, Datasets, Tags, Tag, TagEnvelope
 
-QUERY_VALUES: str = """
-    urn
-    __typename
-    ... on Tag {
-        urn
-        properties {
-            name
-            description
-        }
+PROPERTIES: str = """
+    properties {
+        name
+        description
     }
 """
 
-GET_ALL         = graphql.GetAllFactory("TAGS", QUERY_VALUES)
-GET_BY_ID       = graphql.GetOneFactory("tag", QUERY_VALUES)
-GET_BY_NAME     = graphql.NameFactory("TAGS", QUERY_VALUES)
-GET_BY_QUERY    = graphql.QueryFactory("TAGS", QUERY_VALUES)
-DATASETS_BY_TAG = graphql.FilterFactory("tags", "DATASET", DATASET_VALUES)
+SELECTION = projection.Selection(
+    "Tag",
+    {
+        "id":          "",
+        "name":        PROPERTIES,
+        "description": PROPERTIES,
+    },
+    default=["id", "name", "description"]
+)
+
+GET_ALL         = graphql.GetAllFactory("TAG", SELECTION)
+GET_BY_ID       = graphql.GetOneFactory("tag", SELECTION)
+GET_BY_IDS      = graphql.GetManyFactory("tag", SELECTION)
+GET_BY_NAME     = graphql.NameFactory("TAG", SELECTION)
+GET_BY_QUERY    = graphql.QueryFactory("TAG", SELECTION)
+DATASETS_BY_TAG = graphql.FilterFactory("tags", "DATASET", DATASET_SELECTION)
+EXPORT          = graphql.ScrollFactory("TAG", SELECTION)
 
 OPERATIONS = {
     QueryType.ALL:   GET_ALL,
@@ -35,9 +51,154 @@ OPERATIONS = {
     QueryType.QUERY: GET_BY_QUERY
 }
 
+async def load_many(fields: Optional[FrozenSet[str]], ids: List[str]) -> List[Any]:
+    body = GET_BY_IDS.body(ids, fields)
+    data = await upstream.query(client.get_session(), body, upstream.LOOKUP)
+    return GET_BY_IDS.results(data, ids)
+
+LOADERS: Dict[Optional[FrozenSet[str]], BatchLoader] = {}
+
+def loader(fields: Optional[FrozenSet[str]]) -> BatchLoader:
+    """
+    Batch loader for lookups by id with the given fields
+    """
+    loader = LOADERS.get(fields)
+    if loader is None:
+        loader = LOADERS[fields] = BatchLoader(
+            partial(load_many, fields),
+            settings.BATCH_MAX_SIZE,
+            settings.BATCH_WINDOW
+        )
+
+    return loader
+
+LOADER = loader(None)
+
+# Local index of every tag answering name and query searches
+INDEX = TextIndex()
+
+# Dependency of cached tag listings, dropped when tags are created or deleted
+LISTING = "tags"
+
+def first_page(params: QueryParams) -> bool:
+    """
+    True for the unfiltered first page, which is served stale-while-revalidate
+    """
+    return params.type == QueryType.ALL and params.start == 0 and params.cursor is None
+
+async def search(session: ClientSession, params: QueryParams, body: Mapping) -> Any:
+    if not (settings.STALE_ENABLED and first_page(params)):
+        return await upstream.query(session, body)
+
+    return await stale.get(
+        "tags",
+        codec.encode_body(body),
+        lambda: upstream.query(client.get_session(), body),
+        deps=[LISTING]
+    )
+
+
+async def fetch_page(session: ClientSession, operation: Any, params: QueryParams) -> Mapping:
+    data = await search(session, params, operation.body(params))
+    return data["data"]["results"]
+
+
+async def scan(session: ClientSession) -> AsyncIterator[Mapping]:
+    """
+    Every tag entity, read with scroll search
+    """
+    count = settings.EXPORT_PAGE_SIZE
+    async for page in stream.pages(session, lambda scroll_id: EXPORT.body(scroll_id, count)):
+        for entity in page:
+            yield entity
+
+
+def index_entry(entity: Mapping) -> Tuple[str, str, str, Mapping]:
+    props = entity.get("properties") or {}
+    name = props.get("name") or entity["urn"].rsplit(":", 1)[-1]
+    return entity["urn"], name, props.get("description") or "", entity
+
+
+async def refresh(session: ClientSession) -> Mapping[str, int]:
+    """
+    Cache every tag for lookups by id and bring the index up to date
+    """
+    entities = []
+    async for entity in scan(session):
+        await cache.set(entity["urn"], entity, [entity["urn"]])
+        entities.append(entity)
+
+    return INDEX.sync(index_entry(e) for e in entities)
+
+
+def local(params: QueryParams) -> Optional[Mapping]:
+    """
+    Results for a name or query search answered from the index, None
+    when the index cannot answer it
+    """
+    if not settings.INDEX_ENABLED or not INDEX.loaded or params.cursor is not None:
+        return None
+
+    if params.type == QueryType.NAME:
+        return {
+            "__typename": "AutoCompleteResults",
+            "entities": INDEX.prefix(params.query, params.limit)
+        }
+    if params.type == QueryType.QUERY:
+        total, entities = INDEX.search(params.query, params.start, params.limit)
+        return {
+            "__typename": "SearchResults",
+            "start": params.start,
+            "count": len(entities),
+            "total": total,
+            "entities": [{ "entity": e } for e in entities]
+        }
+
+    return None
+
+def tag_entity(name: str, description: Optional[str]) -> Mapping:
+    return {
+        "urn": f"urn:li:tag:{name}",
+        "__typename": "Tag",
+        "properties": { "name": name, "description": description }
+    }
+
+
+async def created(entities: List[Mapping]) -> None:
+    for e in entities:
+        INDEX.put(*index_entry(e))
+    await mirror.put_tags(entities)
+
+
+async def ingest(body: Mapping) -> Tuple[int, str]:
+    return await upstream.mutate(client.get_session(), settings.DATAHUB_BATCH_INGEST, body)
+
+
+async def create_chunk(items: List[bulk.Item]) -> List[Mapping]:
+    """
+    Create a chunk of tags with one batch ingest
+    """
+    new_tags = [t for _, t in items]
+    urns = [f"urn:li:tag:{t.name}" for t in new_tags]
+    body = queries.batch([queries.create_tag(t.name, t.description) for t in new_tags])
+    code, text = await bulk.attempt(ingest(body))
+    await cache.invalidate(*urns)
+    stale.invalidate(LISTING)
+    if code != status.HTTP_200_OK:
+        return [
+            { "item": i, "id": urn, "status": code, "error": text }
+            for (i, _), urn in zip(items, urns)
+        ]
+
+    await created([tag_entity(t.name, t.description) for t in new_tags])
+    return [
+        { "item": i, "id": urn, "status": status.HTTP_201_CREATED }
+        for (i, _), urn in zip(items, urns)
+    ]
+
 router = APIRouter()
 
-@router.get("", response_model=Tags)
+@router.get("", response_model=Tags, response_model_exclude_unset=True)
 async def by_query(
     req: Request,
     session: ClientSession = Depends(deps.get_session),
@@ -46,35 +207,71 @@ async def by_query(
     Retrieve tags by query parameter
     """
     params = QueryParams(req)
-    body = OPERATIONS[params.type].body(params)
-    resp = await session.post(settings.DATAHUB_GRAPHQL, json=body)
-    if resp.status < 200 or resp.status > 299:
-        text = await resp.text()
-        raise aiohttp.web.HTTPException(status=resp.status, text=text)
+    fields = SELECTION.resolve(params.fields)
+    results = local(params)
+    if results is None:
+        results = await mirror.tags(params)
+    if results is not None:
+        return respond(Tags.from_json(results, fields))
+
+    operation = OPERATIONS[params.type]
+    scroll = params.cursor is not None and params.type != QueryType.NAME
+    if scroll or params.type == QueryType.NAME:
+        body = operation.scroll(params) if scroll else operation.body(params)
+        data = await search(session, params, body)
+        results = data["data"]["results"]
+    else:
+        results = await prefetch.search(
+            params, operation.body, partial(fetch_page, session, operation)
+        )
 
-    data = await resp.json()
-    return Tags.from_json(data["data"]["results"])
+    page = Tags.from_json(results, fields)
+    if scroll:
+        page.paging = cursor.paging(params.start, results)
 
+    return respond(page)
 
-@router.get("/{tag_id}", response_model=TagEnvelope)
+
+@router.get("/export")
+async def export(
+    req: Request,
+    session: ClientSession = Depends(deps.get_session),
+) -> Any:
+    """
+    Retrieve every tag, streamed as NDJSON
+    """
+    fields = SELECTION.resolve(projection.parse(req))
+    count = settings.EXPORT_PAGE_SIZE
+    return StreamingResponse(
+        stream.scroll(
+            session,
+            lambda scroll_id: EXPORT.body(scroll_id, count, shape=fields),
+            lambda e: TagEnvelope.from_json(e, fields)
+        ),
+        media_type=stream.MEDIA_TYPE
+    )
+
+
+@router.get("/{tag_id}", response_model=TagEnvelope, response_model_exclude_unset=True)
 async def by_id(
     tag_id: str,
+    req: Request,
     session: ClientSession = Depends(deps.get_session),
 ) -> Any:
     """
     Retrieve a tag by id
     """
-    body = GET_BY_ID.body(tag_id)
-    resp = await session.post(settings.DATAHUB_GRAPHQL, json=body)
-    if resp.status < 200 or resp.status > 299:
-        text = await resp.text()
-        raise HTTPException(status=resp.status, detail=text)
+    fields = SELECTION.resolve(projection.parse(req))
+    key = projection.key(tag_id, fields)
+    entity = await cache.get(key)
+    if entity is None:
+        entity = await loader(fields).load(tag_id)
+        await cache.set(key, entity, [tag_id])
 
-    data = await resp.json()
-    return TagEnvelope.from_json(data["data"]["tag"])
+    return respond(TagEnvelope.from_json(entity, fields))
 
 
-@router.get("/{tag_id}/datasets", response_model=Datasets)
+@router.get("/{tag_id}/datasets", response_model=Datasets, response_model_exclude_unset=True)
 async def datasets_by_tag(
     tag_id: str,
     req: Request,
@@ -84,14 +281,26 @@ async def datasets_by_tag(
     Retrieve datasets with the tag
     """
     params = QueryParams(req)
-    body = DATASETS_BY_TAG.body(tag_id, params)
-    resp = await session.post(settings.DATAHUB_GRAPHQL, json=body)
-    if resp.status < 200 or resp.status > 299:
-        text = await resp.text()
-        raise HTTPException(status=resp.status, detail=text)
+    fields = DATASET_SELECTION.resolve(params.fields)
+    results = await mirror.datasets_by_tag(tag_id, params)
+    if results is not None:
+        return respond(Datasets.from_json(results, fields))
 
-    data = await resp.json()
-    return Datasets.from_json(data["data"]["results"])
+    scroll = params.cursor is not None
+    if scroll:
+        data = await upstream.query(session, DATASETS_BY_TAG.scroll(tag_id, params))
+        results = data["data"]["results"]
+    else:
+        body = partial(DATASETS_BY_TAG.body, tag_id)
+        results = await prefetch.search(
+            params, body, lambda p: fanout.search(session, p, body)
+        )
+
+    page = Datasets.from_json(results, fields)
+    if scroll:
+        page.paging = cursor.paging(params.start, results)
+
+    return respond(page)
 
 
 @router.post("", response_model=TagEnvelope)
@@ -104,8 +313,11 @@ async def create_tag(
     Create a new tag
     """
     body = queries.create_tag(tag.name, tag.description)
-    resp = await session.post(settings.DATAHUB_INGEST, json=body)
-    if resp.status == status.HTTP_200_OK:
+    code, text = await upstream.mutate(session, settings.DATAHUB_INGEST, body)
+    await cache.invalidate(f"urn:li:tag:{tag.name}")
+    stale.invalidate(LISTING)
+    if code == status.HTTP_200_OK:
+        await created([tag_entity(tag.name, tag.description)])
         response.status = status.HTTP_201_CREATED
         return TagEnvelope(
             tag=Tag(
@@ -115,10 +327,18 @@ async def create_tag(
             )
         )
     else:
-        text = await resp.text()
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail=text)
 
 
+@router.post(":bulk")
+async def create_tags(req: Request) -> Any:
+    """
+    Create tags from a JSON array, NDJSON or CSV upload, streaming one
+    NDJSON outcome per tag as chunks finish
+    """
+    return bulk.BulkResponse(bulk.run(req, CreateTag, create_chunk))
+
+
 @router.delete("/{tid}")
 async def delete_tag(
     tid: str,
@@ -129,8 +349,12 @@ async def delete_tag(
     Delete a specified tag
     """
     body = queries.delete_tag(tid)
-    resp = await session.post(settings.DATAHUB_INGEST, json=body)
-    if resp.status == status.HTTP_200_OK:
+    code, _ = await upstream.mutate(session, settings.DATAHUB_INGEST, body)
+    await cache.invalidate(tid)
+    stale.invalidate(LISTING)
+    if code == status.HTTP_200_OK:
+        INDEX.remove(tid)
+        await mirror.delete_tag(tid)
         response.status = status.HTTP_204_NO_CONTENT
     else:
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,142 @@
+import asyncio
+
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Mapping, Tuple
+from aiohttp import ClientConnectionError, ClientSession
+from fastapi import status, HTTPException
+
+from ...core import client, codec
+from ...core.config import settings
+from ...core.flight import SingleFlight
+from ...core.hedge import Hedger
+from ...core.limiter import AdaptiveLimiter, Overloaded
+
+# Classes of upstream call, each with its own timeouts
+LOOKUP   = "lookup"
+SEARCH   = "search"
+BULK     = "bulk"
+MUTATION = "mutation"
+
+# Limiter lane for each class of call, mutations are interactive
+LANES = { LOOKUP: LOOKUP, SEARCH: SEARCH, BULK: BULK, MUTATION: LOOKUP }
+
+flights = SingleFlight()
+limiter = AdaptiveLimiter(
+    settings.LIMIT_LANES,
+    initial=settings.LIMIT_INITIAL,
+    minimum=settings.LIMIT_MIN,
+    maximum=settings.LIMIT_MAX,
+    backoff=settings.LIMIT_BACKOFF,
+    tolerance=settings.LIMIT_TOLERANCE
+)
+hedger = Hedger(
+    settings.HEDGE_PERCENTILE,
+    window=settings.HEDGE_WINDOW,
+    min_samples=settings.HEDGE_MIN_SAMPLES,
+    min_delay=settings.HEDGE_MIN_DELAY,
+    ratio=settings.HEDGE_BUDGET_RATIO,
+    maximum=settings.HEDGE_BUDGET_MAX
+)
+
+# Upstream failures worth another attempt of an idempotent read
+RETRYABLE = (
+    status.HTTP_502_BAD_GATEWAY,
+    status.HTTP_503_SERVICE_UNAVAILABLE,
+    status.HTTP_504_GATEWAY_TIMEOUT,
+)
+
+@asynccontextmanager
+async def slot(route: str) -> AsyncIterator[None]:
+    """
+    Hold a limiter slot for an upstream call, shedding with 429 when the
+    lane is full. Timeouts, connection failures and 5xx/429 responses
+    count against upstream health.
+    """
+    if not settings.LIMIT_ENABLED:
+        yield
+        return
+
+    lane = LANES[route]
+    try:
+        start = await limiter.acquire(lane)
+    except Overloaded as e:
+        raise HTTPException(
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="upstream overloaded",
+            headers={ "Retry-After": str(e.retry_after) }
+        )
+
+    ok = None
+    try:
+        yield
+        ok = True
+    except HTTPException as e:
+        ok = e.status_code < 500 and e.status_code != status.HTTP_429_TOO_MANY_REQUESTS
+        raise
+    except (asyncio.TimeoutError, ClientConnectionError):
+        ok = False
+        raise
+    finally:
+        limiter.release(lane, start, ok)
+
+
+async def post(session: ClientSession, payload: bytes, route: str = SEARCH) -> Any:
+    async with slot(route):
+        try:
+            async with session.post(
+                settings.DATAHUB_GRAPHQL, data=payload, timeout=client.timeout(route)
+            ) as resp:
+                if resp.status < 200 or resp.status > 299:
+                    text = await resp.text()
+                    raise HTTPException(status_code=resp.status, detail=text)
+
+                return codec.loads(await resp.read())
+        except asyncio.TimeoutError:
+            raise HTTPException(status.HTTP_504_GATEWAY_TIMEOUT, detail="upstream timed out")
+        except ClientConnectionError as e:
+            raise HTTPException(status.HTTP_502_BAD_GATEWAY, detail=str(e))
+
+
+async def mutate(session: ClientSession, url: str, body: Mapping) -> Tuple[int, str]:
+    """
+    Status and text of a mutation, with the same error mapping as reads.
+    Mutations are never shared or hedged.
+    """
+    async with slot(MUTATION):
+        try:
+            async with session.post(url, json=body, timeout=client.timeout(MUTATION)) as resp:
+                return resp.status, await resp.text()
+        except asyncio.TimeoutError:
+            raise HTTPException(status.HTTP_504_GATEWAY_TIMEOUT, detail="upstream timed out")
+        except ClientConnectionError as e:
+            raise HTTPException(status.HTTP_502_BAD_GATEWAY, detail=str(e))
+
+
+def retryable(error: BaseException) -> bool:
+    return isinstance(error, HTTPException) and error.status_code in RETRYABLE
+
+
+def spare(route: str) -> bool:
+    """
+    True when an extra attempt would not queue behind other calls
+    """
+    return not settings.LIMIT_ENABLED or limiter.idle(LANES[route])
+
+
+async def query(session: ClientSession, body: Mapping, route: str = SEARCH) -> Any:
+    """
+    Run a read against DataHub, sharing the result with any identical
+    read already in flight. The encoded body is canonical, so it is also
+    the key identical reads share. Only reads go through here, so lookup
+    and search calls may be hedged; mutations go through mutate and never are.
+    """
+    payload = codec.encode_body(body)
+    if not settings.HEDGE_ENABLED or route not in settings.HEDGE_ROUTES:
+        return await flights.do(payload, lambda: post(session, payload, route))
+
+    return await flights.do(payload, lambda: hedger.run(
+        route,
+        lambda: post(session, payload, route),
+        retryable=retryable,
+        allow=lambda: spare(route)
+    ))
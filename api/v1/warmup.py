@@ -0,0 +1,108 @@
+import asyncio
+
+from time import monotonic
+from typing import Any, Awaitable, Dict, Mapping
+from aiohttp import ClientSession
+from fastapi.logger import logger
+
+from . import datasets, platforms, tags
+from .params import defaults
+from ...core import client, codec
+from ...core.config import settings
+from ...schemas import Platforms
+
+FACTORIES = [
+    datasets.ADD_TAG, datasets.REMOVE_TAG, datasets.BATCH_ADD_TAGS,
+    datasets.BATCH_REMOVE_TAGS, datasets.GET_ALL, datasets.GET_BY_ID,
+    datasets.GET_BY_IDS, datasets.GET_BY_NAME, datasets.GET_BY_TAGS,
+    datasets.GET_BY_QUERY, datasets.EXPORT, datasets.FACETS,
+    tags.GET_ALL, tags.GET_BY_ID, tags.GET_BY_IDS, tags.GET_BY_NAME,
+    tags.GET_BY_QUERY, tags.DATASETS_BY_TAG, tags.EXPORT,
+    platforms.GET_ALL, platforms.GET_BY_ID, platforms.DATASETS_BY_PLATFORM,
+]
+
+class Warmup:
+    """
+    Start-up work run before the instance reports ready. A step that
+    fails is logged and recorded but does not hold readiness back.
+    """
+    def __init__(self):
+        self.ready = False
+        self.steps: Dict[str, Any] = {}
+
+    async def step(self, name: str, work: Awaitable[Any]) -> None:
+        start = monotonic()
+        try:
+            result = await work
+            self.steps[name] = { "ok": True, "result": result }
+        except Exception as e:
+            logger.warning(f"Warm up step {name} failed: {e!r}")
+            self.steps[name] = { "ok": False, "error": repr(e) }
+        self.steps[name]["seconds"] = round(monotonic() - start, 3)
+
+    async def run(self) -> None:
+        try:
+            await asyncio.wait_for(self.warm(), settings.WARM_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Warm up did not finish in {settings.WARM_TIMEOUT}s")
+        finally:
+            self.ready = True
+
+    async def warm(self) -> None:
+        await self.step("connect", self.connect())
+        await self.step("compile", self.compile())
+
+        session = client.get_session()
+        work = [
+            self.step("platforms", self.platform_list(session)),
+            self.step("tags", self.tag_list(session)),
+        ]
+        if settings.WARM_TAGS or settings.INDEX_ENABLED:
+            work.append(self.step("tag_index", tags.refresh(session)))
+        if settings.INDEX_ENABLED:
+            work.append(self.step("platform_index", platforms.reindex(session)))
+        if settings.WARM_DATASETS:
+            work.append(self.step("datasets", datasets.preload(session, settings.WARM_DATASETS)))
+
+        await asyncio.gather(*work)
+
+    async def refresh(self, load: bool = False) -> None:
+        """
+        Keep the tag and platform indexes up to date with DataHub, loading
+        them at once when warm up does not
+        """
+        if not load:
+            await asyncio.sleep(settings.INDEX_REFRESH)
+        while True:
+            session = client.get_session()
+            await self.step("tag_index", tags.refresh(session))
+            await self.step("platform_index", platforms.reindex(session))
+            await asyncio.sleep(settings.INDEX_REFRESH)
+
+    async def connect(self) -> int:
+        await client.open_session()
+        return client.pool_stats()["connections_created"]
+
+    async def platform_list(self, session: ClientSession) -> int:
+        data = await platforms.listing(session, defaults())
+        return len(Platforms.from_json(data["data"]["results"]["modules"]).data)
+
+    async def tag_list(self, session: ClientSession) -> int:
+        params = defaults()
+        data = await tags.search(session, params, tags.GET_ALL.body(params))
+        return len(data["data"]["results"]["entities"])
+
+    async def compile(self) -> int:
+        count = 0
+        for factory in FACTORIES:
+            for query in factory.compile():
+                codec.prefix(query)
+                count += 1
+
+        return count
+
+    def state(self) -> Mapping[str, Any]:
+        return { "ready": self.ready, "steps": self.steps }
+
+
+warmup = Warmup()
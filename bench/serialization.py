@@ -0,0 +1,114 @@
+"""
+Per-page CPU cost of the standard and fast serialization paths
+
+    python -m <package>.bench.serialization [datasets] [fields] [rounds]
+"""
+import asyncio
+import json
+import sys
+import time
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from ..api.v1 import datasets
+from ..api.v1.params import QueryParams
+from ..core import codec
+from ..core.config import settings
+from ..schemas import Datasets
+
+
+def entity(i: int, fields: int):
+    return {
+        "urn": f"urn:li:dataset:(urn:li:dataPlatform:hive,db.table_{i},PROD)",
+        "__typename": "Dataset",
+        "name": f"db.table_{i}",
+        "platform": {
+            "name": "hive",
+            "properties": { "type": "RELATIONAL_DB", "name": "Hive" }
+        },
+        "properties": { "name": f"table_{i}", "origin": "PROD" },
+        "schema": {
+            "fields": [
+                { "type": "STRING", "path": f"column_{j}", "native": "varchar(255)" }
+                for j in range(fields)
+            ]
+        },
+        "subTypes": { "names": ["table"] },
+        "tags": {
+            "tags": [{
+                "tag": {
+                    "urn": "urn:li:tag:pii",
+                    "__typename": "Tag",
+                    "properties": { "name": "pii", "description": "Personal data" }
+                }
+            }]
+        }
+    }
+
+
+def page(count: int, fields: int) -> bytes:
+    results = {
+        "__typename": "SearchResults",
+        "start": 0,
+        "count": count,
+        "total": count,
+        "entities": [{ "entity": entity(i, fields) } for i in range(count)]
+    }
+    return json.dumps({ "data": { "results": results } }).encode()
+
+
+class Params(QueryParams):
+    def __init__(self):
+        self.limit = 100
+        self.start = 0
+        self.query = None
+        self.fields = None
+
+
+FIELD = create_response_field(name="bench", type_=Datasets)
+
+async def standard(raw: bytes) -> bytes:
+    body = json.dumps(datasets.GET_ALL.body(Params())).encode()
+    data = json.loads(raw)
+    model = Datasets.from_json(data["data"]["results"])
+    content = await serialize_response(field=FIELD, response_content=model)
+    return body + JSONResponse(content).body
+
+
+async def fast(raw: bytes) -> bytes:
+    body = codec.encode_body(datasets.GET_ALL.body(Params()))
+    data = codec.loads(raw)
+    model = Datasets.from_json(data["data"]["results"])
+    return body + ORJSONResponse(model.dict(exclude_unset=True)).body
+
+
+def measure(fn, raw: bytes, rounds: int) -> float:
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(fn(raw))
+    start = time.process_time()
+    for _ in range(rounds):
+        loop.run_until_complete(fn(raw))
+    loop.close()
+    return (time.process_time() - start) / rounds
+
+
+def main(argv):
+    count = int(argv[0]) if len(argv) > 0 else 100
+    fields = int(argv[1]) if len(argv) > 1 else 50
+    rounds = int(argv[2]) if len(argv) > 2 else 20
+    raw = page(count, fields)
+
+    settings.FAST_PATH = False
+    slow = measure(standard, raw, rounds)
+    settings.FAST_PATH = True
+    quick = measure(fast, raw, rounds)
+
+    print(f"page: {count} datasets x {fields} fields, {len(raw) / 1024:.0f} KiB")
+    print(f"standard: {slow * 1000:8.2f} ms/page")
+    print(f"fast:     {quick * 1000:8.2f} ms/page ({slow / quick:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
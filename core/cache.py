@@ -0,0 +1,334 @@
+import asyncio
+import json
+import sqlite3
+import time
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Set, Tuple
+from fastapi.logger import logger
+
+from . import codec
+from .config import settings
+
+
+def encode(value: Any) -> bytes:
+    return codec.dumps(value)
+
+def decode(value: bytes) -> Any:
+    return codec.loads(value)
+
+
+class MemoryCache:
+    """
+    In-process LRU bounded by entry count and encoded size
+    """
+    blocking = False
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: "OrderedDict[str, Tuple[bytes, float, Tuple[str, ...]]]" = OrderedDict()
+        self.deps: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float, Tuple[str, ...]]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry[1] <= time.monotonic():
+            self.expirations += 1
+            self.misses += 1
+            self.delete(key)
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, value: bytes, deps: Iterable[str] = (), ttl: Optional[float] = None) -> None:
+        if len(value) > self.max_bytes:
+            return
+
+        self.delete(key)
+        deps = tuple(deps)
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self.entries[key] = (value, expires, deps)
+        self.size += len(value)
+        for dep in deps:
+            self.deps.setdefault(dep, set()).add(key)
+
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self.delete(oldest)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+            for dep in entry[2]:
+                keys = self.deps.get(dep)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.deps[dep]
+
+    def invalidate(self, dep: str) -> None:
+        for key in list(self.deps.get(dep, ())):
+            self.delete(key)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.deps.clear()
+        self.size = 0
+
+    def stats(self) -> Mapping[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class DiskCache:
+    """
+    SQLite backed tier shared by every worker on the host. Blocking:
+    its calls run one at a time on a thread of their own.
+    """
+    blocking = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            expires REAL NOT NULL,
+            deps TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS deps (
+            dep TEXT NOT NULL,
+            key TEXT NOT NULL,
+            PRIMARY KEY (dep, key)
+        );
+    """
+
+    def __init__(self, path: str, ttl: float, max_bytes: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(path, timeout=1.0, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="cache")
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float, Tuple[str, ...]]]:
+        row = self.db.execute(
+            "SELECT value, expires, deps FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+
+        # Expiry is wall clock on disk since the file outlives processes
+        if row is None or row[1] <= time.time():
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        remaining = row[1] - time.time()
+        return (row[0], time.monotonic() + remaining, tuple(json.loads(row[2])))
+
+    def set(self, key: str, value: bytes, deps: Iterable[str] = (), ttl: Optional[float] = None) -> None:
+        deps = tuple(deps)
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self.db:
+            self.db.execute("BEGIN")
+            self.db.execute("DELETE FROM deps WHERE key = ?", (key,))
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (key, value, expires, json.dumps(deps))
+            )
+            self.db.executemany(
+                "INSERT OR IGNORE INTO deps VALUES (?, ?)",
+                [(dep, key) for dep in deps]
+            )
+
+        self.writes += 1
+        if self.writes % 256 == 0:
+            self.prune()
+
+    def delete(self, key: str) -> None:
+        with self.db:
+            self.db.execute("BEGIN")
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.db.execute("DELETE FROM deps WHERE key = ?", (key,))
+
+    def invalidate(self, dep: str) -> None:
+        with self.db:
+            self.db.execute("BEGIN")
+            cur = self.db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM deps WHERE dep = ?)", (dep,)
+            )
+            self.invalidations += cur.rowcount
+            self.db.execute(
+                "DELETE FROM deps WHERE key NOT IN (SELECT key FROM entries)"
+            )
+
+    def prune(self) -> None:
+        with self.db:
+            self.db.execute("BEGIN")
+            self.db.execute("DELETE FROM entries WHERE expires <= ?", (time.time(),))
+            size = self.db.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM entries").fetchone()[0]
+            if size > self.max_bytes:
+                # Drop the entries closest to expiring until back under budget
+                rows = self.db.execute(
+                    "SELECT key, LENGTH(value) FROM entries ORDER BY expires"
+                ).fetchall()
+                for key, length in rows:
+                    if size <= self.max_bytes:
+                        break
+                    self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self.evictions += 1
+                    size -= length
+            self.db.execute(
+                "DELETE FROM deps WHERE key NOT IN (SELECT key FROM entries)"
+            )
+
+    def clear(self) -> None:
+        with self.db:
+            self.db.execute("BEGIN")
+            self.db.execute("DELETE FROM entries")
+            self.db.execute("DELETE FROM deps")
+
+    def stats(self) -> Mapping[str, Any]:
+        entries, size = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM entries"
+        ).fetchone()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class TieredCache:
+    """
+    Read-through over an ordered list of tiers, fastest first. Values
+    are stored encoded so sizes are exact and callers never share
+    mutable state through the cache. Blocking tiers run off the event
+    loop, and their errors count as a miss or a skipped write rather
+    than failing the request.
+    """
+    def __init__(self, *tiers):
+        self.tiers = tiers
+        self.errors = 0
+
+    async def call(self, tier, fn: Callable[..., Any], *args: Any) -> Any:
+        if not tier.blocking:
+            return fn(*args)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                tier.executor, partial(fn, *args)
+            )
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"{type(tier).__name__} failed: {e!r}")
+            return None
+
+    async def get(self, key: str) -> Optional[Any]:
+        for i, tier in enumerate(self.tiers):
+            entry = await self.call(tier, tier.get, key)
+            if entry is not None:
+                value, expires, deps = entry
+                ttl = expires - time.monotonic()
+                for upper in self.tiers[:i]:
+                    await self.call(upper, upper.set, key, value, deps, ttl)
+                return decode(value)
+
+        return None
+
+    async def set(self, key: str, value: Any, deps: Iterable[str] = ()) -> None:
+        if value is None:
+            return
+
+        data = encode(value)
+        deps = tuple(deps)
+        for tier in self.tiers:
+            await self.call(tier, tier.set, key, data, deps)
+
+    async def invalidate(self, *deps: str) -> None:
+        for dep in deps:
+            for tier in self.tiers:
+                await self.call(tier, tier.invalidate, dep)
+
+    async def clear(self) -> None:
+        for tier in self.tiers:
+            await self.call(tier, tier.clear)
+
+    async def stats(self) -> Mapping[str, Any]:
+        stats = { "errors": self.errors }
+        for tier in self.tiers:
+            stats[type(tier).__name__] = await self.call(tier, tier.stats)
+        return stats
+
+
+class NullCache:
+    async def get(self, key: str) -> Optional[Any]:
+        return None
+
+    async def set(self, key: str, value: Any, deps: Iterable[str] = ()) -> None:
+        pass
+
+    async def invalidate(self, *deps: str) -> None:
+        pass
+
+    async def clear(self) -> None:
+        pass
+
+    async def stats(self) -> Mapping[str, Any]:
+        return {}
+
+
+def create_cache():
+    if not settings.CACHE_ENABLED:
+        return NullCache()
+
+    tiers = [MemoryCache(
+        settings.CACHE_TTL,
+        settings.CACHE_MAX_ENTRIES,
+        settings.CACHE_MAX_BYTES
+    )]
+    if settings.CACHE_PATH:
+        tiers.append(DiskCache(
+            settings.CACHE_PATH,
+            settings.CACHE_TTL,
+            settings.CACHE_DISK_MAX_BYTES
+        ))
+
+    return TieredCache(*tiers)
+
+
+cache = create_cache()
@@ -1,31 +1,147 @@
+import asyncio
 import aiohttp
 
-from typing import Optional
+from typing import Any, Mapping, Optional
+from fastapi.logger import logger
 
 from .config import settings
 
+class PoolStats:
+    """
+    Connection pool counters collected from aiohttp request tracing
+    """
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        self.created = 0
+        self.reused = 0
+        self.queued = 0
+        self.waiting = 0
+        self.errors = 0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self.on_request_start)
+        trace.on_request_end.append(self.on_request_end)
+        trace.on_request_exception.append(self.on_request_exception)
+        trace.on_connection_create_end.append(self.on_connection_create_end)
+        trace.on_connection_reuseconn.append(self.on_connection_reuseconn)
+        trace.on_connection_queued_start.append(self.on_connection_queued_start)
+        trace.on_connection_queued_end.append(self.on_connection_queued_end)
+        return trace
+
+    async def on_request_start(self, session, ctx, params) -> None:
+        self.requests += 1
+        self.in_flight += 1
+
+    async def on_request_end(self, session, ctx, params) -> None:
+        self.in_flight -= 1
+
+    async def on_request_exception(self, session, ctx, params) -> None:
+        self.in_flight -= 1
+        self.errors += 1
+
+    async def on_connection_create_end(self, session, ctx, params) -> None:
+        self.created += 1
+
+    async def on_connection_reuseconn(self, session, ctx, params) -> None:
+        self.reused += 1
+
+    async def on_connection_queued_start(self, session, ctx, params) -> None:
+        self.queued += 1
+        self.waiting += 1
+
+    async def on_connection_queued_end(self, session, ctx, params) -> None:
+        self.waiting -= 1
+
+
 class Client:
     session: Optional[aiohttp.ClientSession] = None
+    stats = PoolStats()
 
     @classmethod
     def get_session(cls) -> aiohttp.ClientSession:
         if cls.session is None:
+            connector = aiohttp.TCPConnector(
+                limit=settings.POOL_LIMIT,
+                limit_per_host=settings.POOL_LIMIT_PER_HOST,
+                keepalive_timeout=settings.POOL_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=settings.POOL_DNS_TTL,
+            )
             cls.session = aiohttp.ClientSession(
-                headers=settings.DATAHUB_HEADERS
+                headers=settings.DATAHUB_HEADERS,
+                connector=connector,
+                timeout=timeout("default"),
+                trace_configs=[cls.stats.trace_config()],
             )
 
         return cls.session
 
-    
+    @classmethod
+    async def open_session(cls) -> aiohttp.ClientSession:
+        """
+        Create the session and open POOL_WARM connections up front
+        """
+        session = cls.get_session()
+        if settings.POOL_WARM > 0:
+            results = await asyncio.gather(
+                *[cls.warm(session) for _ in range(settings.POOL_WARM)],
+                return_exceptions=True
+            )
+            failed = [r for r in results if isinstance(r, Exception)]
+            if failed:
+                logger.warning(f"Failed to pre-connect {len(failed)} connections: {failed[0]!r}")
+
+        return session
+
+    @staticmethod
+    async def warm(session: aiohttp.ClientSession) -> None:
+        async with session.get(settings.DATAHUB_HEALTH, timeout=timeout("default")) as resp:
+            await resp.read()
+
     @classmethod
     async def close_session(cls) -> None:
         if cls.session:
             await cls.session.close()
             cls.session = None
 
+    @classmethod
+    def pool_stats(cls) -> Mapping[str, Any]:
+        stats = cls.stats
+        connector = cls.session.connector if cls.session else None
+        return {
+            "limit": connector.limit if connector else settings.POOL_LIMIT,
+            "limit_per_host": connector.limit_per_host if connector else settings.POOL_LIMIT_PER_HOST,
+            "in_flight": stats.in_flight,
+            "waiting": stats.waiting,
+            "requests": stats.requests,
+            "errors": stats.errors,
+            "connections_created": stats.created,
+            "connections_reused": stats.reused,
+            "queued": stats.queued,
+        }
+
+
+def timeout(route: str) -> aiohttp.ClientTimeout:
+    """
+    Connect and read timeouts for a class of upstream route
+    """
+    limits = settings.UPSTREAM_TIMEOUTS.get(route) or settings.UPSTREAM_TIMEOUTS["default"]
+    return aiohttp.ClientTimeout(
+        total=None,
+        sock_connect=limits["connect"],
+        sock_read=limits["read"]
+    )
+
 
 def get_session() -> aiohttp.ClientSession:
     return Client.get_session()
 
+async def open_session() -> aiohttp.ClientSession:
+    return await Client.open_session()
+
 async def close_session() -> None:
-    await Client.close_session()
\ No newline at end of file
+    await Client.close_session()
+
+def pool_stats() -> Mapping[str, Any]:
+    return Client.pool_stats()
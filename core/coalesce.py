@@ -0,0 +1,113 @@
+import asyncio
+
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+
+
+class Superseded(Exception):
+    """
+    Pending mutation replaced by an opposite one before it was sent
+    """
+
+
+class Write:
+    __slots__ = ("add", "futures")
+
+    def __init__(self, add: bool):
+        self.add = add
+        self.futures: List["asyncio.Future[Any]"] = []
+
+
+class TagWrites:
+    """
+    Write-behind buffer for tag mutations. Mutations arriving within a
+    short window are grouped by tag and direction and each group is sent
+    with one call to the batch function. A mutation opposite to a pending
+    one on the same resource and tag supersedes it: only the later one is
+    sent, and callers of the earlier one get Superseded rather than a
+    result for a mutation that never ran.
+    """
+    def __init__(
+        self,
+        fn: Callable[[str, bool, List[str]], Awaitable[Any]],
+        max_size: int,
+        window: float
+    ):
+        self.fn = fn
+        self.max_size = max(1, max_size)
+        self.window = window
+        self.pending: Dict[Tuple[str, str], Write] = {}
+        self.handle: Optional[asyncio.Handle] = None
+        self.batches = 0
+        self.writes = 0
+        self.merged = 0
+        self.superseded = 0
+
+    async def submit(self, resource: str, tag: str, add: bool) -> Any:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        key = (resource, tag)
+        write = self.pending.get(key)
+        if write is None:
+            write = self.pending[key] = Write(add)
+        elif write.add == add:
+            self.merged += 1
+        else:
+            self.superseded += len(write.futures)
+            for earlier in write.futures:
+                if not earlier.done():
+                    earlier.set_exception(Superseded())
+            write.add = add
+            write.futures = []
+        write.futures.append(fut)
+
+        if len(self.pending) >= self.max_size:
+            self.dispatch()
+        elif self.handle is None:
+            if self.window > 0:
+                self.handle = loop.call_later(self.window, self.dispatch)
+            else:
+                self.handle = loop.call_soon(self.dispatch)
+
+        # Shielded so one caller going away does not fail the batch
+        return await asyncio.shield(fut)
+
+    def dispatch(self) -> None:
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+        pending, self.pending = self.pending, {}
+        groups: Dict[Tuple[str, bool], Dict[str, Write]] = {}
+        for (resource, tag), write in pending.items():
+            groups.setdefault((tag, write.add), {})[resource] = write
+
+        for (tag, add), writes in groups.items():
+            self.batches += 1
+            self.writes += len(writes)
+            asyncio.ensure_future(self.run(tag, add, writes))
+
+    async def run(self, tag: str, add: bool, writes: Mapping[str, Write]) -> None:
+        futures = [fut for write in writes.values() for fut in write.futures]
+        try:
+            result = await self.fn(tag, add, list(writes))
+        except Exception as e:
+            for fut in futures:
+                if not fut.done():
+                    fut.set_exception(e)
+        else:
+            for fut in futures:
+                if not fut.done():
+                    fut.set_result(result)
+        finally:
+            for fut in futures:
+                if not fut.done():
+                    fut.cancel()
+
+    def stats(self) -> Mapping[str, Any]:
+        return {
+            "pending": len(self.pending),
+            "batches": self.batches,
+            "writes": self.writes,
+            "merged": self.merged,
+            "superseded": self.superseded,
+        }
@@ -0,0 +1,54 @@
+import json
+
+from typing import Any, Dict, Mapping
+
+from .config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def fast() -> bool:
+    """
+    True when the orjson fast path is enabled and available
+    """
+    return settings.FAST_PATH and orjson is not None
+
+
+def loads(data: bytes) -> Any:
+    if fast():
+        return orjson.loads(data)
+
+    return json.loads(data)
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    if fast():
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+
+    return json.dumps(obj, sort_keys=sort_keys, separators=(",", ":")).encode()
+
+
+# Encoded operation text, keyed by the factories' compiled query strings
+PREFIXES: Dict[str, bytes] = {}
+
+def prefix(operation: str) -> bytes:
+    """
+    Encoded start of a request body for the operation, up to its variables
+    """
+    encoded = PREFIXES.get(operation)
+    if encoded is None:
+        encoded = PREFIXES[operation] = b'{"operation":' + dumps(operation) + b',"variables":'
+
+    return encoded
+
+
+def encode_body(body: Mapping) -> bytes:
+    """
+    Encode a GraphQL request body. The operation text of each factory is
+    encoded once and only the variables are encoded per call, with sorted
+    keys so equivalent requests encode identically.
+    """
+    return prefix(body["operation"]) + dumps(body["variables"], sort_keys=True) + b"}"
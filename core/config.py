@@ -1,4 +1,4 @@
-from typing import Mapping
+from typing import List, Mapping, Optional
 from pydantic import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,13 +7,122 @@ class Settings(BaseSettings):
     API_V1_PREFIX: str   = "/api/v1"
     PROJECT_NAME: str    = "Alteryx Data Catalog"
     DATAHUB_INGEST: str  = "http://localhost:8080/entities?action=ingest"
+    DATAHUB_BATCH_INGEST: str = "http://localhost:8080/entities?action=batchIngest"
     DATAHUB_GRAPHQL: str = "http://localhost:8080/api/graphql"
+    DATAHUB_HEALTH: str  = "http://localhost:8080/health"
     DATAHUB_HEADERS: Mapping[str, str] = {
         "X-DataHub-Actor": "urn:li:corpuser:datahub",
         "Content-Type": "application/json",
         "Accept-Encoding": "gzip"
     }
 
+    POOL_LIMIT: int               = 200
+    POOL_LIMIT_PER_HOST: int      = 200
+    POOL_KEEPALIVE_TIMEOUT: float = 30.0
+    POOL_DNS_TTL: int             = 300
+    POOL_WARM: int                = 8
+
+    # Connect and read timeouts in seconds per class of upstream call
+    UPSTREAM_TIMEOUTS: Mapping[str, Mapping[str, float]] = {
+        "default":  { "connect": 2.0, "read": 30.0 },
+        "lookup":   { "connect": 2.0, "read": 5.0 },
+        "search":   { "connect": 2.0, "read": 15.0 },
+        "bulk":     { "connect": 2.0, "read": 60.0 },
+        "mutation": { "connect": 2.0, "read": 15.0 },
+    }
+
+    LIMIT_ENABLED: bool         = True
+    LIMIT_INITIAL: int          = 20
+    LIMIT_MIN: int              = 4
+    LIMIT_MAX: int              = 200
+    LIMIT_BACKOFF: float        = 0.9
+    LIMIT_TOLERANCE: float      = 2.0
+
+    # Upstream lanes by priority: queued callers, seconds a caller may
+    # wait and the share of the concurrency limit the lane may use
+    LIMIT_LANES: Mapping[str, Mapping[str, float]] = {
+        "lookup": { "queue": 200, "wait": 1.0, "share": 1.0 },
+        "search": { "queue": 100, "wait": 2.0, "share": 0.8 },
+        "bulk":   { "queue": 10,  "wait": 5.0, "share": 0.5 },
+    }
+
+    HEDGE_ENABLED: bool         = True
+    HEDGE_ROUTES: List[str]     = ["lookup", "search"]
+    HEDGE_PERCENTILE: float     = 0.95
+    HEDGE_WINDOW: int           = 1000
+    HEDGE_MIN_SAMPLES: int      = 50
+    HEDGE_MIN_DELAY: float      = 0.01
+    HEDGE_BUDGET_RATIO: float   = 0.1
+    HEDGE_BUDGET_MAX: float     = 20.0
+
+    STALE_ENABLED: bool         = True
+    STALE_MAX_ENTRIES: int      = 256
+
+    # Soft and hard TTLs in seconds for stale-while-revalidate lists
+    STALE_TTLS: Mapping[str, Mapping[str, float]] = {
+        "platforms": { "soft": 3600.0, "hard": 86400.0 },
+        "tags":      { "soft": 60.0,   "hard": 3600.0 },
+        "facets":    { "soft": 30.0,   "hard": 300.0 },
+    }
+
+    WARM_ENABLED: bool          = True
+    WARM_TIMEOUT: float         = 30.0
+    WARM_TAGS: bool             = True
+    WARM_DATASETS: List[str]    = []
+
+    INDEX_ENABLED: bool         = True
+    INDEX_REFRESH: float        = 300.0
+
+    TYPEAHEAD_ENABLED: bool     = True
+    TYPEAHEAD_TTL: float        = 30.0
+    TYPEAHEAD_MAX_ENTRIES: int  = 1024
+
+    MIRROR_PATH: Optional[str]  = None
+    MIRROR_SYNC: float          = 60.0
+    MIRROR_FULL_SYNC: float     = 3600.0
+    MIRROR_MAX_STALENESS: float = 600.0
+    MIRROR_MODIFIED_FIELD: str  = "lastIngested"
+
+    # DataHub search fields counted by GET /datasets/facets
+    FACETS: List[str]           = ["tags", "platform", "origin", "typeNames"]
+
+    FIELDS_ENABLED: bool        = False
+    FIELDS_REFRESH: float       = 3600.0
+
+    FAST_PATH: bool             = False
+
+    CACHE_ENABLED: bool         = True
+    CACHE_TTL: float            = 60.0
+    CACHE_MAX_ENTRIES: int      = 10_000
+    CACHE_MAX_BYTES: int        = 64 * 1024 * 1024
+    CACHE_PATH: Optional[str]   = None
+    CACHE_DISK_MAX_BYTES: int   = 512 * 1024 * 1024
+
+    BATCH_MAX_SIZE: int         = 50
+    BATCH_WINDOW: float         = 0.0
+    BATCH_MAX_REQUESTS: int     = 20
+
+    COALESCE_ENABLED: bool      = False
+    COALESCE_WINDOW: float      = 0.05
+    COALESCE_MAX_SIZE: int      = 100
+
+    LOOKUP_CHUNK_SIZE: int      = 100
+    LOOKUP_CONCURRENCY: int     = 4
+
+    EXPORT_PAGE_SIZE: int       = 500
+
+    FANOUT_ENABLED: bool        = True
+    FANOUT_PAGE_SIZE: int       = 100
+    FANOUT_CONCURRENCY: int     = 8
+
+    PREFETCH_ENABLED: bool      = False
+    PREFETCH_TTL: float         = 15.0
+    PREFETCH_MAX_ENTRIES: int   = 256
+    PREFETCH_CONCURRENCY: int   = 4
+
+    BULK_CHUNK_SIZE: int        = 100
+    BULK_CONCURRENCY: int       = 4
+
     class Config:
         env_file = ".env"
 
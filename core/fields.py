@@ -0,0 +1,171 @@
+import re
+
+from array import array
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+GRAM = 3
+
+# Version 2 field paths annotate each step, as in [version=2.0].[type=struct].id
+ANNOTATION = re.compile(r"\[[^\]]*\]\.?")
+WORD = re.compile(r"[^0-9a-z]+")
+
+def normalize(path: str) -> str:
+    return ANNOTATION.sub("", path).lower()
+
+
+def tokens(path: str) -> List[str]:
+    return [w for w in WORD.split(path) if w]
+
+
+def grams(text: str) -> List[str]:
+    return list({ text[i:i + GRAM] for i in range(len(text) - GRAM + 1) })
+
+
+class Symbols:
+    """
+    Small integer ids for repeated strings
+    """
+    def __init__(self):
+        self.ids: Dict[Optional[str], int] = {}
+        self.values: List[Optional[str]] = []
+
+    def id(self, value: Optional[str]) -> int:
+        id = self.ids.get(value)
+        if id is None:
+            id = self.ids[value] = len(self.values)
+            self.values.append(value)
+
+        return id
+
+    def matching(self, value: Optional[str]) -> Set[int]:
+        if not value:
+            return set()
+
+        value = value.lower()
+        return { id for v, id in self.ids.items() if v and v.lower() == value }
+
+
+class FieldIndex:
+    """
+    Inverted index of the schema fields of every dataset. Fields are
+    numbered as they are added and held in parallel arrays; postings map
+    path words, path trigrams, types and platforms to arrays of field
+    numbers, kept sorted by adding in order. Built once from a full scan
+    and replaced whole rather than updated.
+    """
+    def __init__(self):
+        self.urns: List[str] = []
+        self.platforms = array("I")
+        self.paths: List[str] = []
+        self.normalized: List[str] = []
+        self.datasets = array("I")
+        self.types = array("I")
+        self.natives = array("I")
+        self.symbols = Symbols()
+        self.postings: Dict[str, array] = {}
+        self.built: Optional[float] = None
+        self.lookups = 0
+
+    def post(self, key: str, id: int) -> None:
+        posting = self.postings.get(key)
+        if posting is None:
+            posting = self.postings[key] = array("I")
+        posting.append(id)
+
+    def add(self, urn: str, platform: Optional[str], fields: Iterable[Mapping]) -> None:
+        dataset = len(self.urns)
+        self.urns.append(urn)
+        self.platforms.append(self.symbols.id(platform))
+        platform_key = f"platform:{(platform or '').lower()}"
+
+        for f in fields:
+            id = len(self.paths)
+            path = f["path"]
+            normalized = normalize(path)
+            self.paths.append(path)
+            self.normalized.append(normalized)
+            self.datasets.append(dataset)
+            self.types.append(self.symbols.id(f.get("type")))
+            self.natives.append(self.symbols.id(f.get("native")))
+
+            for key in set(tokens(normalized)):
+                self.post(f"word:{key}", id)
+            for key in grams(normalized):
+                self.post(key, id)
+            self.post(f"type:{(f.get('type') or '').lower()}", id)
+            self.post(platform_key, id)
+
+    def candidates(self, keys: List[str]) -> Sequence[int]:
+        """
+        Shortest posting of the given keys, empty when any key has none
+        """
+        shortest = None
+        for key in keys:
+            posting = self.postings.get(key)
+            if posting is None:
+                return array("I")
+            if shortest is None or len(posting) < len(shortest):
+                shortest = posting
+
+        return shortest if shortest is not None else range(len(self.paths))
+
+    def search(
+        self,
+        name: Optional[str],
+        type: Optional[str],
+        platform: Optional[str],
+        start: int,
+        limit: int
+    ) -> Tuple[int, List[Mapping[str, Any]]]:
+        """
+        Total count and a page of the fields whose path contains name,
+        or for names shorter than a trigram has a word equal to it, with
+        the given type and dataset platform, all matched case-insensitively
+        """
+        self.lookups += 1
+        keys = []
+        name = normalize(name) if name else None
+        if name:
+            keys.extend(grams(name) if len(name) >= GRAM else [f"word:{name}"])
+        if type:
+            keys.append(f"type:{type.lower()}")
+        if platform:
+            keys.append(f"platform:{platform.lower()}")
+
+        # Verify every condition on the shortest posting rather than
+        # intersecting postings
+        type_ids = self.symbols.matching(type)
+        platform_ids = self.symbols.matching(platform)
+        total = 0
+        page = []
+        for id in self.candidates(keys):
+            if name and len(name) >= GRAM and name not in self.normalized[id]:
+                continue
+            if type and self.types[id] not in type_ids:
+                continue
+            if platform and self.platforms[self.datasets[id]] not in platform_ids:
+                continue
+            if start <= total < start + limit:
+                page.append(self.entry(id))
+            total += 1
+
+        return total, page
+
+    def entry(self, id: int) -> Mapping[str, Any]:
+        dataset = self.datasets[id]
+        return {
+            "dataset": self.urns[dataset],
+            "platform": self.symbols.values[self.platforms[dataset]],
+            "path": self.paths[id],
+            "type": self.symbols.values[self.types[id]],
+            "native": self.symbols.values[self.natives[id]],
+        }
+
+    def stats(self) -> Mapping[str, Any]:
+        return {
+            "datasets": len(self.urns),
+            "fields": len(self.paths),
+            "keys": len(self.postings),
+            "built": self.built,
+            "lookups": self.lookups,
+        }
@@ -0,0 +1,61 @@
+import asyncio
+
+from typing import Any, Awaitable, Callable, Dict, Hashable, Mapping
+
+
+class Call:
+    def __init__(self, task: "asyncio.Future[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Shares one in-flight call between concurrent callers with the same
+    key. The call runs in its own task so a caller going away does not
+    cancel it for the others; it is only cancelled once every caller
+    waiting on it has gone.
+    """
+    def __init__(self):
+        self.calls: Dict[Hashable, Call] = {}
+        self.started = 0
+        self.shared = 0
+        self.abandoned = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self.calls.get(key)
+        if call is None:
+            call = Call(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda _: self.forget(key, call))
+            self.calls[key] = call
+            self.started += 1
+        else:
+            self.shared += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.task.cancelled() or call.task.done():
+                raise
+            if call.waiters == 1:
+                # Forgotten first so a caller arriving now starts afresh
+                # rather than joining the cancelled call
+                self.abandoned += 1
+                self.forget(key, call)
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def forget(self, key: Hashable, call: Call) -> None:
+        if self.calls.get(key) is call:
+            del self.calls[key]
+
+    def stats(self) -> Mapping[str, Any]:
+        return {
+            "in_flight": len(self.calls),
+            "started": self.started,
+            "shared": self.shared,
+            "abandoned": self.abandoned,
+        }
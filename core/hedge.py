@@ -0,0 +1,180 @@
+import asyncio
+
+from collections import deque
+from time import monotonic
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Mapping, Optional
+
+
+class LatencyWindow:
+    """
+    Recent call latencies, with a percentile recomputed every few samples
+    """
+    def __init__(self, size: int, percentile: float, min_samples: int):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.count = 0
+        self.cached: Optional[float] = None
+
+    def add(self, latency: float) -> None:
+        self.samples.append(latency)
+        self.count += 1
+        if self.count % 16 == 0:
+            self.cached = None
+
+    def value(self) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        if self.cached is None:
+            ordered = sorted(self.samples)
+            self.cached = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))]
+
+        return self.cached
+
+
+class Budget:
+    """
+    Token bucket for extra attempts. Every first attempt deposits ratio
+    tokens, up to maximum, and each hedge or retry spends one.
+    """
+    def __init__(self, ratio: float, maximum: float):
+        self.ratio = ratio
+        self.maximum = maximum
+        self.tokens = maximum
+
+    def deposit(self) -> None:
+        self.tokens = min(self.maximum, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Hedger:
+    """
+    Runs idempotent calls, starting a duplicate when the first attempt
+    has not answered by the running percentile latency for its key and
+    taking whichever answers first. A first attempt failing with a
+    retryable error is tried once more. Both spend from one budget.
+    """
+    def __init__(
+        self,
+        percentile: float,
+        window: int,
+        min_samples: int,
+        min_delay: float,
+        ratio: float,
+        maximum: float
+    ):
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.budget = Budget(ratio, maximum)
+        self.latencies: Dict[str, LatencyWindow] = {}
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.retried = 0
+        self.denied = 0
+
+    def latency(self, key: str) -> LatencyWindow:
+        window = self.latencies.get(key)
+        if window is None:
+            window = self.latencies[key] = LatencyWindow(
+                self.window, self.percentile, self.min_samples
+            )
+        return window
+
+    async def run(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        retryable: Callable[[BaseException], bool] = lambda e: False,
+        allow: Callable[[], bool] = lambda: True
+    ) -> Any:
+        window = self.latency(key)
+        self.calls += 1
+        self.budget.deposit()
+
+        start = monotonic()
+        first = asyncio.ensure_future(fn())
+        attempts = [first]
+        hedge = None
+        try:
+            delay = window.value()
+            if delay is not None:
+                done, _ = await asyncio.wait([first], timeout=max(delay, self.min_delay))
+                if not done:
+                    if allow() and self.budget.withdraw():
+                        self.hedged += 1
+                        hedge = asyncio.ensure_future(fn())
+                        attempts.append(hedge)
+                    else:
+                        self.denied += 1
+
+            winner = await self.first_success(attempts)
+            if winner is None:
+                error = self.failure(attempts)
+                if len(attempts) > 1 or first.cancelled() or not retryable(error):
+                    raise error
+                if not (allow() and self.budget.withdraw()):
+                    self.denied += 1
+                    raise error
+
+                self.retried += 1
+                attempts.append(asyncio.ensure_future(fn()))
+                winner = await self.first_success(attempts[1:])
+                if winner is None:
+                    raise self.failure(attempts[1:])
+
+            if winner is hedge:
+                self.hedge_wins += 1
+            window.add(monotonic() - start)
+            return winner.result()
+        finally:
+            for attempt in attempts:
+                if not attempt.done():
+                    attempt.cancel()
+
+    @staticmethod
+    async def first_success(attempts: Iterable["asyncio.Future[Any]"]) -> Optional["asyncio.Future[Any]"]:
+        """
+        The first attempt to succeed, None once every attempt has failed
+        """
+        pending = set(attempts)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            succeeded = [
+                a for a in done if not a.cancelled() and a.exception() is None
+            ]
+            if succeeded:
+                return succeeded[0]
+
+        return None
+
+    @staticmethod
+    def failure(attempts: Iterable["asyncio.Future[Any]"]) -> BaseException:
+        """
+        Error of the first attempt that failed rather than was cancelled
+        """
+        for attempt in attempts:
+            if not attempt.cancelled():
+                return attempt.exception()
+
+        return asyncio.CancelledError()
+
+    def stats(self) -> Mapping[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "retried": self.retried,
+            "denied": self.denied,
+            "budget": round(self.budget.tokens, 2),
+            "delays": {
+                key: window.value() for key, window in self.latencies.items()
+            },
+        }
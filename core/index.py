@@ -0,0 +1,159 @@
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+GRAM = 3
+
+def grams(text: str) -> Set[str]:
+    return { text[i:i + GRAM] for i in range(len(text) - GRAM + 1) }
+
+
+class Node:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: Dict[str, "Node"] = {}
+        self.ids: Set[str] = set()
+
+
+class Doc:
+    __slots__ = ("name", "text", "value")
+
+    def __init__(self, name: str, text: str, value: Any):
+        self.name = name
+        self.text = text
+        self.value = value
+
+
+class TextIndex:
+    """
+    In-memory index of a small entity set. Names go in a trie for prefix
+    lookups and names plus any other text in trigram postings for
+    substring lookups, all matched case-insensitively.
+    """
+    def __init__(self):
+        self.docs: Dict[str, Doc] = {}
+        self.root = Node()
+        self.grams: Dict[str, Set[str]] = {}
+        self.loaded = False
+        self.syncs = 0
+        self.lookups = 0
+
+    def put(self, id: str, name: str, text: str, value: Any) -> None:
+        self.remove(id)
+        doc = self.docs[id] = Doc(name.lower(), f"{name}\n{text}".lower(), value)
+
+        node = self.root
+        for char in doc.name:
+            node = node.children.setdefault(char, Node())
+        node.ids.add(id)
+
+        for gram in grams(doc.text):
+            self.grams.setdefault(gram, set()).add(id)
+
+    def remove(self, id: str) -> None:
+        doc = self.docs.pop(id, None)
+        if doc is None:
+            return
+
+        path = [self.root]
+        for char in doc.name:
+            path.append(path[-1].children[char])
+        path[-1].ids.discard(id)
+        # Prune branches left empty
+        for i in range(len(doc.name), 0, -1):
+            node = path[i]
+            if node.ids or node.children:
+                break
+            del path[i - 1].children[doc.name[i - 1]]
+
+        for gram in grams(doc.text):
+            ids = self.grams.get(gram)
+            if ids is not None:
+                ids.discard(id)
+                if not ids:
+                    del self.grams[gram]
+
+    def sync(self, docs: Iterable[Tuple[str, str, str, Any]]) -> Mapping[str, int]:
+        """
+        Bring the index in line with a full listing, only touching the
+        entries that were added, changed or removed
+        """
+        seen = set()
+        added = updated = 0
+        for id, name, text, value in docs:
+            seen.add(id)
+            doc = self.docs.get(id)
+            if doc is None:
+                added += 1
+            elif doc.value != value:
+                updated += 1
+            else:
+                continue
+            self.put(id, name, text, value)
+
+        removed = [id for id in self.docs if id not in seen]
+        for id in removed:
+            self.remove(id)
+
+        self.loaded = True
+        self.syncs += 1
+        return { "added": added, "updated": updated, "removed": len(removed) }
+
+    def prefix(self, query: str, limit: int) -> List[Any]:
+        """
+        Values whose name starts with the query, in name order, followed
+        by those containing it elsewhere when there is room
+        """
+        self.lookups += 1
+        query = query.lower()
+        ids: List[str] = []
+        node: Optional[Node] = self.root
+        for char in query:
+            node = node.children.get(char)
+            if node is None:
+                break
+
+        if node is not None:
+            stack = [node]
+            while stack and len(ids) < limit:
+                node = stack.pop()
+                ids.extend(sorted(node.ids)[:limit - len(ids)])
+                stack.extend(node.children[c] for c in sorted(node.children, reverse=True))
+
+        if len(ids) < limit:
+            found = set(ids)
+            ids.extend([
+                id for id in self.matches(query, name_only=True) if id not in found
+            ][:limit - len(ids)])
+
+        return [self.docs[id].value for id in ids]
+
+    def search(self, query: str, start: int, limit: int) -> Tuple[int, List[Any]]:
+        """
+        Total count and a page of the values whose name or text contains
+        the query, in name order
+        """
+        self.lookups += 1
+        ids = self.matches(query.lower())
+        return len(ids), [self.docs[id].value for id in ids[start:start + limit]]
+
+    def matches(self, query: str, name_only: bool = False) -> List[str]:
+        if len(query) >= GRAM:
+            postings = sorted((self.grams.get(g, set()) for g in grams(query)), key=len)
+            candidates = set.intersection(*postings) if postings else set()
+        else:
+            candidates = self.docs.keys()
+
+        ids = [
+            id for id in candidates
+            if query in (self.docs[id].name if name_only else self.docs[id].text)
+        ]
+        return sorted(ids, key=lambda id: (self.docs[id].name, id))
+
+    def stats(self) -> Mapping[str, Any]:
+        return {
+            "entries": len(self.docs),
+            "grams": len(self.grams),
+            "loaded": self.loaded,
+            "syncs": self.syncs,
+            "lookups": self.lookups,
+        }
@@ -0,0 +1,187 @@
+import asyncio
+import math
+
+from collections import deque
+from time import monotonic
+from typing import Any, Deque, Dict, Mapping, Optional
+
+# Seconds of smoothed latency above the baseline always tolerated, so
+# jitter on very fast calls does not read as congestion
+SLACK = 0.05
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Lane:
+    def __init__(self, name: str, queue: float, wait: float, share: float):
+        self.name = name
+        self.queue = int(queue)
+        self.wait = wait
+        self.share = share
+        self.waiters: Deque["asyncio.Future[None]"] = deque()
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.latency = 0.0
+        self.baseline: Optional[float] = None
+
+    def stats(self) -> Mapping[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "latency": round(self.latency, 4),
+            "baseline": round(self.baseline, 4) if self.baseline is not None else None,
+        }
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit shared by priority lanes. The limit grows by
+    one per window of fast calls while it is in use and is cut by the
+    backoff factor, at most once per window, when a call fails or its
+    lane's smoothed latency exceeds tolerance times the baseline. Lanes
+    are served in the order given, each capped at its share of the
+    limit, and a caller is shed once its lane's queue is full or it has
+    waited longer than the lane allows.
+    """
+    def __init__(
+        self,
+        lanes: Mapping[str, Mapping[str, float]],
+        initial: int,
+        minimum: int,
+        maximum: int,
+        backoff: float,
+        tolerance: float
+    ):
+        self.lanes: Dict[str, Lane] = {
+            name: Lane(name, **config) for name, config in lanes.items()
+        }
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.in_flight = 0
+        self.increases = 0
+        self.decreases = 0
+        self.decreased = 0.0
+
+    async def acquire(self, name: str) -> float:
+        """
+        Wait for a slot in a lane, returning the start time to release
+        it with. Raises Overloaded when the call is shed.
+        """
+        lane = self.lanes[name]
+        if not lane.waiters and self.available(lane):
+            self.admit(lane)
+            return monotonic()
+
+        if len(lane.waiters) >= lane.queue:
+            lane.shed += 1
+            raise Overloaded(self.retry_after(lane))
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        lane.waiters.append(waiter)
+        expiry = loop.call_later(lane.wait, self.expire, lane, waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # Granted a slot just as the caller went away
+                self.release(name, None, None)
+            elif not waiter.done():
+                lane.waiters.remove(waiter)
+                waiter.cancel()
+            raise
+        finally:
+            expiry.cancel()
+
+        return monotonic()
+
+    def release(self, name: str, start: Optional[float], ok: Optional[bool]) -> None:
+        """
+        Return a slot. ok is None when the outcome says nothing about
+        upstream health, e.g. the caller was cancelled.
+        """
+        lane = self.lanes[name]
+        lane.in_flight -= 1
+        self.in_flight -= 1
+        if start is not None and ok is not None:
+            self.sample(lane, monotonic() - start, ok)
+
+        self.dispatch()
+
+    def idle(self, name: str) -> bool:
+        """
+        True when a call in the lane would start without queueing
+        """
+        lane = self.lanes[name]
+        return not lane.waiters and self.available(lane)
+
+    def available(self, lane: Lane) -> bool:
+        limit = int(self.limit)
+        return self.in_flight < limit and lane.in_flight < max(1, int(limit * lane.share))
+
+    def admit(self, lane: Lane) -> None:
+        lane.in_flight += 1
+        lane.admitted += 1
+        self.in_flight += 1
+
+    def dispatch(self) -> None:
+        for lane in self.lanes.values():
+            while lane.waiters and self.available(lane):
+                waiter = lane.waiters.popleft()
+                if not waiter.done():
+                    self.admit(lane)
+                    waiter.set_result(None)
+
+    def expire(self, lane: Lane, waiter: "asyncio.Future[None]") -> None:
+        if not waiter.done():
+            lane.waiters.remove(waiter)
+            lane.shed += 1
+            waiter.set_exception(Overloaded(self.retry_after(lane)))
+
+    def sample(self, lane: Lane, latency: float, ok: bool) -> None:
+        lane.latency = latency if not lane.latency else lane.latency * 0.9 + latency * 0.1
+        if ok:
+            if lane.baseline is None or latency < lane.baseline:
+                lane.baseline = latency
+            else:
+                # Drift up slowly so one fast call does not pin the baseline
+                lane.baseline += (latency - lane.baseline) * 0.01
+
+        now = monotonic()
+        if not ok or lane.latency > lane.baseline * self.tolerance + SLACK:
+            if now - self.decreased > latency:
+                self.limit = max(float(self.minimum), self.limit * self.backoff)
+                self.decreased = now
+                self.decreases += 1
+        elif self.in_flight + 1 >= int(self.limit) // 2:
+            limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            if int(limit) > int(self.limit):
+                self.increases += 1
+            self.limit = limit
+
+    def retry_after(self, lane: Lane) -> int:
+        """
+        Seconds until the lane's queue is likely to have drained
+        """
+        slots = max(1, int(self.limit * lane.share))
+        latency = lane.latency or 1.0
+        return max(1, math.ceil(latency * (len(lane.waiters) + 1) / slots))
+
+    def stats(self) -> Mapping[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "lanes": { name: lane.stats() for name, lane in self.lanes.items() },
+        }
@@ -0,0 +1,76 @@
+import asyncio
+
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional
+
+
+class BatchLoader:
+    """
+    Collects keys requested within a short window and resolves them with
+    one call to the batch function, which returns values in key order.
+    A window of zero batches everything requested in the same event loop
+    tick.
+    """
+    def __init__(
+        self,
+        fn: Callable[[List[str]], Awaitable[List[Any]]],
+        max_size: int,
+        window: float
+    ):
+        self.fn = fn
+        self.max_size = max(1, max_size)
+        self.window = window
+        self.pending: Dict[str, "asyncio.Future[Any]"] = {}
+        self.handle: Optional[asyncio.Handle] = None
+        self.batches = 0
+        self.keys = 0
+
+    async def load(self, key: str) -> Any:
+        fut = self.pending.get(key)
+        if fut is None:
+            loop = asyncio.get_running_loop()
+            fut = loop.create_future()
+            self.pending[key] = fut
+            if len(self.pending) >= self.max_size:
+                self.dispatch()
+            elif self.handle is None:
+                if self.window > 0:
+                    self.handle = loop.call_later(self.window, self.dispatch)
+                else:
+                    self.handle = loop.call_soon(self.dispatch)
+
+        # Shielded so one caller going away does not fail the batch
+        return await asyncio.shield(fut)
+
+    def dispatch(self) -> None:
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+        batch, self.pending = self.pending, {}
+        if batch:
+            self.batches += 1
+            self.keys += len(batch)
+            asyncio.ensure_future(self.run(batch))
+
+    async def run(self, batch: Mapping[str, "asyncio.Future[Any]"]) -> None:
+        try:
+            values = await self.fn(list(batch))
+        except Exception as e:
+            for fut in batch.values():
+                if not fut.done():
+                    fut.set_exception(e)
+        else:
+            for fut, value in zip(batch.values(), values):
+                if not fut.done():
+                    fut.set_result(value)
+        finally:
+            for fut in batch.values():
+                if not fut.done():
+                    fut.cancel()
+
+    def stats(self) -> Mapping[str, Any]:
+        return {
+            "pending": len(self.pending),
+            "batches": self.batches,
+            "keys": self.keys,
+        }
@@ -0,0 +1,314 @@
+import sqlite3
+
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from . import codec
+
+
+def match(query: str) -> str:
+    """
+    FTS5 expression matching rows with a word starting with each word
+    of the query
+    """
+    words = [w for w in query.replace('"', " ").split() if w]
+    return " ".join(f'"{w}"*' for w in words) or '""'
+
+
+class Catalog:
+    """
+    SQLite mirror of the DataHub catalog. Entities are stored as fetched
+    with the full selection, next to the columns they are searched and
+    filtered by and an FTS5 index of their names. Row counts of the
+    tables are kept up to date by the writes, so listings never count.
+    Blocking: callers on the event loop run it in an executor.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS datasets (
+            urn TEXT PRIMARY KEY,
+            name TEXT,
+            platform TEXT,
+            modified REAL,
+            synced REAL NOT NULL,
+            entity BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS datasets_name ON datasets (name);
+        CREATE INDEX IF NOT EXISTS datasets_platform ON datasets (platform);
+        CREATE TABLE IF NOT EXISTS dataset_tags (
+            dataset TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            PRIMARY KEY (dataset, tag)
+        );
+        CREATE INDEX IF NOT EXISTS dataset_tags_tag ON dataset_tags (tag);
+        CREATE TABLE IF NOT EXISTS fields (
+            dataset TEXT NOT NULL,
+            path TEXT NOT NULL,
+            type TEXT,
+            native TEXT,
+            PRIMARY KEY (dataset, path)
+        );
+        CREATE TABLE IF NOT EXISTS tags (
+            urn TEXT PRIMARY KEY,
+            name TEXT,
+            synced REAL NOT NULL,
+            entity BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS tags_name ON tags (name);
+        CREATE TABLE IF NOT EXISTS platforms (
+            urn TEXT PRIMARY KEY,
+            name TEXT,
+            synced REAL NOT NULL,
+            entity BLOB NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value REAL NOT NULL
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS datasets_fts USING fts5 (
+            urn UNINDEXED, name, title, fields
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS tags_fts USING fts5 (
+            urn UNINDEXED, name, description
+        );
+    """
+
+    COUNTED = ("datasets", "fields", "tags", "platforms")
+
+    def __init__(self, path: str, modified: str):
+        self.modified = modified
+        self.db = sqlite3.connect(path, timeout=1.0, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+        self.counts: Dict[str, int] = {
+            table: self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in self.COUNTED
+        }
+        self.changes: Counter = Counter()
+
+    # Writes, made inside a transaction
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Run writes in one transaction, applying their row count changes
+        once it commits
+        """
+        self.changes = Counter()
+        with self.db:
+            self.db.execute("BEGIN")
+            yield
+        for table in self.COUNTED:
+            self.counts[table] += self.changes[table]
+
+    def insert(self, table: str, rows: Sequence[Sequence[Any]]) -> None:
+        if rows:
+            marks = ", ".join("?" for _ in rows[0])
+            cur = self.db.executemany(f"INSERT OR IGNORE INTO {table} VALUES ({marks})", rows)
+            self.changes[table] += cur.rowcount
+
+    def delete(self, table: str, column: str, value: str) -> None:
+        cur = self.db.execute(f"DELETE FROM {table} WHERE {column} = ?", (value,))
+        self.changes[table] -= cur.rowcount
+
+    def put_datasets(self, entities: Iterable[Mapping], synced: float) -> int:
+        count = 0
+        with self.transaction():
+            for e in entities:
+                self.put_dataset(e, synced)
+                count += 1
+
+        return count
+
+    def put_dataset(self, e: Mapping, synced: float) -> None:
+        urn = e["urn"]
+        props = e.get("properties") or {}
+        platform = e.get("platform") or {}
+        schema = e.get("schema") or {}
+        fields = schema.get("fields") or []
+        tags = (e.get("tags") or {}).get("tags") or []
+
+        self.delete_dataset(urn)
+        self.insert("datasets", [(
+            urn, e.get("name"), platform.get("name"), e.get(self.modified), synced, codec.dumps(e)
+        )])
+        self.insert("dataset_tags", [(urn, t["tag"]["urn"]) for t in tags])
+        self.insert("fields", [(urn, f["path"], f.get("type"), f.get("native")) for f in fields])
+        self.insert("datasets_fts", [
+            (urn, e.get("name"), props.get("name"), " ".join(f["path"] for f in fields))
+        ])
+
+    def delete_dataset(self, urn: str) -> None:
+        for table, column in (
+            ("datasets", "urn"), ("dataset_tags", "dataset"),
+            ("fields", "dataset"), ("datasets_fts", "urn")
+        ):
+            self.delete(table, column, urn)
+
+    def put_tags(self, entities: Iterable[Mapping], synced: float) -> int:
+        count = 0
+        with self.transaction():
+            for e in entities:
+                self.put_tag(e, synced)
+                count += 1
+
+        return count
+
+    def put_tag(self, e: Mapping, synced: float) -> None:
+        urn = e["urn"]
+        props = e.get("properties") or {}
+        self.delete_tag(urn)
+        self.insert("tags", [(urn, props.get("name"), synced, codec.dumps(e))])
+        self.insert("tags_fts", [(urn, props.get("name"), props.get("description"))])
+
+    def delete_tag(self, urn: str) -> None:
+        self.delete("tags", "urn", urn)
+        self.delete("tags_fts", "urn", urn)
+
+    def put_platforms(self, entities: Iterable[Mapping], synced: float) -> int:
+        count = 0
+        with self.transaction():
+            for e in entities:
+                self.delete("platforms", "urn", e["urn"])
+                self.insert("platforms", [(e["urn"], e.get("name"), synced, codec.dumps(e))])
+                count += 1
+
+        return count
+
+    def remove_tag(self, urn: str) -> None:
+        with self.transaction():
+            self.delete_tag(urn)
+
+    def prune(self, table: str, before: float) -> int:
+        """
+        Drop rows not seen by a full sync started at before
+        """
+        with self.transaction():
+            urns = [r[0] for r in self.db.execute(
+                f"SELECT urn FROM {table} WHERE synced < ?", (before,)
+            )]
+            for urn in urns:
+                if table == "datasets":
+                    self.delete_dataset(urn)
+                elif table == "tags":
+                    self.delete_tag(urn)
+                else:
+                    self.delete(table, "urn", urn)
+
+        return len(urns)
+
+    def tag_datasets(self, datasets: List[str], tag: str, add: bool) -> None:
+        """
+        Apply a tag mutation to the mirrored datasets among datasets
+        """
+        found = self.db.execute("SELECT entity FROM tags WHERE urn = ?", (tag,)).fetchone()
+        entity = codec.loads(found[0]) if found else {
+            "urn": tag, "__typename": "Tag", "properties": None
+        }
+
+        with self.transaction():
+            for dataset in datasets:
+                row = self.db.execute(
+                    "SELECT entity, synced FROM datasets WHERE urn = ?", (dataset,)
+                ).fetchone()
+                if row is None:
+                    continue
+
+                e = codec.loads(row[0])
+                tags = (e.get("tags") or {}).get("tags") or []
+                tags = [t for t in tags if t["tag"]["urn"] != tag]
+                if add:
+                    tags.append({ "tag": entity })
+                e["tags"] = { "tags": tags }
+                self.put_dataset(e, row[1])
+
+    def set_meta(self, key: str, value: float) -> None:
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def meta(self, key: str) -> Optional[float]:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    # Reads, each returning the total and a page of entities. Totals of
+    # filtered reads are counted from indexes, never the entity rows.
+
+    def rows(self, sql: str, args: Sequence[Any], start: int, limit: int) -> List[Any]:
+        rows = self.db.execute(f"{sql} LIMIT ? OFFSET ?", (*args, limit, start))
+        return [codec.loads(r[0]) for r in rows]
+
+    def count(self, sql: str, args: Sequence[Any]) -> int:
+        return self.db.execute(sql, args).fetchone()[0]
+
+    def datasets(self, start: int, limit: int) -> Tuple[int, List[Any]]:
+        return self.counts["datasets"], self.rows(
+            "SELECT entity FROM datasets ORDER BY name, urn", (), start, limit
+        )
+
+    def search_datasets(self, query: str, start: int, limit: int) -> Tuple[int, List[Any]]:
+        args = (match(query),)
+        return (
+            self.count("SELECT COUNT(*) FROM datasets_fts WHERE datasets_fts MATCH ?", args),
+            self.rows(
+                "SELECT d.entity FROM datasets_fts f JOIN datasets d ON d.urn = f.urn"
+                " WHERE datasets_fts MATCH ? ORDER BY f.rank",
+                args, start, limit
+            )
+        )
+
+    def datasets_by_name(self, prefix: str, limit: int) -> List[Any]:
+        return self.rows(
+            "SELECT d.entity FROM datasets_fts f JOIN datasets d ON d.urn = f.urn"
+            " WHERE datasets_fts MATCH ? ORDER BY d.name",
+            (f"{{name title}} : {match(prefix)}",), 0, limit
+        )
+
+    def datasets_by_tags(self, tags: List[str], start: int, limit: int) -> Tuple[int, List[Any]]:
+        marks = ", ".join("?" for _ in tags)
+        return (
+            self.count(
+                f"SELECT COUNT(DISTINCT dataset) FROM dataset_tags WHERE tag IN ({marks})", tags
+            ),
+            self.rows(
+                "SELECT entity FROM datasets WHERE urn IN"
+                f" (SELECT dataset FROM dataset_tags WHERE tag IN ({marks})) ORDER BY name, urn",
+                tags, start, limit
+            )
+        )
+
+    def datasets_by_platform(self, platform: str, start: int, limit: int) -> Tuple[int, List[Any]]:
+        return (
+            self.count("SELECT COUNT(*) FROM datasets WHERE platform = ?", (platform,)),
+            self.rows(
+                "SELECT entity FROM datasets WHERE platform = ? ORDER BY name, urn",
+                (platform,), start, limit
+            )
+        )
+
+    def tags(self, start: int, limit: int) -> Tuple[int, List[Any]]:
+        return self.counts["tags"], self.rows(
+            "SELECT entity FROM tags ORDER BY name, urn", (), start, limit
+        )
+
+    def search_tags(self, query: str, start: int, limit: int) -> Tuple[int, List[Any]]:
+        args = (match(query),)
+        return (
+            self.count("SELECT COUNT(*) FROM tags_fts WHERE tags_fts MATCH ?", args),
+            self.rows(
+                "SELECT t.entity FROM tags_fts f JOIN tags t ON t.urn = f.urn"
+                " WHERE tags_fts MATCH ? ORDER BY f.rank",
+                args, start, limit
+            )
+        )
+
+    def tags_by_name(self, prefix: str, limit: int) -> List[Any]:
+        return self.rows(
+            "SELECT t.entity FROM tags_fts f JOIN tags t ON t.urn = f.urn"
+            " WHERE tags_fts MATCH ? ORDER BY t.name",
+            (f"name : {match(prefix)}",), 0, limit
+        )
+
+    def platforms(self) -> List[Any]:
+        return [codec.loads(r[0]) for r in self.db.execute(
+            "SELECT entity FROM platforms ORDER BY name"
+        )]
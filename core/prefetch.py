@@ -0,0 +1,77 @@
+import asyncio
+
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Awaitable, Callable, Hashable, Mapping, Optional, Tuple
+from fastapi.logger import logger
+
+
+class Prefetcher:
+    """
+    Results fetched ahead of the request for them and kept for a short
+    TTL, each taken at most once. A request arriving while its prefetch
+    is in flight waits for it. Fetching ahead is skipped when the
+    concurrency budget is spent or the caller reports upstream pressure.
+    """
+    def __init__(self, ttl: float, max_entries: int, concurrency: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.concurrency = concurrency
+        self.entries: "OrderedDict[Hashable, Tuple[float, asyncio.Future[Any]]]" = OrderedDict()
+        self.running = 0
+        self.hits = 0
+        self.misses = 0
+        self.started = 0
+        self.skipped = 0
+        self.failures = 0
+
+    async def get(self, key: Hashable) -> Optional[Any]:
+        entry = self.entries.pop(key, None)
+        value = None
+        if entry is not None and entry[0] > monotonic():
+            # Shielded so the caller going away leaves it for no one else
+            value = await asyncio.shield(entry[1])
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def ahead(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], allow: bool) -> None:
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > monotonic():
+            return
+        if not allow or self.running >= self.concurrency:
+            self.skipped += 1
+            return
+
+        # Counted here rather than when the task first runs, so calls in
+        # the same tick see the slots already taken
+        self.running += 1
+        self.started += 1
+        self.entries.pop(key, None)
+        self.entries[key] = (monotonic() + self.ttl, asyncio.ensure_future(self.run(fetch)))
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def run(self, fetch: Callable[[], Awaitable[Any]]) -> Optional[Any]:
+        try:
+            return await fetch()
+        except Exception as e:
+            self.failures += 1
+            logger.debug(f"Prefetch failed: {e!r}")
+            return None
+        finally:
+            self.running -= 1
+
+    def stats(self) -> Mapping[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "running": self.running,
+            "hits": self.hits,
+            "misses": self.misses,
+            "started": self.started,
+            "skipped": self.skipped,
+            "failures": self.failures,
+        }
@@ -0,0 +1,132 @@
+import asyncio
+
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Mapping, Optional, Set, Tuple
+from fastapi.logger import logger
+
+from .config import settings
+from .flight import SingleFlight
+
+
+class Entry:
+    __slots__ = ("value", "fresh", "stale", "deps", "refresh")
+
+    def __init__(self, value: Any, fresh: float, stale: float, deps: Tuple[str, ...]):
+        self.value = value
+        self.fresh = fresh
+        self.stale = stale
+        self.deps = deps
+        self.refresh: Optional["asyncio.Future[Any]"] = None
+
+
+class StaleCache:
+    """
+    Stale-while-revalidate store for slow-changing upstream results.
+    Values are served as they are until the soft TTL, then served while
+    a background task refreshes them. A failed refresh leaves the old
+    value in place until the hard TTL, after which callers wait for a
+    fresh one.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Hashable, Entry]" = OrderedDict()
+        self.deps: Dict[str, Set[Hashable]] = {}
+        self.flights = SingleFlight()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.failures = 0
+
+    async def get(
+        self,
+        kind: str,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Any]],
+        deps: Iterable[str] = ()
+    ) -> Any:
+        """
+        Value for a key, with TTLs from the STALE_TTLS entry for its kind
+        """
+        ttl = settings.STALE_TTLS[kind]
+        entry = self.entries.get(key)
+        now = monotonic()
+        if entry is None or entry.stale <= now:
+            self.misses += 1
+            value = await self.flights.do(key, fetch)
+            self.store(key, value, ttl, deps)
+            return value
+
+        self.entries.move_to_end(key)
+        if entry.fresh <= now:
+            self.stale_hits += 1
+            if entry.refresh is None:
+                entry.refresh = asyncio.ensure_future(
+                    self.revalidate(kind, key, entry, fetch, ttl)
+                )
+        else:
+            self.hits += 1
+
+        return entry.value
+
+    async def revalidate(
+        self,
+        kind: str,
+        key: Hashable,
+        entry: Entry,
+        fetch: Callable[[], Awaitable[Any]],
+        ttl: Mapping[str, float]
+    ) -> None:
+        self.refreshes += 1
+        try:
+            value = await self.flights.do(key, fetch)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Failed to refresh {kind}, serving stale: {e!r}")
+            return
+        finally:
+            entry.refresh = None
+
+        # Skip if invalidated or replaced while refreshing
+        if self.entries.get(key) is entry:
+            self.store(key, value, ttl, entry.deps)
+
+    def store(self, key: Hashable, value: Any, ttl: Mapping[str, float], deps: Iterable[str]) -> None:
+        self.delete(key)
+        now = monotonic()
+        entry = Entry(value, now + ttl["soft"], now + ttl["hard"], tuple(deps))
+        self.entries[key] = entry
+        for dep in entry.deps:
+            self.deps.setdefault(dep, set()).add(key)
+
+        while len(self.entries) > self.max_entries:
+            self.delete(next(iter(self.entries)))
+
+    def delete(self, key: Hashable) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            for dep in entry.deps:
+                keys = self.deps.get(dep)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.deps[dep]
+
+    def invalidate(self, *deps: str) -> None:
+        for dep in deps:
+            for key in list(self.deps.get(dep, ())):
+                self.delete(key)
+
+    def stats(self) -> Mapping[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.failures,
+        }
+
+
+stale = StaleCache(settings.STALE_MAX_ENTRIES)
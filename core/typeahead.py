@@ -0,0 +1,104 @@
+import re
+
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Callable, Hashable, Iterable, List, Mapping, Optional, Tuple
+
+WORD = re.compile(r"[^0-9a-z]+")
+
+def words(name: str) -> List[str]:
+    return [w for w in WORD.split(name.lower()) if w]
+
+
+class Entry:
+    __slots__ = ("values", "complete", "expires")
+
+    def __init__(self, values: List[Any], complete: bool, expires: float):
+        self.values = values
+        self.complete = complete
+        self.expires = expires
+
+
+class PrefixCache:
+    """
+    Short-lived autocomplete results per prefix. A prefix whose result
+    held fewer values than its limit is complete, so any longer prefix
+    is answered by filtering it: a value matches when its name, or a word
+    in it, starts with the prefix.
+    """
+    def __init__(
+        self,
+        names: Callable[[Any], Iterable[Optional[str]]],
+        ttl: float,
+        max_entries: int
+    ):
+        self.names = names
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[Hashable, str], Entry]" = OrderedDict()
+        self.hits = 0
+        self.derived = 0
+        self.misses = 0
+
+    def get(self, scope: Hashable, query: str, limit: int) -> Optional[List[Any]]:
+        query = query.lower()
+        entry = self.entry(scope, query)
+        if entry is not None and (entry.complete or len(entry.values) >= limit):
+            self.hits += 1
+            return entry.values[:limit]
+
+        # Only plain word prefixes narrow as they grow
+        if WORD.search(query) is None:
+            for end in range(len(query) - 1, 0, -1):
+                entry = self.entry(scope, query[:end])
+                if entry is not None and entry.complete:
+                    values = self.narrow(entry.values, query)
+                    if values is not None:
+                        self.derived += 1
+                        self.put(scope, query, limit, values[:limit])
+                        return values[:limit]
+
+        self.misses += 1
+        return None
+
+    def put(self, scope: Hashable, query: str, limit: int, values: List[Any]) -> None:
+        key = (scope, query.lower())
+        self.entries.pop(key, None)
+        self.entries[key] = Entry(values, len(values) < limit, monotonic() + self.ttl)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def entry(self, scope: Hashable, query: str) -> Optional[Entry]:
+        key = (scope, query)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= monotonic():
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        return entry
+
+    def narrow(self, values: List[Any], query: str) -> Optional[List[Any]]:
+        """
+        Values matching the longer prefix, None if any has no name to
+        match against
+        """
+        matched = []
+        for value in values:
+            names = [n.lower() for n in self.names(value) if n]
+            if not names:
+                return None
+            if any(n.startswith(query) or any(w.startswith(query) for w in words(n)) for n in names):
+                matched.append(value)
+
+        return matched
+
+    def stats(self) -> Mapping[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "derived": self.derived,
+            "misses": self.misses,
+        }
@@ -1,22 +1,53 @@
 #!/usr/bin/env python3
 
-from fastapi import FastAPI
+import asyncio
+
+from contextlib import asynccontextmanager
+from typing import Any
+from fastapi import status, FastAPI, Response
 from fastapi.logger import logger
 
 from .api.v1 import api_router
+from .api.v1 import fields, sync
+from .api.v1.mirror import mirror
+from .api.v1.warmup import warmup
 from .core import client, settings
 
-async def on_start_up() -> None:
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     logger.info("Creating session")
-    client.get_session()
-
-async def on_shutdown() -> None:
+    tasks = []
+    if settings.WARM_ENABLED:
+        # Serve /ready (as not ready) while warming up
+        tasks.append(asyncio.ensure_future(warmup.run()))
+    else:
+        await client.open_session()
+        warmup.ready = True
+    if settings.INDEX_ENABLED:
+        tasks.append(asyncio.ensure_future(warmup.refresh(load=not settings.WARM_ENABLED)))
+    if mirror.catalog is not None:
+        tasks.append(asyncio.ensure_future(sync.run()))
+    if settings.FIELDS_ENABLED:
+        tasks.append(asyncio.ensure_future(fields.run()))
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
     logger.info("Closing session")
     await client.close_session()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    on_start_up=[on_start_up],
-    on_shutdown=[on_shutdown],
+    lifespan=lifespan,
 )
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
+
+@app.get("/ready")
+async def ready(response: Response) -> Any:
+    """
+    Readiness for the load balancer, 503 until warm up has finished
+    """
+    if not warmup.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    return warmup.state()
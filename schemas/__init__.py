@@ -1,4 +1,4 @@
-from .datasets import Datasets, DatasetEnvelope
+from .datasets import Datasets, DatasetEnvelope, DatasetFields, Facets, Fields
 from .platforms import Platforms, PlatformEnvelope
-from .requests import AddTag, CreateTag
+from .requests import AddTag, CreateTag, LookupDatasets, SubRequest, TagAssignment
 from .tags import Tags, Tag, TagEnvelope
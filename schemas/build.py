@@ -0,0 +1,15 @@
+from typing import Type, TypeVar
+from pydantic import BaseModel
+
+from ..core import codec
+
+Model = TypeVar("Model", bound=BaseModel)
+
+def build(model: Type[Model], **values) -> Model:
+    """
+    Model from trusted upstream values, left unvalidated on the fast path
+    """
+    if codec.fast():
+        return model.construct(**values)
+
+    return model(**values)
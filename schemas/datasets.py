@@ -1,6 +1,7 @@
 from typing import List, Optional
 from pydantic import BaseModel
 
+from .build import build
 from .paging import Paging
 from .tags import TagEnvelope
 
@@ -11,50 +12,145 @@ class Field(BaseModel):
 
     @staticmethod
     def from_json(f):
-        return Field(**f)
+        return build(Field, **f)
 
 
 class Dataset(BaseModel):
     id: str
-    path: str
+    path: Optional[str]
     type: Optional[str]
     name: Optional[str]
     origin: Optional[str]
     platform: Optional[str]
     platformType: Optional[str]
     platformName: Optional[str]
-    tags: List[TagEnvelope]
+    tags: Optional[List[TagEnvelope]]
     fields: Optional[List[Field]]
+    fieldCount: Optional[int]
 
 
 class DatasetEnvelope(BaseModel):
     dataset: Optional[Dataset]
 
     @staticmethod
-    def from_json(e):
+    def from_json(e, fields=None):
+        """
+        Only the given public fields are built when fields is not None
+        """
         if e is not None:
-            st = e["subTypes"]
-            props = e["properties"]
-            platform = e["platform"]
-            fields = e["schema"]["fields"] if e["schema"] else None
-            tags = e["tags"]["tags"] if e["tags"] else None
-
-            dataset = Dataset(
-                id=e["urn"],
-                path=e["name"],
-                type=st["names"][0] if st else None,
-                name=props["name"] if props else None,
-                origin=props["origin"] if props else None,
-                platform=platform["name"] if platform else None,
-                platformName=platform["properties"]["name"] if platform else None,
-                platformType=platform["properties"]["type"] if platform else None,
-                tags=[TagEnvelope.from_json(t) for t in tags] if tags else [],
-                fields=[Field.from_json(f) for f in fields] if fields else None,
-            )
+            wants = (lambda name: True) if fields is None else fields.__contains__
+            values = { "id": e["urn"] }
+
+            if wants("path"):
+                values["path"] = e["name"]
+            if wants("type"):
+                st = e["subTypes"]
+                values["type"] = st["names"][0] if st else None
+            if wants("name") or wants("origin"):
+                props = e["properties"]
+                if wants("name"):
+                    values["name"] = props["name"] if props else None
+                if wants("origin"):
+                    values["origin"] = props["origin"] if props else None
+            if wants("platform") or wants("platformName") or wants("platformType"):
+                platform = e["platform"]
+                if wants("platform"):
+                    values["platform"] = platform["name"] if platform else None
+                if wants("platformName"):
+                    values["platformName"] = platform["properties"]["name"] if platform else None
+                if wants("platformType"):
+                    values["platformType"] = platform["properties"]["type"] if platform else None
+            if wants("tags"):
+                tags = e["tags"]["tags"] if e["tags"] else None
+                values["tags"] = [TagEnvelope.from_json(t) for t in tags] if tags else []
+            if wants("fields"):
+                schema = e["schema"]["fields"] if e["schema"] else None
+                values["fields"] = [Field.from_json(f) for f in schema] if schema else None
+            if fields is not None and "fieldCount" in fields:
+                values["fieldCount"] = len(e["schema"]["fields"]) if e["schema"] else 0
+
+            dataset = build(Dataset, **values)
         else:
             dataset = None
 
-        return DatasetEnvelope(dataset=dataset)
+        return build(DatasetEnvelope, dataset=dataset)
+
+
+class Fields(BaseModel):
+    data: List[Field]
+    paging: Paging
+
+    @staticmethod
+    def from_json(e, offset, limit, match=None):
+        """
+        Page of the schema fields whose path starts with match, only
+        the fields on the page are built
+        """
+        fields = e["schema"]["fields"] if e and e["schema"] else []
+
+        data = []
+        total = 0
+        for f in fields:
+            if match and not f["path"].startswith(match):
+                continue
+            if offset <= total < offset + limit:
+                data.append(Field.from_json(f))
+            total += 1
+
+        return build(
+            Fields,
+            data=data,
+            paging=build(Paging, total=total, limit=limit, offset=offset, next=None)
+        )
+
+
+class DatasetField(BaseModel):
+    dataset: str
+    platform: Optional[str]
+    path: str
+    type: Optional[str]
+    native: Optional[str]
+
+
+class DatasetFields(BaseModel):
+    data: List[DatasetField]
+    paging: Paging
+
+    @staticmethod
+    def from_json(total, entries, offset, limit):
+        return build(
+            DatasetFields,
+            data=[build(DatasetField, **e) for e in entries],
+            paging=build(Paging, total=total, limit=limit, offset=offset, next=None)
+        )
+
+
+class FacetValue(BaseModel):
+    value: str
+    name: Optional[str]
+    count: int
+
+
+class Facet(BaseModel):
+    field: str
+    name: Optional[str]
+    values: List[FacetValue]
+
+
+class Facets(BaseModel):
+    data: List[Facet]
+
+    @staticmethod
+    def from_json(results):
+        return build(Facets, data=[
+            build(
+                Facet,
+                field=f["field"],
+                name=f.get("name"),
+                values=[build(FacetValue, **a) for a in f["aggregations"]]
+            )
+            for f in results["facets"]
+        ])
 
 
 class Datasets(BaseModel):
@@ -62,12 +158,12 @@ class Datasets(BaseModel):
     paging: Optional[Paging]
 
     @staticmethod
-    def from_json(results):
-        if results["__typename"] == "SearchResults":
-            data = [DatasetEnvelope.from_json(e["entity"]) for e in results["entities"]]
+    def from_json(results, fields=None):
+        if results["__typename"] in ("SearchResults", "ScrollResults"):
+            data = [DatasetEnvelope.from_json(e["entity"], fields) for e in results["entities"]]
             paging = Paging.from_json(results)
         else:
-            data = [DatasetEnvelope.from_json(e) for e in results["entities"]]
+            data = [DatasetEnvelope.from_json(e, fields) for e in results["entities"]]
             paging = None
 
-        return Datasets(data=data, paging=paging)
\ No newline at end of file
+        return build(Datasets, data=data, paging=paging)
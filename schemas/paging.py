@@ -1,14 +1,20 @@
+from typing import Optional
 from pydantic import BaseModel
 
+from .build import build
+
 class Paging(BaseModel):
     total: int
     limit: int
     offset: int
+    next: Optional[str]
 
     @staticmethod
-    def from_json(data):
-        return Paging(
+    def from_json(data, offset=None, next=None):
+        return build(
+            Paging,
             total=data["total"],
             limit=data["count"],
-            offset=data["start"]
-        )
\ No newline at end of file
+            offset=data.get("start", 0) if offset is None else offset,
+            next=next
+        )
@@ -1,6 +1,7 @@
 from typing import List, Optional
 from pydantic import BaseModel
 
+from .build import build
 from .paging import Paging
 
 class Platform(BaseModel):
@@ -15,10 +16,11 @@ class PlatformEnvelope(BaseModel):
 
     @staticmethod
     def from_json(e):
-        print(e)
         props = e["properties"]
-        return PlatformEnvelope(
-            platform = Platform(
+        return build(
+            PlatformEnvelope,
+            platform = build(
+                Platform,
                 id=e["urn"],
                 name=e["name"],
                 type=props["type"],
@@ -36,4 +38,4 @@ class Platforms(BaseModel):
         platforms = [m for m in modules if m["id"] == "Platforms"][0]
         data = [PlatformEnvelope.from_json(e["entity"]) for e in platforms["content"]]
 
-        return Platforms(data=data, paging=None)
\ No newline at end of file
+        return build(Platforms, data=data, paging=None)
\ No newline at end of file
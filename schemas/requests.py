@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel
 
 class AddTag(BaseModel):
@@ -7,4 +7,20 @@ class AddTag(BaseModel):
 
 class CreateTag(BaseModel):
     name: str
-    description: Optional[str]
\ No newline at end of file
+    description: Optional[str]
+
+
+class TagAssignment(BaseModel):
+    dataset: str
+    tag: str
+    action: Literal["add", "remove"] = "add"
+
+class LookupDatasets(BaseModel):
+    urns: List[str]
+
+
+class SubRequest(BaseModel):
+    method: str = "GET"
+    path: str
+    query: Dict[str, str] = {}
+    body: Optional[Any]
@@ -2,6 +2,7 @@ import json
 from typing import List, Optional
 from pydantic import BaseModel, Field
 
+from .build import build
 from .paging import Paging
 
 class Tag(BaseModel):
@@ -14,20 +15,28 @@ class TagEnvelope(BaseModel):
     tag: Optional[Tag]
 
     @staticmethod
-    def from_json(e):
+    def from_json(e, fields=None):
+        """
+        Only the given public fields are built when fields is not None
+        """
         if e is not None:
             if "tag" in e: e = e["tag"]
-            props = e["properties"]
 
-            tag = Tag(
-                id=e["urn"],
-                name=props["name"] if props else None,
-                description=props["description"] if props else None,
-            )
+            wants = (lambda name: True) if fields is None else fields.__contains__
+            values = { "id": e["urn"] }
+
+            if wants("name") or wants("description"):
+                props = e["properties"]
+                if wants("name"):
+                    values["name"] = props["name"] if props else None
+                if wants("description"):
+                    values["description"] = props["description"] if props else None
+
+            tag = build(Tag, **values)
         else:
             tag = None
 
-        return TagEnvelope(tag=tag)
+        return build(TagEnvelope, tag=tag)
 
 
 class Tags(BaseModel):
@@ -35,12 +44,12 @@ class Tags(BaseModel):
     paging: Optional[Paging]
 
     @staticmethod
-    def from_json(results):
-        if results["__typename"] == "SearchResults":
+    def from_json(results, fields=None):
+        if results["__typename"] in ("SearchResults", "ScrollResults"):
             paging = Paging.from_json(results)
-            data = [TagEnvelope.from_json(e["entity"]) for e in results["entities"]]
+            data = [TagEnvelope.from_json(e["entity"], fields) for e in results["entities"]]
         else:
             paging = None
-            data = [TagEnvelope.from_json(e) for e in results["entities"]]
+            data = [TagEnvelope.from_json(e, fields) for e in results["entities"]]
 
-        return Tags(data=data, paging=paging)
+        return build(Tags, data=data, paging=paging)
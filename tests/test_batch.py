@@ -0,0 +1,158 @@
+import asyncio
+import pytest
+import re
+
+from fastapi import Request
+
+from ..api.v1 import batch, datasets, graphql, platforms, tags
+from ..core.cache import NullCache
+from ..core.config import settings
+from .upstream import Session
+
+
+def request(query: str = "") -> Request:
+    return Request({ "type": "http", "query_string": query.encode() })
+
+
+def test_aliased_prefixes_top_level_fields_only():
+    assert graphql.aliased("dataset(urn: $urn) { urn name }", "s0_") == (
+        "s0_dataset: dataset(urn: $urn) { urn name }"
+    )
+    assert graphql.aliased("results: search(input: $input) { total }", "s1_") == (
+        "s1_results: search(input: $input) { total }"
+    )
+
+
+def test_merge_keeps_shared_variables_apart():
+    merged = graphql.merge([
+        datasets.GET_BY_ID.body("urn:li:dataset:a", frozenset(["id"])),
+        tags.GET_BY_ID.body("urn:li:tag:pii", frozenset(["id"])),
+        platforms.GET_BY_ID.body("urn:li:dataPlatform:hive"),
+    ])
+    assert merged["variables"] == {
+        "s0_urn": "urn:li:dataset:a",
+        "s1_urn": "urn:li:tag:pii",
+        "s2_urn": "urn:li:dataPlatform:hive",
+    }
+    operation = merged["operation"]
+    assert operation.startswith(
+        "query batch($s0_urn: String!, $s1_urn: String!, $s2_urn: String!)"
+    )
+    assert re.search(r"s0_dataset: dataset\(urn: \$s0_urn\)", operation)
+    assert re.search(r"s1_tag: tag\(urn: \$s1_urn\)", operation)
+    assert re.search(r"s2_dataPlatform: dataPlatform\(urn: \$s2_urn\)", operation)
+    assert "$urn" not in operation
+
+
+def test_split_routes_results_and_errors_by_alias():
+    results = graphql.split({
+        "data": { "s0_dataset": { "urn": "a" }, "s1_tag": None, "s2_results": { "total": 0 } },
+        "errors": [
+            { "message": "boom", "path": ["s1_tag"] },
+            { "message": "no path" },
+        ],
+    }, 3)
+    assert results == [
+        { "data": { "dataset": { "urn": "a" } }, "errors": [] },
+        { "data": { "tag": None }, "errors": [{ "message": "boom", "path": ["s1_tag"] }] },
+        { "data": { "results": { "total": 0 } }, "errors": [] },
+    ]
+
+
+@pytest.fixture
+def config(monkeypatch):
+    monkeypatch.setattr(settings, "LIMIT_ENABLED", False)
+    monkeypatch.setattr(settings, "HEDGE_ENABLED", False)
+    monkeypatch.setattr(batch, "cache", NullCache())
+
+
+def test_run_merged_answers_each_plan_on_its_own(config):
+    async def handler(body):
+        assert set(body["variables"]) == {
+            "s0_urn", "s1_urn", "s2_urn", "s3_input", "s4_urn", "s5_urn", "s6_urn"
+        }
+        return 200, {
+            "data": {
+                "s0_dataset": { "urn": "urn:li:dataset:a" },
+                "s1_tag": { "urn": "urn:li:tag:pii" },
+                "s2_dataPlatform": {
+                    "urn": "urn:li:dataPlatform:hive",
+                    "name": "hive",
+                    "properties": { "type": "RELATIONAL_DB", "name": "Hive" },
+                },
+                "s3_results": {
+                    "__typename": "SearchResults", "start": 0, "count": 1, "total": 1,
+                    "entities": [{ "entity": { "urn": "urn:li:dataset:b" } }],
+                },
+                "s4_dataset": None,
+                "s5_tag": None,
+                # Missing the fields the conversion needs
+                "s6_dataPlatform": { "urn": "urn:li:dataPlatform:broken" },
+            },
+            "errors": [{ "message": "tag resolver failed", "path": ["s5_tag"] }],
+        }
+
+    session = Session(handler)
+
+    async def main():
+        plans = [
+            await batch.dataset_by_id(request("fields=id"), "urn:li:dataset:a"),
+            await batch.tag_by_id(request("fields=id"), "urn:li:tag:pii"),
+            await batch.platform_by_id(request(), "urn:li:dataPlatform:hive"),
+            await batch.dataset_list(request("query=b&fields=id")),
+            await batch.dataset_by_id(request("fields=id"), "urn:li:dataset:missing"),
+            await batch.tag_by_id(request("fields=id"), "urn:li:tag:flaky"),
+            await batch.platform_by_id(request(), "urn:li:dataPlatform:broken"),
+        ]
+        return await batch.run_merged(session, plans)
+
+    outputs = asyncio.run(main())
+    assert len(session.bodies) == 1
+    assert [o["status"] for o in outputs] == [200, 200, 200, 200, 404, 502, 502]
+    assert outputs[0]["body"] == { "dataset": { "id": "urn:li:dataset:a" } }
+    assert outputs[1]["body"] == { "tag": { "id": "urn:li:tag:pii" } }
+    assert outputs[2]["body"]["platform"]["title"] == "Hive"
+    assert outputs[3]["body"]["data"] == [{ "dataset": { "id": "urn:li:dataset:b" } }]
+    assert outputs[5]["body"] == { "detail": ["tag resolver failed"] }
+
+
+def test_run_merged_upstream_failure_fails_every_plan(config):
+    async def handler(body):
+        return 503, "busy"
+
+    async def main():
+        plans = [
+            await batch.dataset_by_id(request("fields=id"), "urn:li:dataset:a"),
+            await batch.tag_by_id(request("fields=id"), "urn:li:tag:pii"),
+        ]
+        return await batch.run_merged(Session(handler), plans)
+
+    assert [o["status"] for o in asyncio.run(main())] == [503, 503]
+
+
+def test_not_found_is_not_cached(config, monkeypatch):
+    stored = []
+
+    class Recording(NullCache):
+        async def set(self, key, value, deps=()):
+            stored.append(key)
+
+    monkeypatch.setattr(batch, "cache", Recording())
+
+    async def handler(body):
+        return 200, { "data": {
+            "s0_tag": None,
+            "s1_dataPlatform": None,
+            "s2_tag": { "urn": "urn:li:tag:pii" },
+        }}
+
+    async def main():
+        plans = [
+            await batch.tag_by_id(request("fields=id"), "urn:li:tag:gone"),
+            await batch.platform_by_id(request(), "urn:li:dataPlatform:gone"),
+            await batch.tag_by_id(request("fields=id"), "urn:li:tag:pii"),
+        ]
+        return await batch.run_merged(Session(handler), plans)
+
+    assert [o["status"] for o in asyncio.run(main())] == [404, 404, 200]
+    assert stored == ["urn:li:tag:pii?id"]
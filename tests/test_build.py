@@ -0,0 +1,22 @@
+import pytest
+
+from pydantic import ValidationError
+
+from ..core import codec
+from ..core.config import settings
+from ..schemas.build import build
+from ..schemas.datasets import Field
+
+
+def test_fast_path_skips_validation(monkeypatch):
+    monkeypatch.setattr(settings, "FAST_PATH", True)
+    if codec.orjson is None:
+        pytest.skip("orjson is not installed")
+    assert build(Field, path="id").path == "id"
+
+
+def test_fast_path_needs_orjson(monkeypatch):
+    monkeypatch.setattr(settings, "FAST_PATH", True)
+    monkeypatch.setattr(codec, "orjson", None)
+    with pytest.raises(ValidationError):
+        build(Field, path="id")
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import pytest
+
+from typing import List, Mapping
+from fastapi import Request
+from pydantic import BaseModel
+
+from ..api.v1 import bulk
+from ..core.config import settings
+
+
+class Row(BaseModel):
+    name: str
+    count: int
+
+
+def upload(kind: str, *chunks: str) -> Request:
+    """
+    Request whose body arrives in the given chunks
+    """
+    body = [c.encode() for c in chunks]
+
+    async def receive():
+        data = body.pop(0) if body else b""
+        return { "type": "http.request", "body": data, "more_body": bool(body) }
+
+    return Request(
+        { "type": "http", "headers": [(b"content-type", kind.encode())] },
+        receive
+    )
+
+
+def run(req: Request, apply=None) -> List[Mapping]:
+    async def echo(chunk):
+        return [{ "item": i, "status": 200, "name": row.name } for i, row in chunk]
+
+    async def main():
+        return [
+            json.loads(line)
+            for part in [p async for p in bulk.run(req, Row, apply or echo)]
+            for line in part.decode().splitlines()
+        ]
+
+    return asyncio.run(main())
+
+
+@pytest.fixture(autouse=True)
+def config(monkeypatch):
+    monkeypatch.setattr(settings, "BULK_CHUNK_SIZE", 2)
+    monkeypatch.setattr(settings, "BULK_CONCURRENCY", 2)
+
+
+def by_item(outcomes):
+    return { o["item"]: o for o in outcomes }
+
+
+def test_json_array_split_across_chunks():
+    outcomes = run(upload(
+        "application/json",
+        '[{"name": "a", "co', 'unt": 1},\n {"name": "b", "count": 2}, {"name": "c", "count": 3}]'
+    ))
+    assert [(o["item"], o["name"]) for o in outcomes] == [(0, "a"), (1, "b"), (2, "c")]
+
+
+def test_ndjson_bad_line_gets_its_own_400():
+    outcomes = by_item(run(upload(
+        "application/x-ndjson",
+        '{"name": "a", "count": 1}\n{"name": "b", "cou',
+        'nt": 2}\n{not json\n\n{"name": "d"}\n{"name": "e", "count": 5}'
+    )))
+    assert sorted(outcomes) == [0, 1, 2, 3, 4]
+    assert [outcomes[i]["status"] for i in range(5)] == [200, 200, 400, 422, 200]
+    assert outcomes[4]["name"] == "e"
+
+
+def test_csv_quoted_fields_may_hold_newlines():
+    outcomes = run(upload(
+        "text/csv",
+        'name,count\r\n"multi\nline, quoted",1\r\n',
+        'plain,2\r\n\r\n"say ""hi',
+        '""\nthere",3\r\nbad,x\r\n'
+    ))
+    assert by_item(outcomes)[3]["status"] == 422
+    assert [(o["item"], o["name"]) for o in outcomes if o["status"] == 200] == [
+        (0, "multi\nline, quoted"), (1, "plain"), (2, 'say "hi"\nthere')
+    ]
+
+
+def test_unterminated_csv_quote_is_a_400():
+    outcomes = run(upload("text/csv", 'name,count\na,1\n"b,2\n'))
+    assert [(o["item"], o["status"]) for o in outcomes] == [(1, 400), (0, 200)]
+
+
+def test_not_an_array_is_a_400():
+    outcomes = run(upload("application/json", '{"name": "a"}'))
+    assert [(o["item"], o["status"]) for o in outcomes] == [(0, 400)]
+
+
+def test_chunks_finish_out_of_order_with_upload_numbering():
+    started = []
+
+    async def apply(chunk):
+        started.append([i for i, _ in chunk])
+        # The first chunk is the slowest
+        await asyncio.sleep(0.05 if chunk[0][0] == 0 else 0.0)
+        return [{ "item": i, "status": 200, "name": row.name } for i, row in chunk]
+
+    lines = "".join(f'{{"name": "n{i}", "count": {i}}}\n' for i in range(7))
+    outcomes = run(upload("application/x-ndjson", lines), apply)
+    assert started == [[0, 1], [2, 3], [4, 5], [6]]
+    assert sorted(o["item"] for o in outcomes) == list(range(7))
+    assert all(o["name"] == f"n{o['item']}" for o in outcomes)
+    # Chunks are written whole, as they finish
+    items = [o["item"] for o in outcomes]
+    assert items.index(0) > items.index(2)
+    assert all(items.index(i + 1) == items.index(i) + 1 for i in range(0, 6, 2))
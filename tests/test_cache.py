@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+from ..core.cache import DiskCache, MemoryCache, TieredCache
+
+
+def test_memory_cache_evicts_least_recently_used():
+    memory = MemoryCache(ttl=60, max_entries=2, max_bytes=1024)
+    memory.set("a", b"1")
+    memory.set("b", b"2")
+    memory.get("a")
+    memory.set("c", b"3")
+
+    assert memory.get("b") is None
+    assert memory.get("a")[0] == b"1"
+    assert memory.get("c")[0] == b"3"
+    assert memory.stats()["evictions"] == 1
+
+
+def test_memory_cache_bounds_size_and_expires():
+    memory = MemoryCache(ttl=60, max_entries=10, max_bytes=4)
+    memory.set("big", b"12345")
+    assert memory.get("big") is None
+
+    memory.set("short", b"1", ttl=0)
+    assert memory.get("short") is None
+    assert memory.stats()["expirations"] == 1
+
+
+def test_invalidate_drops_every_dependent_entry():
+    memory = MemoryCache(ttl=60, max_entries=10, max_bytes=1024)
+    memory.set("dataset", b"1", deps=["urn:dataset", "urn:tag"])
+    memory.set("tag", b"2", deps=["urn:tag"])
+    memory.set("other", b"3", deps=["urn:other"])
+
+    memory.invalidate("urn:tag")
+    assert memory.get("dataset") is None
+    assert memory.get("tag") is None
+    assert memory.get("other") is not None
+    assert "urn:tag" not in memory.deps
+
+
+def test_tiered_cache_promotes_from_lower_tiers(tmp_path):
+    async def main():
+        memory = MemoryCache(ttl=60, max_entries=10, max_bytes=1024)
+        disk = DiskCache(str(tmp_path / "cache.db"), ttl=60, max_bytes=1024)
+        cache = TieredCache(memory, disk)
+
+        disk.set("key", b'{"a":1}', ["urn"])
+        assert await cache.get("key") == { "a": 1 }
+        value, expires, deps = memory.get("key")
+        assert deps == ("urn",)
+        assert expires > time.monotonic()
+
+        await cache.invalidate("urn")
+        assert await cache.get("key") is None
+
+    asyncio.run(main())
+
+
+def test_tiered_cache_returns_copies():
+    async def main():
+        cache = TieredCache(MemoryCache(ttl=60, max_entries=10, max_bytes=1024))
+        value = { "tags": ["a"] }
+        await cache.set("key", value)
+        value["tags"].append("b")
+
+        cached = await cache.get("key")
+        assert cached == { "tags": ["a"] }
+        cached["tags"].append("c")
+        assert await cache.get("key") == { "tags": ["a"] }
+
+    asyncio.run(main())
+
+
+def test_disk_errors_are_misses_and_skipped_writes(tmp_path):
+    async def main():
+        memory = MemoryCache(ttl=60, max_entries=10, max_bytes=1024)
+        disk = DiskCache(str(tmp_path / "cache.db"), ttl=60, max_bytes=1024)
+        cache = TieredCache(memory, disk)
+        disk.db.close()
+
+        assert await cache.get("key") is None
+        await cache.set("key", { "a": 1 })
+        await cache.invalidate("urn")
+        assert await cache.get("key") == { "a": 1 }
+        assert cache.errors == 3
+
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+
+from ..core.coalesce import Superseded, TagWrites
+
+
+def writes(sent, window=0.0, max_size=100, fail=False):
+    async def send(tag, add, resources):
+        sent.append((tag, add, sorted(resources)))
+        await asyncio.sleep(0.01)
+        if fail:
+            raise ValueError("upstream")
+        return (tag, add)
+
+    return TagWrites(send, max_size, window)
+
+
+def test_writes_are_grouped_by_tag_and_direction():
+    async def main():
+        sent = []
+        w = writes(sent)
+        results = await asyncio.gather(
+            w.submit("d1", "t1", True),
+            w.submit("d2", "t1", True),
+            w.submit("d3", "t1", False),
+            w.submit("d1", "t2", True),
+        )
+
+        assert results == [("t1", True), ("t1", True), ("t1", False), ("t2", True)]
+        assert sorted(sent) == [
+            ("t1", False, ["d3"]), ("t1", True, ["d1", "d2"]), ("t2", True, ["d1"])
+        ]
+
+    asyncio.run(main())
+
+
+def test_repeated_write_is_sent_once():
+    async def main():
+        sent = []
+        w = writes(sent)
+        results = await asyncio.gather(w.submit("d1", "t1", True), w.submit("d1", "t1", True))
+
+        assert results == [("t1", True)] * 2
+        assert sent == [("t1", True, ["d1"])]
+        assert w.stats()["merged"] == 1
+
+    asyncio.run(main())
+
+
+def test_opposite_write_supersedes_the_pending_one():
+    async def main():
+        sent = []
+        w = writes(sent)
+        results = await asyncio.gather(
+            w.submit("d1", "t1", True),
+            w.submit("d1", "t1", True),
+            w.submit("d1", "t1", False),
+            return_exceptions=True
+        )
+
+        # Only the remove is sent, and only its caller gets its result
+        assert sent == [("t1", False, ["d1"])]
+        assert isinstance(results[0], Superseded)
+        assert isinstance(results[1], Superseded)
+        assert results[2] == ("t1", False)
+        assert w.stats()["superseded"] == 2
+
+    asyncio.run(main())
+
+
+def test_full_buffer_is_sent_at_once():
+    async def main():
+        sent = []
+        w = writes(sent, window=10, max_size=2)
+        await asyncio.wait_for(
+            asyncio.gather(*[w.submit(f"d{i}", "t1", True) for i in range(4)]), 1
+        )
+        assert sent == [("t1", True, ["d0", "d1"]), ("t1", True, ["d2", "d3"])]
+
+    asyncio.run(main())
+
+
+def test_failure_reaches_every_caller():
+    async def main():
+        w = writes([], fail=True)
+        with pytest.raises(ValueError):
+            await asyncio.gather(w.submit("d1", "t1", True), w.submit("d2", "t1", True))
+
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+import asyncio
+import copy
+import pytest
+
+from fastapi import HTTPException, Request
+
+from ..api.v1 import fanout
+from ..api.v1.params import QueryParams
+from ..core.config import settings
+from .upstream import Session, search
+
+
+@pytest.fixture(autouse=True)
+def config(monkeypatch):
+    monkeypatch.setattr(settings, "LIMIT_ENABLED", False)
+    monkeypatch.setattr(settings, "HEDGE_ENABLED", False)
+    monkeypatch.setattr(settings, "FANOUT_ENABLED", True)
+    monkeypatch.setattr(settings, "FANOUT_PAGE_SIZE", 50)
+    monkeypatch.setattr(settings, "FANOUT_CONCURRENCY", 2)
+
+
+def params(start: int, limit: int) -> QueryParams:
+    query = f"offset={start}&limit={limit}".encode()
+    return QueryParams(Request({ "type": "http", "query_string": query }))
+
+
+def body(p: QueryParams):
+    return { "operation": "search", "variables": { "start": p.start, "count": p.limit } }
+
+
+def test_slices_cover_the_page():
+    pages = fanout.slices(params(10, 120), 50)
+    assert [(p.start, p.limit) for p in pages] == [(10, 50), (60, 50), (110, 20)]
+
+
+def test_small_page_is_one_search():
+    async def main():
+        session = Session(search(1000))
+        results = await fanout.search(session, params(0, 50), body)
+        assert results["count"] == 50
+        assert len(session.bodies) == 1
+
+    asyncio.run(main())
+
+
+def test_large_page_is_merged_in_order():
+    async def main():
+        session = Session(search(1000))
+        results = await fanout.search(session, params(10, 120), body)
+
+        assert [b["variables"]["start"] for b in session.bodies] == [10, 60, 110]
+        assert [e["entity"]["urn"] for e in results["entities"]] == [
+            f"urn:li:dataset:{i}" for i in range(10, 130)
+        ]
+        assert (results["start"], results["count"], results["total"]) == (10, 120, 1000)
+        assert session.peak == 2
+
+    asyncio.run(main())
+
+
+def test_short_last_slice_and_duplicates():
+    async def main():
+        handler = search(70)
+
+        async def shifted(body):
+            # A dataset ingested between slices shifts the later ones back
+            if body["variables"]["start"] == 50:
+                body = copy.deepcopy(body)
+                body["variables"]["start"] = 49
+            return await handler(body)
+
+        results = await fanout.search(Session(shifted), params(0, 120), body)
+        urns = [e["entity"]["urn"] for e in results["entities"]]
+        assert urns == [f"urn:li:dataset:{i}" for i in range(70)]
+
+    asyncio.run(main())
+
+
+def test_failed_slice_fails_the_page():
+    async def main():
+        session = Session(search(1000, fail_at=60))
+        with pytest.raises(HTTPException) as e:
+            await fanout.search(session, params(10, 120), body)
+        assert e.value.status_code == 503
+
+    asyncio.run(main())
@@ -0,0 +1,160 @@
+import asyncio
+import pytest
+
+from array import array
+
+from ..api.v1 import fields
+from ..core.config import settings
+from ..core.fields import FieldIndex
+from .upstream import Session
+
+
+def column(path, type="STRING", native="varchar"):
+    return { "path": path, "type": type, "native": native }
+
+
+def index() -> FieldIndex:
+    i = FieldIndex()
+    i.add("urn:li:dataset:orders", "hive", [
+        column("customer_id", "NUMBER", "bigint"),
+        column("[version=2.0].[type=struct].address.city"),
+        column("id", "NUMBER", "bigint"),
+    ])
+    i.add("urn:li:dataset:events", "kafka", [
+        column("Customer_ID"),
+        column("payload"),
+    ])
+    return i
+
+
+def paths(result):
+    total, entries = result
+    return total, [(e["dataset"].rsplit(":", 1)[-1], e["path"]) for e in entries]
+
+
+def test_name_matches_inside_normalized_paths():
+    i = index()
+    assert paths(i.search("customer_id", None, None, 0, 10)) == (
+        2, [("orders", "customer_id"), ("events", "Customer_ID")]
+    )
+    # Annotations of version 2 paths are not matched
+    assert paths(i.search("address.city", None, None, 0, 10)) == (
+        1, [("orders", "[version=2.0].[type=struct].address.city")]
+    )
+    assert i.search("struct", None, None, 0, 10) == (0, [])
+
+
+def test_short_names_match_whole_words():
+    i = index()
+    assert paths(i.search("id", None, None, 0, 10)) == (
+        3, [("orders", "customer_id"), ("orders", "id"), ("events", "Customer_ID")]
+    )
+
+
+def test_type_and_platform_filter_case_insensitively():
+    i = index()
+    assert paths(i.search("id", "number", None, 0, 10))[0] == 2
+    assert paths(i.search(None, None, "KAFKA", 0, 10)) == (
+        2, [("events", "Customer_ID"), ("events", "payload")]
+    )
+    assert paths(i.search("customer", "string", "kafka", 0, 10)) == (
+        1, [("events", "Customer_ID")]
+    )
+    assert i.search("customer", None, "mysql", 0, 10) == (0, [])
+
+
+def test_pages_count_every_match():
+    i = index()
+    assert paths(i.search(None, None, None, 1, 2)) == (
+        5, [("orders", "[version=2.0].[type=struct].address.city"), ("orders", "id")]
+    )
+
+
+def test_entries_carry_dataset_platform_and_types():
+    entry = index().search("payload", None, None, 0, 1)[1][0]
+    assert entry == {
+        "dataset": "urn:li:dataset:events",
+        "platform": "kafka",
+        "path": "payload",
+        "type": "STRING",
+        "native": "varchar",
+    }
+
+
+def test_postings_are_sorted_arrays_of_field_numbers():
+    i = index()
+    assert all(isinstance(p, array) and list(p) == sorted(p) for p in i.postings.values())
+    assert list(i.postings["word:id"]) == [0, 2, 3]
+    assert list(i.postings["type:number"]) == [0, 2]
+    assert list(i.postings["platform:kafka"]) == [3, 4]
+    # Repeated strings are stored once
+    assert i.types[0] == i.types[2] and i.natives[0] == i.natives[2]
+    assert len(i.symbols.values) == 6
+
+
+def catalog(*versions):
+    """
+    Handler scrolling, per build, the next version of the catalog, one
+    dataset per page
+    """
+    builds = iter(versions)
+    pages = []
+
+    async def handler(body):
+        nonlocal pages
+        if body["variables"]["input"]["scrollId"] is None:
+            pages = list(next(builds))
+        page = pages.pop(0)
+        return 200, { "data": { "results": {
+            "nextScrollId": "more" if pages else None,
+            "entities": [{ "entity": page }],
+        }}}
+
+    return handler
+
+
+def dataset(name, platform, *columns):
+    return {
+        "urn": f"urn:li:dataset:{name}",
+        "platform": { "name": platform },
+        "schema": { "fields": list(columns) } if columns else None,
+    }
+
+
+@pytest.fixture
+def config(monkeypatch):
+    monkeypatch.setattr(settings, "LIMIT_ENABLED", False)
+    monkeypatch.setattr(settings, "HEDGE_ENABLED", False)
+    monkeypatch.setattr(fields, "INDEX", FieldIndex())
+
+
+def test_rebuild_swaps_in_updates_and_removals(config):
+    session = Session(catalog(
+        [
+            dataset("orders", "hive", column("customer_id"), column("total", "NUMBER")),
+            dataset("users", "hive", column("customer_id")),
+            dataset("empty", "hive"),
+        ],
+        [
+            dataset("orders", "hive", column("customer_id", "NUMBER"), column("total", "NUMBER")),
+        ],
+    ))
+
+    async def main():
+        stats = await fields.build(session)
+        assert (stats["datasets"], stats["fields"]) == (3, 3)
+        first = fields.INDEX
+        assert paths(first.search("customer", "string", None, 0, 10))[0] == 2
+
+        # Users is dropped and orders.customer_id changes type
+        stats = await fields.build(session)
+        assert (stats["datasets"], stats["fields"]) == (1, 2)
+        assert fields.INDEX is not first
+        # Lookup counts carry over to the new index
+        assert fields.INDEX.lookups == first.lookups == 1
+        assert fields.INDEX.search("customer", "string", None, 0, 10) == (0, [])
+        assert paths(fields.INDEX.search("customer", "number", None, 0, 10)) == (
+            1, [("orders", "customer_id")]
+        )
+
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+import asyncio
+
+from ..core.flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def main():
+        flights = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        results = await asyncio.gather(*[flights.do("key", fetch) for _ in range(5)])
+        assert results == [1] * 5
+        assert calls == 1
+        assert flights.stats()["shared"] == 4
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_failure_reaches_every_caller():
+    async def main():
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream")
+
+        results = await asyncio.gather(
+            flights.do("key", fail), flights.do("key", fail), return_exceptions=True
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+
+    asyncio.run(main())
+
+
+def test_one_caller_leaving_does_not_cancel_the_others():
+    async def main():
+        flights = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return "value"
+
+        leaving = asyncio.ensure_future(flights.do("key", fetch))
+        staying = asyncio.ensure_future(flights.do("key", fetch))
+        await asyncio.sleep(0)
+        leaving.cancel()
+
+        assert await staying == "value"
+        assert leaving.cancelled()
+        assert flights.stats()["abandoned"] == 0
+
+    asyncio.run(main())
+
+
+def test_caller_after_last_waiter_cancelled_starts_afresh():
+    async def main():
+        flights = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        abandoned = asyncio.ensure_future(flights.do("key", fetch))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        # Let the cancellation reach the waiter but not the dying task's
+        # done callback
+        await asyncio.sleep(0)
+
+        assert await flights.do("key", fetch) == 2
+        assert abandoned.cancelled()
+        assert flights.stats()["abandoned"] == 1
+
+    asyncio.run(main())
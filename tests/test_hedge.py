@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+
+from ..core.hedge import Budget, Hedger
+
+
+class Failed(Exception):
+    pass
+
+
+def hedger(samples=(0.01,)) -> Hedger:
+    h = Hedger(0.5, window=10, min_samples=1, min_delay=0.01, ratio=0.5, maximum=2)
+    for latency in samples:
+        h.latency("lookup").add(latency)
+    return h
+
+
+def attempts(*steps):
+    """
+    Call function whose nth call sleeps then returns or raises steps[n]
+    """
+    calls = []
+
+    async def fn():
+        delay, outcome = steps[len(calls)]
+        calls.append(delay)
+        await asyncio.sleep(delay)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    return fn, calls
+
+
+def test_slow_first_attempt_is_hedged():
+    async def main():
+        h = hedger()
+        fn, calls = attempts((1.0, "slow"), (0.0, "fast"))
+        assert await asyncio.wait_for(h.run("lookup", fn), 0.5) == "fast"
+        assert len(calls) == 2
+        assert h.stats()["hedge_wins"] == 1
+
+    asyncio.run(main())
+
+
+def test_no_hedge_without_latency_samples():
+    async def main():
+        h = hedger(samples=())
+        fn, calls = attempts((0.05, "only"))
+        assert await h.run("lookup", fn) == "only"
+        assert len(calls) == 1
+
+    asyncio.run(main())
+
+
+def test_hedge_denied_when_not_allowed():
+    async def main():
+        h = hedger()
+        fn, calls = attempts((0.05, "first"))
+        assert await h.run("lookup", fn, allow=lambda: False) == "first"
+        assert len(calls) == 1
+        assert h.stats()["denied"] == 1
+
+    asyncio.run(main())
+
+
+def test_retryable_failure_is_tried_again():
+    async def main():
+        h = hedger(samples=())
+        fn, calls = attempts((0.0, Failed()), (0.0, "second"))
+        assert await h.run("lookup", fn, retryable=lambda e: isinstance(e, Failed)) == "second"
+        assert h.stats()["retried"] == 1
+
+    asyncio.run(main())
+
+
+def test_other_failure_is_raised():
+    async def main():
+        h = hedger(samples=())
+        fn, calls = attempts((0.0, ValueError("bad")))
+        with pytest.raises(ValueError):
+            await h.run("lookup", fn, retryable=lambda e: isinstance(e, Failed))
+        assert len(calls) == 1
+
+    asyncio.run(main())
+
+
+def test_cancelled_first_attempt_raises_the_hedge_failure():
+    async def main():
+        h = hedger()
+        fn, calls = attempts((0.05, asyncio.CancelledError()), (0.1, Failed()))
+        with pytest.raises(Failed):
+            await h.run("lookup", fn)
+        assert len(calls) == 2
+
+    asyncio.run(main())
+
+
+def test_budget_limits_extra_attempts():
+    budget = Budget(ratio=0.5, maximum=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
@@ -0,0 +1,58 @@
+from fastapi import Request
+
+from ..api.v1 import tags
+from ..api.v1.params import QueryParams
+from ..core.index import TextIndex
+
+
+def index() -> TextIndex:
+    i = TextIndex()
+    i.sync([
+        ("urn:li:tag:pii", "PII", "personal data", "pii"),
+        ("urn:li:tag:pipeline", "pipeline", "", "pipeline"),
+        ("urn:li:tag:gold", "Gold", "curated tier", "gold"),
+        ("urn:li:tag:api", "api", "public pii export", "api"),
+    ])
+    return i
+
+
+def test_prefix_orders_names_then_other_matches():
+    i = index()
+    assert i.prefix("pi", 10) == ["pii", "pipeline", "api"]
+    assert i.prefix("p", 1) == ["pii"]
+    assert i.prefix("old", 10) == ["gold"]
+
+
+def test_search_matches_text_case_insensitively():
+    i = index()
+    assert i.search("PII", 0, 10) == (2, ["api", "pii"])
+    assert i.search("cur", 0, 10) == (1, ["gold"])
+    assert i.search("i", 1, 2) == (4, ["gold", "pii"])
+
+
+def test_sync_only_touches_changes():
+    i = index()
+    counts = i.sync([
+        ("urn:li:tag:pii", "PII", "personal data", "pii"),
+        ("urn:li:tag:gold", "Gold", "certified tier", "gold v2"),
+        ("urn:li:tag:new", "new", "", "new"),
+    ])
+    assert counts == { "added": 1, "updated": 1, "removed": 2 }
+    assert i.search("curated", 0, 10) == (0, [])
+    assert i.search("certified", 0, 10) == (1, ["gold v2"])
+    assert i.prefix("pip", 10) == []
+
+
+def test_remove_prunes_the_trie_and_postings():
+    i = TextIndex()
+    i.put("a", "abc", "", "a")
+    i.remove("a")
+    assert i.root.children == {}
+    assert i.grams == {}
+
+
+def test_local_tag_page_counts_matches_returned(monkeypatch):
+    monkeypatch.setattr(tags, "INDEX", index())
+    query = "query=pii&limit=10"
+    page = tags.local(QueryParams(Request({ "type": "http", "query_string": query.encode() })))
+    assert (page["count"], page["total"]) == (2, 2)
@@ -0,0 +1,136 @@
+import asyncio
+import pytest
+
+from fastapi import HTTPException
+
+from ..api.v1 import upstream
+from ..core.config import settings
+from ..core.limiter import AdaptiveLimiter, Overloaded
+
+
+def limiter(initial=4, bulk_queue=0, bulk_wait=1.0) -> AdaptiveLimiter:
+    return AdaptiveLimiter(
+        {
+            "lookup": { "queue": 10, "wait": 1.0, "share": 1.0 },
+            "bulk": { "queue": bulk_queue, "wait": bulk_wait, "share": 0.5 },
+        },
+        initial=initial, minimum=1, maximum=10, backoff=0.5, tolerance=2
+    )
+
+
+def test_limit_grows_by_one_per_window_of_fast_calls():
+    async def main():
+        l = limiter()
+        # In use: half the limit stays in flight throughout
+        await l.acquire("lookup")
+        await l.acquire("lookup")
+        # Each fast call adds 1/limit, so five take a limit of four to five
+        for _ in range(5):
+            l.release("lookup", await l.acquire("lookup"), True)
+        assert (int(l.limit), l.increases, l.decreases) == (5, 1, 0)
+
+    asyncio.run(main())
+
+
+def test_idle_limit_does_not_grow():
+    async def main():
+        l = limiter()
+        for _ in range(10):
+            l.release("lookup", await l.acquire("lookup"), True)
+        assert l.limit == 4
+
+    asyncio.run(main())
+
+
+def test_failure_halves_the_limit_once_per_window():
+    l = limiter(initial=8)
+    lane = l.lanes["lookup"]
+    l.sample(lane, 1.0, False)
+    assert (l.limit, l.decreases) == (4, 1)
+    # Within a second of the cut, a one second call cannot have seen it
+    l.sample(lane, 1.0, False)
+    assert (l.limit, l.decreases) == (4, 1)
+
+
+def test_slow_calls_halve_the_limit():
+    l = limiter(initial=8)
+    lane = l.lanes["lookup"]
+    for _ in range(5):
+        l.sample(lane, 0.01, True)
+    assert l.limit == 8
+    l.sample(lane, 1.0, True)
+    assert (l.limit, l.decreases) == (4, 1)
+
+
+def test_limit_is_not_cut_below_the_minimum():
+    l = limiter(initial=1)
+    l.sample(l.lanes["lookup"], 1.0, False)
+    assert l.limit == 1
+
+
+def test_lane_is_capped_at_its_share():
+    async def main():
+        l = limiter()
+        await l.acquire("bulk")
+        await l.acquire("bulk")
+        assert not l.idle("bulk")
+        with pytest.raises(Overloaded):
+            await l.acquire("bulk")
+        # The interactive lane still has the rest of the limit
+        assert l.idle("lookup")
+        await l.acquire("lookup")
+        assert (l.lanes["bulk"].shed, l.lanes["lookup"].shed) == (1, 0)
+        assert (l.lanes["bulk"].in_flight, l.lanes["lookup"].in_flight) == (2, 1)
+
+    asyncio.run(main())
+
+
+def test_queued_caller_runs_when_a_slot_is_released():
+    async def main():
+        l = limiter(bulk_queue=1)
+        first = await l.acquire("bulk")
+        await l.acquire("bulk")
+        queued = asyncio.ensure_future(l.acquire("bulk"))
+        await asyncio.sleep(0)
+        assert not queued.done()
+        l.release("bulk", first, True)
+        await asyncio.wait_for(queued, 0.5)
+        assert l.lanes["bulk"].in_flight == 2
+
+    asyncio.run(main())
+
+
+def test_shed_call_is_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(settings, "LIMIT_ENABLED", True)
+
+    async def main():
+        monkeypatch.setattr(upstream, "limiter", limiter(initial=2, bulk_queue=1, bulk_wait=0.05))
+        async with upstream.slot(upstream.BULK):
+            # Queued past the lane's wait
+            with pytest.raises(HTTPException) as e:
+                async with upstream.slot(upstream.BULK):
+                    pass
+            assert e.value.status_code == 429
+            assert int(e.value.headers["Retry-After"]) >= 1
+
+        assert upstream.limiter.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_upstream_errors_count_against_health(monkeypatch):
+    monkeypatch.setattr(settings, "LIMIT_ENABLED", True)
+
+    async def main():
+        monkeypatch.setattr(upstream, "limiter", limiter(initial=8))
+        with pytest.raises(HTTPException):
+            async with upstream.slot(upstream.LOOKUP):
+                raise HTTPException(502)
+        assert upstream.limiter.limit == 4
+        # A client error says nothing bad about upstream
+        with pytest.raises(HTTPException):
+            async with upstream.slot(upstream.LOOKUP):
+                raise HTTPException(404)
+        assert upstream.limiter.decreases == 1
+
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+import asyncio
+
+from ..core.loader import BatchLoader
+
+
+def loader(batches, window=0.0, max_size=100, fail=False):
+    async def fetch(keys):
+        batches.append(keys)
+        await asyncio.sleep(0.01)
+        if fail:
+            raise ValueError("upstream")
+        return [key.upper() for key in keys]
+
+    return BatchLoader(fetch, max_size, window)
+
+
+def test_keys_in_one_tick_share_a_batch():
+    async def main():
+        batches = []
+        load = loader(batches)
+        results = await asyncio.gather(*[load.load(k) for k in ["a", "b", "a", "c"]])
+
+        assert results == ["A", "B", "A", "C"]
+        assert batches == [["a", "b", "c"]]
+
+    asyncio.run(main())
+
+
+def test_window_collects_later_keys():
+    async def main():
+        batches = []
+        load = loader(batches, window=0.02)
+
+        async def later(key):
+            await asyncio.sleep(0.005)
+            return await load.load(key)
+
+        assert await asyncio.gather(load.load("a"), later("b")) == ["A", "B"]
+        assert batches == [["a", "b"]]
+
+    asyncio.run(main())
+
+
+def test_full_batch_dispatches_at_once():
+    async def main():
+        batches = []
+        load = loader(batches, window=10, max_size=2)
+        results = await asyncio.wait_for(
+            asyncio.gather(*[load.load(k) for k in ["a", "b", "c", "d"]]), 1
+        )
+
+        assert results == ["A", "B", "C", "D"]
+        assert batches == [["a", "b"], ["c", "d"]]
+
+    asyncio.run(main())
+
+
+def test_failure_reaches_every_key():
+    async def main():
+        load = loader([], fail=True)
+        results = await asyncio.gather(load.load("a"), load.load("b"), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+
+    asyncio.run(main())
+
+
+def test_caller_leaving_does_not_fail_the_batch():
+    async def main():
+        batches = []
+        load = loader(batches)
+        leaving = asyncio.ensure_future(load.load("a"))
+        staying = asyncio.ensure_future(load.load("b"))
+        await asyncio.sleep(0)
+        leaving.cancel()
+
+        assert await staying == "B"
+        assert batches == [["a", "b"]]
+
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+import time
+
+from fastapi import Request
+
+from ..api.v1.mirror import Mirror
+from ..api.v1.params import QueryParams
+from ..core.mirror import Catalog
+
+
+def dataset(name, platform="hive", tags=(), modified=1):
+    return {
+        "urn": f"urn:li:dataset:({platform},{name},PROD)",
+        "name": name,
+        "platform": { "name": platform },
+        "properties": { "name": name },
+        "schema": { "fields": [{ "path": "id" }, { "path": f"{name}_value" }] },
+        "tags": { "tags": [{ "tag": { "urn": t } } for t in tags] },
+        "lastIngested": modified,
+    }
+
+
+def params(query):
+    return QueryParams(Request({ "type": "http", "query_string": query.encode() }))
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    c = Catalog(str(tmp_path / "mirror.db"), "lastIngested")
+    c.put_datasets([
+        dataset("orders", tags=["urn:li:tag:pii"]),
+        dataset("order_items", tags=["urn:li:tag:pii", "urn:li:tag:gold"]),
+        dataset("users", platform="kafka"),
+    ], synced=1)
+    c.put_tags([{ "urn": "urn:li:tag:gold", "properties": { "name": "gold" } }], synced=1)
+    return c
+
+
+def test_counts_follow_writes(catalog):
+    assert catalog.counts == { "datasets": 3, "fields": 6, "tags": 1, "platforms": 0 }
+
+    catalog.put_datasets([dataset("orders")], synced=2)
+    assert catalog.counts["datasets"] == 3
+    catalog.prune("datasets", before=2)
+    assert catalog.counts == { "datasets": 1, "fields": 2, "tags": 1, "platforms": 0 }
+    catalog.remove_tag("urn:li:tag:gold")
+    assert catalog.counts["tags"] == 0
+
+
+def test_counts_survive_a_failed_write(catalog):
+    with pytest.raises(KeyError):
+        catalog.put_datasets([dataset("more"), { "name": "no urn" }], synced=2)
+    assert catalog.counts["datasets"] == 3
+    assert catalog.datasets(0, 10)[0] == 3
+
+
+def test_counts_are_read_back_on_open(catalog, tmp_path):
+    reopened = Catalog(str(tmp_path / "mirror.db"), "lastIngested")
+    assert reopened.counts == catalog.counts
+
+
+def test_filtered_totals(catalog):
+    total, entities = catalog.datasets_by_tags(["urn:li:tag:pii", "urn:li:tag:gold"], 0, 1)
+    assert total == 2
+    assert [e["name"] for e in entities] == ["order_items"]
+    assert catalog.datasets_by_platform("kafka", 0, 10)[0] == 1
+    total, entities = catalog.search_datasets("ord", 1, 10)
+    assert total == 2
+    assert len(entities) == 1
+
+
+def test_tag_datasets(catalog):
+    urns = [dataset("users", platform="kafka")["urn"], "urn:li:dataset:(hive,missing,PROD)"]
+    catalog.tag_datasets(urns, "urn:li:tag:gold", add=True)
+    total, entities = catalog.datasets_by_tags(["urn:li:tag:gold"], 0, 10)
+    assert total == 2
+    assert { "urn": "urn:li:tag:gold", "properties": { "name": "gold" } } in [
+        t["tag"] for e in entities for t in e["tags"]["tags"]
+    ]
+
+    catalog.tag_datasets(urns, "urn:li:tag:gold", add=False)
+    assert catalog.datasets_by_tags(["urn:li:tag:gold"], 0, 10)[0] == 1
+
+
+def test_mirror_page_counts_rows_returned(catalog):
+    mirror = Mirror(catalog)
+    mirror.synced = time.time()
+    page = asyncio.run(mirror.datasets(params("limit=10&offset=2")))
+    assert (page["start"], page["count"], page["total"]) == (2, 1, 3)
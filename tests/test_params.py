@@ -0,0 +1,44 @@
+import pytest
+
+from fastapi import HTTPException, Request
+
+from ..api.v1 import cursor, datasets
+from ..api.v1.params import QueryParams
+
+
+def params(query: str) -> QueryParams:
+    return QueryParams(Request({ "type": "http", "query_string": query.encode() }))
+
+
+def test_limit_and_offset():
+    p = params("limit=25&offset=50")
+    assert (p.limit, p.start) == (25, 50)
+    p = params("")
+    assert (p.limit, p.start) == (10, 0)
+
+
+@pytest.mark.parametrize("query", ["limit=abc", "offset=1.5", "limit=-1", "offset=-10"])
+def test_bad_limit_or_offset_is_rejected(query):
+    with pytest.raises(HTTPException) as e:
+        params(query)
+    assert e.value.status_code == 400
+
+
+def test_cursor_round_trip():
+    p = params(f"cursor={cursor.encode('scroll', 30)}")
+    assert (p.scroll_id, p.start) == ("scroll", 30)
+
+
+@pytest.mark.parametrize("value", ["garbage", cursor.encode("scroll", -5)])
+def test_bad_cursor_is_rejected(value):
+    with pytest.raises(HTTPException) as e:
+        params(f"cursor={value}")
+    assert e.value.status_code == 400
+
+
+def test_default_projection_counts_schema_fields():
+    fields = datasets.SELECTION.resolve(params("").fields)
+    assert "fieldCount" in fields and "fields" not in fields
+    fields = datasets.SELECTION.resolve(params("include=schema").fields)
+    assert {"fieldCount", "fields"} <= fields
+    assert datasets.SELECTION.resolve(params("fields=id,name").fields) == {"id", "name"}
@@ -0,0 +1,94 @@
+import asyncio
+
+from ..core.prefetch import Prefetcher
+
+
+def fetcher(calls, value="page", delay=0.01, fail=False):
+    async def fetch():
+        calls.append(value)
+        await asyncio.sleep(delay)
+        if fail:
+            raise ValueError("upstream")
+        return value
+
+    return fetch
+
+
+def test_prefetched_page_is_taken_once():
+    async def main():
+        p = Prefetcher(ttl=10, max_entries=10, concurrency=2)
+        calls = []
+        p.ahead("page 2", fetcher(calls), allow=True)
+
+        assert await p.get("page 2") == "page"
+        assert await p.get("page 2") is None
+        assert calls == ["page"]
+        assert (p.stats()["hits"], p.stats()["misses"]) == (1, 1)
+
+    asyncio.run(main())
+
+
+def test_concurrency_is_reserved_before_the_fetch_runs():
+    async def main():
+        p = Prefetcher(ttl=10, max_entries=10, concurrency=2)
+        calls = []
+        for i in range(5):
+            p.ahead(f"page {i}", fetcher(calls, i), allow=True)
+
+        assert p.stats()["running"] == 2
+        assert p.stats()["skipped"] == 3
+        await asyncio.sleep(0.05)
+        assert calls == [0, 1]
+        assert p.stats()["running"] == 0
+
+    asyncio.run(main())
+
+
+def test_skipped_under_upstream_pressure():
+    async def main():
+        p = Prefetcher(ttl=10, max_entries=10, concurrency=2)
+        calls = []
+        p.ahead("page 2", fetcher(calls), allow=False)
+        assert await p.get("page 2") is None
+        assert calls == []
+
+    asyncio.run(main())
+
+
+def test_pending_prefetch_is_not_started_twice():
+    async def main():
+        p = Prefetcher(ttl=10, max_entries=10, concurrency=2)
+        calls = []
+        p.ahead("page 2", fetcher(calls), allow=True)
+        p.ahead("page 2", fetcher(calls), allow=True)
+        assert await p.get("page 2") == "page"
+        assert calls == ["page"]
+
+    asyncio.run(main())
+
+
+def test_failed_or_expired_prefetch_is_a_miss():
+    async def main():
+        p = Prefetcher(ttl=10, max_entries=10, concurrency=2)
+        p.ahead("failed", fetcher([], fail=True), allow=True)
+        assert await p.get("failed") is None
+        assert p.stats()["failures"] == 1
+        assert p.stats()["running"] == 0
+
+        expired = Prefetcher(ttl=0, max_entries=10, concurrency=2)
+        expired.ahead("page 2", fetcher([]), allow=True)
+        assert await expired.get("page 2") is None
+        await asyncio.sleep(0.02)
+
+    asyncio.run(main())
+
+
+def test_oldest_entries_are_dropped():
+    async def main():
+        p = Prefetcher(ttl=10, max_entries=1, concurrency=2)
+        p.ahead("page 2", fetcher([], "two", delay=0), allow=True)
+        p.ahead("page 3", fetcher([], "three", delay=0), allow=True)
+        assert await p.get("page 2") is None
+        assert await p.get("page 3") == "three"
+
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+import asyncio
+import pytest
+
+from ..core.config import settings
+from ..core.stale import StaleCache
+
+
+@pytest.fixture(autouse=True)
+def ttls(monkeypatch):
+    monkeypatch.setattr(settings, "STALE_TTLS", {
+        "short": { "soft": 0.05, "hard": 10 },
+        "gone": { "soft": 0.02, "hard": 0.05 },
+    })
+
+
+def fetcher(*values, delay=0.0):
+    """
+    Fetch function returning values in turn, raising those that are errors
+    """
+    calls = []
+
+    async def fetch():
+        value = values[len(calls)]
+        calls.append(value)
+        await asyncio.sleep(delay)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    return fetch, calls
+
+
+def test_fresh_value_is_served_without_fetching():
+    async def main():
+        cache = StaleCache(10)
+        fetch, calls = fetcher("a", "b")
+        assert await cache.get("short", "k", fetch) == "a"
+        assert await cache.get("short", "k", fetch) == "a"
+        assert len(calls) == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    asyncio.run(main())
+
+
+def test_stale_value_is_served_while_one_refresh_runs():
+    async def main():
+        cache = StaleCache(10)
+        fetch, calls = fetcher("a", "b", delay=0.05)
+        assert await cache.get("short", "k", fetch) == "a"
+        await asyncio.sleep(0.06)
+
+        # Past the soft TTL: every caller gets the old value at once and
+        # only one refresh goes out
+        served = await asyncio.wait_for(
+            asyncio.gather(*[cache.get("short", "k", fetch) for _ in range(5)]), 0.04
+        )
+        assert served == ["a"] * 5
+        assert (cache.stale_hits, cache.refreshes) == (5, 1)
+
+        await asyncio.sleep(0.1)
+        assert await cache.get("short", "k", fetch) == "b"
+        assert calls == ["a", "b"]
+
+    asyncio.run(main())
+
+
+def test_failed_refresh_keeps_serving_stale():
+    async def main():
+        cache = StaleCache(10)
+        fetch, calls = fetcher("a", RuntimeError("down"), "c")
+        await cache.get("short", "k", fetch)
+        await asyncio.sleep(0.06)
+        assert await cache.get("short", "k", fetch) == "a"
+        await asyncio.sleep(0.01)
+        assert cache.failures == 1
+        # The next stale read tries again
+        assert await cache.get("short", "k", fetch) == "a"
+        await asyncio.sleep(0.01)
+        assert await cache.get("short", "k", fetch) == "c"
+
+    asyncio.run(main())
+
+
+def test_callers_wait_past_the_hard_ttl():
+    async def main():
+        cache = StaleCache(10)
+        fetch, calls = fetcher("a", "b")
+        await cache.get("gone", "k", fetch)
+        await asyncio.sleep(0.06)
+        assert await cache.get("gone", "k", fetch) == "b"
+        assert (cache.misses, cache.stale_hits) == (2, 0)
+
+    asyncio.run(main())
+
+
+def test_invalidate_drops_entries_by_dependency():
+    async def main():
+        cache = StaleCache(10)
+        await cache.get("short", "tags", fetcher("t1", "t2")[0], deps=["tags"])
+        await cache.get("short", "pii", fetcher("p1")[0], deps=["tags", "urn:li:tag:pii"])
+        await cache.get("short", "platforms", fetcher("h1")[0], deps=["platforms"])
+
+        cache.invalidate("urn:li:tag:pii")
+        assert set(cache.entries) == { "tags", "platforms" }
+        cache.invalidate("tags")
+        assert set(cache.entries) == { "platforms" }
+        assert set(cache.deps) == { "platforms" }
+
+        fetch, calls = fetcher("t2")
+        assert await cache.get("short", "tags", fetch) == "t2"
+
+    asyncio.run(main())
+
+
+def test_refresh_of_an_invalidated_entry_is_dropped():
+    async def main():
+        cache = StaleCache(10)
+        fetch, calls = fetcher("a", "b", delay=0.02)
+        await cache.get("short", "k", fetch, deps=["d"])
+        await asyncio.sleep(0.06)
+        await cache.get("short", "k", fetch, deps=["d"])
+        cache.invalidate("d")
+        await asyncio.sleep(0.05)
+        assert "k" not in cache.entries
+
+    asyncio.run(main())
+
+
+def test_oldest_entries_are_evicted():
+    async def main():
+        cache = StaleCache(2)
+        for key in ["a", "b", "c"]:
+            await cache.get("short", key, fetcher(key)[0], deps=[key])
+        assert list(cache.entries) == ["b", "c"]
+        assert "a" not in cache.deps
+
+    asyncio.run(main())
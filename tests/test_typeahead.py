@@ -0,0 +1,70 @@
+import time
+
+from ..core.typeahead import PrefixCache
+
+
+def cache(ttl=60.0, max_entries=10) -> PrefixCache:
+    return PrefixCache(lambda value: [value.get("name")], ttl, max_entries)
+
+
+def named(*names):
+    return [{ "name": n } for n in names]
+
+
+def test_cached_prefix_is_hit():
+    c = cache()
+    c.put("scope", "Ord", 10, named("orders", "order_items"))
+    assert c.get("scope", "ord", 10) == named("orders", "order_items")
+    assert c.get("scope", "ord", 1) == named("orders")
+    assert c.get("other", "ord", 10) is None
+    assert (c.hits, c.misses) == (2, 1)
+
+
+def test_full_result_only_answers_smaller_limits():
+    c = cache()
+    c.put("scope", "ord", 2, named("orders", "order_items"))
+    assert c.get("scope", "ord", 2) is not None
+    assert c.get("scope", "ord", 5) is None
+    # Nor can a longer prefix be narrowed from it
+    assert c.get("scope", "orde", 2) is None
+
+
+def test_longer_prefix_narrows_a_complete_shorter_one():
+    c = cache()
+    c.put("scope", "o", 10, named("orders", "order_items", "daily_orders", "owners"))
+    assert c.get("scope", "ord", 10) == named("orders", "order_items", "daily_orders")
+    assert c.derived == 1
+    # The narrowed result is cached as its own complete entry
+    assert c.get("scope", "orde", 1) == named("orders")
+    assert (c.hits, c.derived) == (0, 2)
+    assert c.get("scope", "ord", 10) == named("orders", "order_items", "daily_orders")
+    assert c.hits == 1
+
+
+def test_values_without_names_are_not_narrowed():
+    c = cache()
+    c.put("scope", "o", 10, named("orders", None))
+    assert c.get("scope", "or", 10) is None
+
+
+def test_non_word_prefixes_are_not_narrowed():
+    c = cache()
+    c.put("scope", "o", 10, named("orders", "order_items"))
+    assert c.get("scope", "order_", 10) is None
+
+
+def test_expired_entries_are_dropped():
+    c = cache(ttl=0.01)
+    c.put("scope", "o", 10, named("orders"))
+    time.sleep(0.02)
+    assert c.get("scope", "o", 10) is None
+    assert c.get("scope", "or", 10) is None
+    assert not c.entries
+
+
+def test_oldest_prefix_is_evicted():
+    c = cache(max_entries=2)
+    for query in ["a", "b", "c"]:
+        c.put("scope", query, 10, named(query))
+    assert c.get("scope", "a", 10) is None
+    assert c.get("scope", "c", 10) == named("c")
@@ -0,0 +1,67 @@
+import asyncio
+
+from typing import Any, Awaitable, Callable, List, Mapping
+
+from ..core import codec
+
+class Reply:
+    def __init__(self, session: "Session", body: Mapping):
+        self.session = session
+        self.body = body
+        self.status = 200
+        self.data: Any = None
+
+    async def __aenter__(self) -> "Reply":
+        self.session.in_flight += 1
+        self.session.peak = max(self.session.peak, self.session.in_flight)
+        try:
+            self.status, self.data = await self.session.handler(self.body)
+        finally:
+            self.session.in_flight -= 1
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+    async def read(self) -> bytes:
+        return codec.dumps(self.data)
+
+    async def text(self) -> str:
+        return codec.dumps(self.data).decode()
+
+
+class Session:
+    """
+    Stand-in for the aiohttp session, answering each posted GraphQL body
+    with the status and data returned by handler
+    """
+    def __init__(self, handler: Callable[[Mapping], Awaitable[Any]]):
+        self.handler = handler
+        self.bodies: List[Mapping] = []
+        self.in_flight = 0
+        self.peak = 0
+
+    def post(self, url: str, data: bytes = None, json: Mapping = None, timeout: Any = None) -> Reply:
+        body = codec.loads(data) if data is not None else json
+        self.bodies.append(body)
+        return Reply(self, body)
+
+
+def search(total: int, delay: float = 0.01, fail_at: int = None):
+    """
+    Handler for searches over total numbered datasets
+    """
+    async def handler(body: Mapping) -> Any:
+        await asyncio.sleep(delay)
+        start, count = body["variables"]["start"], body["variables"]["count"]
+        if start == fail_at:
+            return 503, "busy"
+        urns = [f"urn:li:dataset:{i}" for i in range(start, min(start + count, total))]
+        return 200, { "data": { "results": {
+            "start": start,
+            "count": len(urns),
+            "total": total,
+            "entities": [{ "entity": { "urn": urn } } for urn in urns],
+        }}}
+
+    return handler